@@ -0,0 +1,180 @@
+# 录制与回放
+#
+# 调并发和限速参数时不能反复去请求生产站点。CassetteRecorderMiddleware 把一次爬取的
+# 每个请求和响应录进一个磁带文件（SQLite，正文 zlib 压缩）；回放时用 CassetteDownloadHandler
+# 替换 http/https 下载处理器，按录制时的延迟或指定的延迟、带宽返回录下的响应。
+# 回放只替换网络，调度、下载槽的并发和延迟、各中间件和管道都照常运行，
+# 因此整个爬取流程的耗时可以离线复现。命令行入口见 ant/commands/cassette.py。
+
+import sqlite3
+import time
+import zlib
+
+from scrapy import signals
+from scrapy.core.downloader.handlers.base import BaseDownloadHandler
+from scrapy.exceptions import NotConfigured
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.asyncio import sleep
+from w3lib.http import headers_dict_to_raw, headers_raw_to_dict
+
+
+class Cassette:
+    """
+    磁带文件：按请求指纹保存录下的响应
+
+    同一请求录到多次时按顺序回放，用完后重复最后一次。meta 表保存录制时间等信息。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS interactions (
+                id INTEGER PRIMARY KEY,
+                fingerprint BLOB NOT NULL,
+                method TEXT NOT NULL,
+                url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                headers BLOB NOT NULL,
+                body BLOB NOT NULL,
+                latency REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS interactions_fingerprint ON interactions (fingerprint);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            """
+        )
+        self.conn.commit()
+
+    def set_meta(self, key, value):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+        self.conn.commit()
+
+    def get_meta(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def add(self, fingerprint, request, response, latency):
+        self.conn.execute(
+            "INSERT INTO interactions (fingerprint, method, url, status, headers, body, latency)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                fingerprint,
+                request.method,
+                response.url,
+                response.status,
+                headers_dict_to_raw(response.headers),
+                zlib.compress(response.body),
+                latency,
+            ),
+        )
+
+    def load(self):
+        """
+        读出全部响应：{指纹: [(url, status, headers, body, latency), ...]}，正文未解压
+        """
+        interactions = {}
+        for fingerprint, url, status, headers, body, latency in self.conn.execute(
+            "SELECT fingerprint, url, status, headers, body, latency FROM interactions ORDER BY id"
+        ):
+            interactions.setdefault(fingerprint, []).append((url, status, headers, body, latency))
+        return interactions
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+class CassetteRecorderMiddleware:
+    """
+    把从网络下载的响应录进 CASSETTE_RECORD 指定的磁带
+
+    应紧挨着下载器（优先级高于其他下载中间件），录下的是未解压、未重试的原始响应；
+    缓存命中的响应不录。
+    """
+
+    def __init__(self, crawler, path):
+        self.crawler = crawler
+        self.cassette = Cassette(path)
+        self.cassette.set_meta("recorded_at", time.time())
+        self.cassette.set_meta("crawl_window_days", crawler.settings.getint("CRAWL_WINDOW_DAYS", 18))
+        self.unsaved = 0
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        path = crawler.settings.get("CASSETTE_RECORD")
+        if not path:
+            raise NotConfigured("未设置 CASSETTE_RECORD")
+        s = cls(crawler, path)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    def process_response(self, request, response):
+        if "cached" in response.flags:
+            return response
+        fingerprint = self.crawler.request_fingerprinter.fingerprint(request)
+        self.cassette.add(fingerprint, request, response, request.meta.get("download_latency", 0.0))
+        self.crawler.stats.inc_value("cassette/recorded")
+        self.unsaved += 1
+        if self.unsaved >= 100:
+            self.cassette.conn.commit()
+            self.unsaved = 0
+        return response
+
+    def spider_closed(self, spider):
+        self.cassette.close()
+
+
+class CassetteDownloadHandler(BaseDownloadHandler):
+    """
+    从 CASSETTE_REPLAY 指定的磁带回放响应的下载处理器（设置在 DOWNLOAD_HANDLERS 的 http / https 上）
+
+    CASSETTE_LATENCY 为 "recorded"（默认，使用录制时的延迟）或秒数；
+    CASSETTE_BANDWIDTH 为每秒字节数（0 表示不限），正文传输时间另加在延迟上。
+    磁带中没有的请求返回 404（延迟取录制延迟的平均值），并计入统计 cassette/miss。
+    """
+
+    def __init__(self, crawler):
+        super().__init__(crawler)
+        settings = crawler.settings
+        path = settings.get("CASSETTE_REPLAY")
+        if not path:
+            raise NotConfigured("未设置 CASSETTE_REPLAY")
+        cassette = Cassette(path)
+        self.interactions = cassette.load()
+        cassette.close()
+        latency = settings.get("CASSETTE_LATENCY", "recorded")
+        self.latency = None if latency == "recorded" else float(latency)
+        self.bandwidth = settings.getfloat("CASSETTE_BANDWIDTH", 0)
+        latencies = [entry[4] for entries in self.interactions.values() for entry in entries]
+        self.miss_latency = sum(latencies) / len(latencies) if latencies else 0.0
+        self.played = {}
+        self.stats = crawler.stats
+
+    def _delay(self, recorded_latency, size):
+        delay = recorded_latency if self.latency is None else self.latency
+        if self.bandwidth:
+            delay += size / self.bandwidth
+        return delay
+
+    async def download_request(self, request):
+        fingerprint = self.crawler.request_fingerprinter.fingerprint(request)
+        recorded = self.interactions.get(fingerprint)
+        if not recorded:
+            self.stats.inc_value("cassette/miss")
+            await sleep(self._delay(self.miss_latency, 0))
+            return responsetypes.from_args(url=request.url)(url=request.url, status=404, request=request, flags=["cassette_miss"])
+        index = self.played.get(fingerprint, 0)
+        self.played[fingerprint] = index + 1
+        url, status, raw_headers, body, recorded_latency = recorded[min(index, len(recorded) - 1)]
+        body = zlib.decompress(body)
+        delay = self._delay(recorded_latency, len(body))
+        if delay > 0:
+            await sleep(delay)
+        request.meta["download_latency"] = delay
+        self.stats.inc_value("cassette/replayed")
+        headers = Headers(headers_raw_to_dict(raw_headers))
+        respcls = responsetypes.from_args(headers=headers, url=url, body=body)
+        return respcls(url=url, status=status, headers=headers, body=body, request=request)
@@ -0,0 +1 @@
+# 项目自定义的 scrapy 命令（settings.py 中的 COMMANDS_MODULE）
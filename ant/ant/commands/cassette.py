@@ -0,0 +1,94 @@
+import math
+import os
+import time
+
+from scrapy.commands import BaseRunSpiderCommand
+from scrapy.exceptions import UsageError
+
+from ant.cassettes import Cassette
+from ant.runner import combine, format_summary, spider_summary
+
+HANDLER = "ant.cassettes.CassetteDownloadHandler"
+
+
+class Command(BaseRunSpiderCommand):
+    """
+    scrapy cassette record <爬虫> <磁带>：正常爬取并录下所有响应
+    scrapy cassette replay <爬虫> <磁带>：从磁带回放，输出耗时和统计
+
+    默认关闭已采集记录和高水位（SEEN_STORE、CHECKPOINT_STORE），使录制和每次回放走相同的页面；
+    回放时按录制以来经过的天数放宽 CRAWL_WINDOW_DAYS，截止日期与录制时一致。
+    """
+
+    requires_project = True
+
+    def syntax(self):
+        return "[options] record|replay <spider> <cassette>"
+
+    def short_desc(self):
+        return "Record a crawl into a cassette file, or replay it offline"
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument(
+            "--latency",
+            default="recorded",
+            help="replay latency in seconds, or 'recorded' (default)",
+        )
+        parser.add_argument(
+            "--bandwidth",
+            type=float,
+            default=0,
+            metavar="KB/S",
+            help="simulated bandwidth in KB/s (default: unlimited)",
+        )
+        parser.add_argument(
+            "--keep-state",
+            action="store_true",
+            help="keep the seen store and checkpoints enabled",
+        )
+
+    def process_options(self, args, opts):
+        super().process_options(args, opts)
+        if len(args) != 3 or args[0] not in ("record", "replay"):
+            raise UsageError
+        mode, _, path = args
+        if not opts.keep_state:
+            self.settings.set("SEEN_STORE", "", priority="cmdline")
+            self.settings.set("CHECKPOINT_STORE", "", priority="cmdline")
+        if mode == "record":
+            if os.path.exists(path):
+                raise UsageError(f"磁带已存在: {path}", print_help=False)
+            self.settings.set("CASSETTE_RECORD", path, priority="cmdline")
+            middlewares = self.settings.getdict("DOWNLOADER_MIDDLEWARES")
+            middlewares["ant.cassettes.CassetteRecorderMiddleware"] = 980
+            self.settings.set("DOWNLOADER_MIDDLEWARES", middlewares, priority="cmdline")
+            return
+        if not os.path.exists(path):
+            raise UsageError(f"磁带不存在: {path}", print_help=False)
+        cassette = Cassette(path)
+        recorded_at = float(cassette.get_meta("recorded_at", time.time()))
+        window = int(cassette.get_meta("crawl_window_days", self.settings.getint("CRAWL_WINDOW_DAYS", 18)))
+        cassette.close()
+        days = math.ceil(max(0, time.time() - recorded_at) / 86400)
+        self.settings.set("CRAWL_WINDOW_DAYS", window + days, priority="cmdline")
+        self.settings.set("CASSETTE_REPLAY", path, priority="cmdline")
+        self.settings.set("CASSETTE_LATENCY", opts.latency, priority="cmdline")
+        self.settings.set("CASSETTE_BANDWIDTH", opts.bandwidth * 1024, priority="cmdline")
+        self.settings.set("DOWNLOAD_HANDLERS", {"http": HANDLER, "https": HANDLER}, priority="cmdline")
+        # 回放的响应不应再写入或读取 HTTP 缓存
+        self.settings.set("HTTPCACHE_ENABLED", False, priority="cmdline")
+
+    def run(self, args, opts):
+        mode, name, _ = args
+        crawler = self._create_crawler(name)
+        self.crawler_process.crawl(crawler, **opts.spargs)
+        started = time.monotonic()
+        self.crawler_process.start()
+        wall_time = time.monotonic() - started
+        stats = crawler.stats.get_stats()
+        print(format_summary(combine({name: spider_summary(stats)}, wall_time)))
+        cassette_stats = {key: value for key, value in stats.items() if key.startswith("cassette/")}
+        print(f"{mode}: {cassette_stats}")
+        if self.crawler_process.bootstrap_failed:
+            self.exitcode = 1
@@ -0,0 +1,68 @@
+import json
+import time
+
+from scrapy.commands import BaseRunSpiderCommand
+from scrapy.exceptions import UsageError
+
+from ant.runner import combine, format_summary, history_path, record_history, spider_summary
+
+
+class Command(BaseRunSpiderCommand):
+    """
+    scrapy crawlall [爬虫 ...]：在一个进程中同时运行多个爬虫（默认全部），结束后输出汇总统计
+    """
+
+    requires_project = True
+
+    def syntax(self):
+        return "[options] [spider ...]"
+
+    def short_desc(self):
+        return "Run all spiders of the project (or the given ones) concurrently in one process"
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument(
+            "-x",
+            "--exclude",
+            metavar="SPIDER",
+            action="append",
+            default=[],
+            help="skip this spider (may be repeated)",
+        )
+        parser.add_argument(
+            "--stats",
+            metavar="FILE",
+            help="write the combined stats to FILE as JSON",
+        )
+
+    def run(self, args, opts):
+        available = self.crawler_process.spider_loader.list()
+        unknown = set(args) - set(available)
+        if unknown:
+            raise UsageError(f"未知的爬虫: {', '.join(sorted(unknown))}")
+        names = [name for name in (args or available) if name not in opts.exclude]
+        if not names:
+            raise UsageError("没有要运行的爬虫")
+
+        crawlers = {}
+        for name in names:
+            crawlers[name] = self._create_crawler(name)
+            self.crawler_process.crawl(crawlers[name], **opts.spargs)
+        started = time.monotonic()
+        self.crawler_process.start()
+        wall_time = time.monotonic() - started
+
+        summaries = {name: spider_summary(crawler.stats.get_stats()) for name, crawler in crawlers.items()}
+        combined = combine(summaries, wall_time)
+        print(format_summary(combined))
+        if opts.stats:
+            with open(opts.stats, "w", encoding="utf-8") as f:
+                json.dump(combined, f, ensure_ascii=False, indent=2, default=str)
+        path = history_path(self.settings)
+        if path:
+            record_history(path, summaries)
+        if self.crawler_process.bootstrap_failed or any(
+            summary["finish_reason"] != "finished" for summary in summaries.values()
+        ):
+            self.exitcode = 1
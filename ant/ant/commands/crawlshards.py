@@ -0,0 +1,240 @@
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from scrapy.commands import ScrapyCommand
+from scrapy.exceptions import UsageError
+from scrapy.spiderloader import get_spider_loader
+from scrapy.utils.project import data_path
+
+from ant.dedup import BloomFilter
+from ant.runner import balance, combine, format_summary, history_path, load_costs
+
+logger = logging.getLogger(__name__)
+
+
+class Command(ScrapyCommand):
+    """
+    scrapy crawlshards [爬虫 ...]：按历史耗时把爬虫分到多个子进程（各运行一次 crawlall），合并统计
+
+    子进程异常退出（没有写出统计）时重新运行该组，最多 --max-restarts 次，其他组不受影响。
+    -o 指定 JSON Lines 文件时，各组先写各自的文件，全部结束后按组顺序合并。
+
+    各组是不同的进程，项目文件不能像 crawlall 那样在进程内共用：
+    - 去重过滤器（DEDUP_FILE）关闭时整个写回，各组共用一个文件时只有最后结束的一组生效。
+      因此各组使用 DEDUP_FILE 的一份副本，全部结束后按位或合并回 DEDUP_FILE。
+    - SQLite 缓存和近似重复索引在一个写事务中累积多条写入，其他组写入时会等到超时
+      （database is locked）。子进程中 HTTPCACHE_SQLITE_BATCH 和 NEARDUP_BATCH 默认设为 1，每条都提交。
+    """
+
+    # 子进程的默认设置，-s 可以覆盖
+    SHARD_SETTINGS = {"HTTPCACHE_SQLITE_BATCH": "1", "NEARDUP_BATCH": "1"}
+
+    requires_project = True
+    requires_crawler_process = False
+
+    def syntax(self):
+        return "[options] [spider ...]"
+
+    def short_desc(self):
+        return "Run spiders in several worker processes, balanced by past crawl time"
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument(
+            "-w",
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="number of worker processes (default: number of CPUs)",
+        )
+        parser.add_argument(
+            "-x",
+            "--exclude",
+            metavar="SPIDER",
+            action="append",
+            default=[],
+            help="skip this spider (may be repeated)",
+        )
+        parser.add_argument(
+            "-a",
+            dest="spargs",
+            action="append",
+            default=[],
+            metavar="NAME=VALUE",
+            help="set spider argument (may be repeated)",
+        )
+        parser.add_argument(
+            "-o",
+            "--output",
+            metavar="FILE",
+            help="write scraped items of all shards to FILE as JSON Lines",
+        )
+        parser.add_argument(
+            "--max-restarts",
+            type=int,
+            default=2,
+            help="restart a crashed worker at most this many times (default: 2)",
+        )
+        parser.add_argument(
+            "--logdir",
+            metavar="DIR",
+            help="write each worker's log to DIR/shard-N.log instead of stderr",
+        )
+        parser.add_argument(
+            "--stats",
+            metavar="FILE",
+            help="write the combined stats to FILE as JSON",
+        )
+
+    def run(self, args, opts):
+        available = get_spider_loader(self.settings).list()
+        unknown = set(args) - set(available)
+        if unknown:
+            raise UsageError(f"未知的爬虫: {', '.join(sorted(unknown))}")
+        names = [name for name in (args or available) if name not in opts.exclude]
+        if not names:
+            raise UsageError("没有要运行的爬虫")
+
+        costs = load_costs(history_path(self.settings), names)
+        shards = balance(costs, opts.workers)
+        for index, shard in enumerate(shards):
+            load = sum(costs[name] for name in shard)
+            logger.info(f"第 {index} 组（预计 {load:.0f} 秒）: {', '.join(shard)}")
+        if opts.logdir:
+            os.makedirs(opts.logdir, exist_ok=True)
+
+        workdir = tempfile.mkdtemp(prefix="crawlshards-")
+        try:
+            dedup_path = self._dedup_path()
+            if dedup_path:
+                for index in range(len(shards)):
+                    if os.path.exists(dedup_path):
+                        shutil.copyfile(dedup_path, self._shard_dedup_path(workdir, index))
+            started = time.monotonic()
+            results = self._run_shards(shards, opts, workdir)
+            wall_time = time.monotonic() - started
+            if dedup_path:
+                self._merge_dedup(dedup_path, workdir, len(shards))
+            summaries = {}
+            for index, result in enumerate(results):
+                if result is None:
+                    self.exitcode = 1
+                    logger.error(f"第 {index} 组多次异常退出，放弃: {', '.join(shards[index])}")
+                    continue
+                summaries.update(result["spiders"])
+                if any(summary["finish_reason"] != "finished" for summary in result["spiders"].values()):
+                    self.exitcode = 1
+            if opts.output:
+                self._merge_output(opts.output, workdir, len(shards))
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        combined = combine(summaries, wall_time)
+        combined["shards"] = shards
+        print(format_summary(combined))
+        if opts.stats:
+            with open(opts.stats, "w", encoding="utf-8") as f:
+                json.dump(combined, f, ensure_ascii=False, indent=2, default=str)
+
+    def _dedup_path(self):
+        path = self.settings.get("DEDUP_FILE", "dedup.bloom")
+        # 相对路径放在项目的 .scrapy 目录下，与 AntPipeline 相同
+        return data_path(path) if path else None
+
+    @staticmethod
+    def _shard_dedup_path(workdir, index):
+        return os.path.join(workdir, f"dedup-{index}.bloom")
+
+    def _merge_dedup(self, path, workdir, count):
+        """
+        各组的去重过滤器按位或合并，写回 path
+
+        各组都从 path 的副本开始，合并结果包含原来的键；某组没有写出文件时跳过。
+        """
+        merged = None
+        for index in range(count):
+            shard_path = self._shard_dedup_path(workdir, index)
+            bloom = BloomFilter.read(shard_path) if os.path.exists(shard_path) else None
+            if bloom is None:
+                continue
+            if merged is None:
+                merged = bloom
+            elif not merged.merge(bloom):
+                logger.warning(f"第 {index} 组的去重过滤器与其他组的大小不同，未合并")
+        if merged is not None:
+            merged.save(path)
+            logger.info(f"已合并各组的去重过滤器，写入 {path}，共约 {merged.count} 个键")
+
+    def _command(self, index, shard, opts, workdir):
+        command = [sys.executable, "-m", "scrapy", "crawlall", *shard, "--stats", os.path.join(workdir, f"stats-{index}.json")]
+        for name, value in self.SHARD_SETTINGS.items():
+            command += ["-s", f"{name}={value}"]
+        for setting in opts.set:
+            command += ["-s", setting]
+        if self._dedup_path():
+            # 放在 -s 之后，覆盖命令行中的 DEDUP_FILE
+            command += ["-s", f"DEDUP_FILE={self._shard_dedup_path(workdir, index)}"]
+        for spider_arg in opts.spargs:
+            command += ["-a", spider_arg]
+        if opts.output:
+            command += ["-O", f"{os.path.join(workdir, f'items-{index}.jsonl')}:jsonlines"]
+        if opts.loglevel:
+            command += ["-L", opts.loglevel]
+        if opts.logdir:
+            command += ["--logfile", os.path.join(opts.logdir, f"shard-{index}.log")]
+        return command
+
+    def _run_shards(self, shards, opts, workdir):
+        """
+        启动所有组并等待结束，返回各组 crawlall 写出的统计，多次异常退出的组为 None
+        """
+        processes = {}
+        restarts = [0] * len(shards)
+        results = [None] * len(shards)
+
+        def start(index):
+            stats_path = os.path.join(workdir, f"stats-{index}.json")
+            if os.path.exists(stats_path):
+                os.remove(stats_path)
+            # 各组的汇总表由这里统一输出
+            processes[index] = subprocess.Popen(self._command(index, shards[index], opts, workdir), stdout=subprocess.DEVNULL)
+
+        for index in range(len(shards)):
+            start(index)
+        try:
+            while processes:
+                time.sleep(0.5)
+                for index, process in list(processes.items()):
+                    returncode = process.poll()
+                    if returncode is None:
+                        continue
+                    del processes[index]
+                    stats_path = os.path.join(workdir, f"stats-{index}.json")
+                    # crawlall 正常结束时总会写出统计（有爬虫失败时退出码为 1）
+                    if os.path.exists(stats_path):
+                        with open(stats_path, encoding="utf-8") as f:
+                            results[index] = json.load(f)
+                    elif restarts[index] < opts.max_restarts:
+                        restarts[index] += 1
+                        logger.warning(f"第 {index} 组异常退出（{returncode}），第 {restarts[index]} 次重新运行")
+                        start(index)
+        finally:
+            for process in processes.values():
+                process.terminate()
+            for process in processes.values():
+                process.wait()
+        return results
+
+    def _merge_output(self, output, workdir, count):
+        with open(output, "wb") as target:
+            for index in range(count):
+                path = os.path.join(workdir, f"items-{index}.jsonl")
+                if os.path.exists(path):
+                    with open(path, "rb") as source:
+                        shutil.copyfileobj(source, target)
@@ -0,0 +1,191 @@
+# 日期解析
+#
+# 各爬虫原先各自维护一份 _parse_date，依次尝试多个 strptime 格式，每次失败都要抛出并捕获
+# ValueError。同一个网站返回的格式总是相同的，这里把所有格式预编译成正则，
+# 按 key（通常是爬虫名）记住上次成功的格式优先尝试，并缓存解析过的字符串。
+
+import logging
+import re
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# 常见的日期格式，按优先级排列
+DATE_FORMATS = (
+    '%Y-%m-%d %H:%M:%S',     # 2024-01-12 10:30:00
+    '%Y-%m-%d',               # 2024-01-12
+    '%Y/%m/%d %H:%M:%S',      # 2024/01/12 10:30:00
+    '%Y/%m/%d',               # 2024/01/12
+    '%Y年%m月%d日',            # 2024年1月12日
+    '%Y.%m.%d',               # 2024.01.12
+    '%m-%d',                  # 01-12 (假设是今年)
+    '%m/%d',                  # 01/12 (假设是今年)
+    '%m月%d日',                # 1月12日 (假设是今年)
+)
+
+_DIRECTIVES = {
+    'Y': ('year', r'\d{4}'),
+    'm': ('month', r'\d{1,2}'),
+    'd': ('day', r'\d{1,2}| [1-9]'),  # strptime 的 %d 允许前导空格
+    'H': ('hour', r'\d{1,2}'),
+    'M': ('minute', r'\d{1,2}'),
+    'S': ('second', r'\d{1,2}'),
+}
+_FIELDS = ('year', 'month', 'day', 'hour', 'minute', 'second')
+
+# 所有格式都不匹配时，沿用原来的两个兜底正则
+# 匹配 2024-01-12 或 2024/01/12 等格式
+_FALLBACK_YMD = re.compile(r'(\d{4})[-\/年](\d{1,2})[-\/月](\d{1,2})')
+# 匹配只有月日的格式（如 01-12）
+_FALLBACK_MD = re.compile(r'(\d{1,2})[-\/月](\d{1,2})')
+
+_MISS = object()
+
+
+def _format_to_regex(fmt, suffix=''):
+    """
+    把 strptime 格式转换为正则，返回 (正则文本, 格式中出现的字段)
+    """
+    parts = []
+    fields = []
+    for literal, directive in re.findall(r'([^%]*)(?:%(.))?', fmt):
+        if literal:
+            parts.append(r'\s+'.join(re.escape(piece) for piece in literal.split(' ')))
+        if directive:
+            field, pattern = _DIRECTIVES[directive]
+            parts.append(f'(?P<{field}{suffix}>{pattern})')
+            fields.append(field)
+    return ''.join(parts), tuple(fields)
+
+
+class DateParser:
+    """
+    预编译、带缓存的日期解析器
+
+    formats 为 strptime 风格的格式列表，不带年份的格式按今年处理。
+    parse() 的 key 用来区分不同来源（爬虫或字段），每个 key 记住上次成功的格式，
+    下次先只用这一个格式的正则尝试，失败再用合并后的单个正则匹配全部格式。
+    """
+
+    def __init__(self, formats=DATE_FORMATS, cache_size=10000):
+        self.formats = tuple(formats)
+        self.cache_size = cache_size
+        self._patterns = []
+        self._slots = []
+        alternatives = []
+        for index, fmt in enumerate(self.formats):
+            pattern, fields = _format_to_regex(fmt)
+            self._patterns.append(re.compile(pattern))
+            self._slots.append(tuple(_FIELDS.index(field) for field in fields))
+            pattern, _ = _format_to_regex(fmt, suffix=f'_{index}')
+            alternatives.append(f'(?P<f{index}>{pattern})')
+        self._combined = re.compile('|'.join(alternatives))
+        # 合并正则中第 index 个格式各字段的分组名
+        self._group_names = [
+            tuple(f'{_FIELDS[slot]}_{index}' for slot in slots) for index, slots in enumerate(self._slots)
+        ]
+        self._last_format = {}
+        self._cache = {}
+
+    def parse(self, value, key=None):
+        """
+        解析日期字符串，返回 datetime 对象，如果解析失败返回 None
+        """
+        if not value:
+            return None
+        text = str(value).strip()
+        parts = self._cache.get(text, _MISS)
+        if parts is _MISS:
+            parts = self._parse(text, key)
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache[text] = parts
+            if parts is None:
+                logger.warning(f"无法解析日期格式: {text}")
+        if parts is None:
+            return None
+        year, month, day, hour, minute, second = parts
+        if year is None:
+            # 格式中没有年份（如 01-12），假设是今年
+            year = datetime.now().year
+        try:
+            return datetime(year, month, day, hour, minute, second)
+        except ValueError:
+            # 只可能是今年没有的 2 月 29 日
+            return None
+
+    def _parse(self, text, key):
+        # 先试这个 key 上次成功的格式
+        index = self._last_format.get(key)
+        if index is not None:
+            match = self._patterns[index].fullmatch(text)
+            if match:
+                parts = self._build(match.groups(), self._slots[index])
+                if parts:
+                    return parts
+        # 再用合并后的正则一次匹配所有格式
+        match = self._combined.fullmatch(text)
+        if match:
+            index = int(match.lastgroup[1:])
+            parts = self._build(match.group(*self._group_names[index]), self._slots[index])
+            if parts:
+                self._last_format[key] = index
+                return parts
+            # 数值越界（如 2024-13-01）时和 strptime 一样继续尝试后面的格式
+            parts = self._parse_slow(text, start=index + 1)
+            if parts:
+                return parts
+        return self._fallback(text)
+
+    def _parse_slow(self, text, start=0):
+        for index in range(start, len(self.formats)):
+            match = self._patterns[index].fullmatch(text)
+            if match:
+                parts = self._build(match.groups(), self._slots[index])
+                if parts:
+                    return parts
+        return None
+
+    @staticmethod
+    def _build(groups, slots):
+        # 没有出现的字段：年份为 None（表示今年），其余为 0
+        parts = [None, 0, 0, 0, 0, 0]
+        for slot, group in zip(slots, groups):
+            parts[slot] = int(group)
+        try:
+            # 校验日期是否合法；不带年份时按闰年校验，使 2 月 29 日可以通过
+            datetime(parts[0] or 2000, parts[1], parts[2], parts[3], parts[4], parts[5])
+        except ValueError:
+            return None
+        return tuple(parts)
+
+    @staticmethod
+    def _fallback(text):
+        # 如果所有格式都失败，尝试使用正则表达式提取日期
+        match = _FALLBACK_YMD.search(text)
+        if match:
+            year, month, day = int(match.group(1)), int(match.group(2)), int(match.group(3))
+            try:
+                datetime(year, month, day)
+                return (year, month, day, 0, 0, 0)
+            except ValueError:
+                pass
+        match = _FALLBACK_MD.search(text)
+        if match:
+            month, day = int(match.group(1)), int(match.group(2))
+            try:
+                datetime(2000, month, day)
+                return (None, month, day, 0, 0, 0)
+            except ValueError:
+                pass
+        return None
+
+
+default_parser = DateParser()
+
+
+def parse_date(value, key=None):
+    """
+    用共享的 DateParser 解析日期，key 通常传爬虫名
+    """
+    return default_parser.parse(value, key)
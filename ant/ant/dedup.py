@@ -0,0 +1,148 @@
+# 跨爬虫去重
+#
+# 网站翻页过程中列表变动时，同一条公告会出现在相邻两页；多个平台转载同一个招标时，
+# 不同爬虫也会产出同一条公告。BloomFilter 用固定大小的位数组记录见过的键，
+# 内存只取决于容量和误判率，与历史公告数无关，并在两次运行之间保存到文件。
+
+import hashlib
+import math
+import os
+import re
+import struct
+
+from w3lib.url import canonicalize_url
+
+from ant.matching import fold
+
+_MAGIC = b"ANTBLOOM"
+_HEADER = struct.Struct("<8sQIQ")
+
+# 比较标题时忽略空白和标点
+_TITLE_NOISE_RE = re.compile(r"[\s\W_]+")
+
+
+def url_key(url):
+    if not url:
+        return None
+    return "u:" + canonicalize_url(str(url))
+
+
+def title_key(title, min_length=8):
+    """
+    标题去掉空白和标点、统一大小写和全角/半角后作为键；太短的标题（如“招标公告”）不参与去重
+    """
+    if not title:
+        return None
+    normalized = _TITLE_NOISE_RE.sub("", fold(str(title)))
+    if len(normalized) < min_length:
+        return None
+    return "t:" + normalized
+
+
+class BloomFilter:
+    """
+    固定大小的 Bloom 过滤器
+
+    按 capacity 和 error_rate 计算位数和哈希函数个数；给定 max_bytes 时位数组不超过该大小，
+    此时实际误判率会高于 error_rate（见 expected_error_rate()）。
+    每个键只计算一次 blake2b，再用双重哈希得到 k 个位置。
+    """
+
+    def __init__(self, capacity=1000000, error_rate=0.001, max_bytes=None):
+        bits = math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        if max_bytes:
+            bits = min(bits, max_bytes * 8)
+        self.num_bits = max(bits, 8)
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.capacity = capacity
+        self.count = 0
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        num_bits = self.num_bits
+        return [(h1 + i * h2) % num_bits for i in range(self.num_hashes)]
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def add(self, key):
+        """
+        加入键，返回加入前是否（可能）已存在
+        """
+        bits = self.bits
+        existed = True
+        for position in self._positions(key):
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                existed = False
+        if not existed:
+            self.count += 1
+        return existed
+
+    def expected_error_rate(self, count=None):
+        """
+        插入 count 个键后的理论误判率，count 默认为当前已插入的键数
+        """
+        count = self.count if count is None else count
+        return (1 - math.exp(-self.num_hashes * count / self.num_bits)) ** self.num_hashes
+
+    def merge(self, other):
+        """
+        并入另一个位数和哈希函数个数相同的过滤器（按位或），不相同时返回 False
+
+        合并后的键数无法精确得到，按置位的比例估算。
+        """
+        if other.num_bits != self.num_bits or other.num_hashes != self.num_hashes:
+            return False
+        merged = int.from_bytes(self.bits, "little") | int.from_bytes(other.bits, "little")
+        self.bits = bytearray(merged.to_bytes(len(self.bits), "little"))
+        filled = min(merged.bit_count(), self.num_bits - 1)
+        estimate = round(-self.num_bits / self.num_hashes * math.log(1 - filled / self.num_bits))
+        self.count = max(self.count, other.count, estimate)
+        return True
+
+    @classmethod
+    def read(cls, path):
+        """
+        从文件读出过滤器，位数和哈希函数个数取文件中的值；文件格式不对时返回 None
+        """
+        with open(path, "rb") as f:
+            magic, num_bits, num_hashes, count = _HEADER.unpack(f.read(_HEADER.size))
+            bits = f.read()
+        if magic != _MAGIC or len(bits) != (num_bits + 7) // 8:
+            return None
+        bloom = cls.__new__(cls)
+        bloom.num_bits = num_bits
+        bloom.num_hashes = num_hashes
+        bloom.capacity = None
+        bloom.count = count
+        bloom.bits = bytearray(bits)
+        return bloom
+
+    def save(self, path):
+        # 先写临时文件再替换，避免中途退出时留下损坏的文件
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, self.num_bits, self.num_hashes, self.count))
+            f.write(self.bits)
+        os.replace(tmp_path, path)
+
+    def load(self, path):
+        """
+        从文件加载位数组；文件的位数或哈希函数个数与当前配置不同时返回 False，保持为空
+        """
+        with open(path, "rb") as f:
+            magic, num_bits, num_hashes, count = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != _MAGIC or num_bits != self.num_bits or num_hashes != self.num_hashes:
+                return False
+            bits = f.read()
+        if len(bits) != len(self.bits):
+            return False
+        self.bits = bytearray(bits)
+        self.count = count
+        return True
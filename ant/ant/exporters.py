@@ -0,0 +1,106 @@
+# 分段 JSON Lines 输出
+#
+# 原来的输出是整个 JSON 数组（如 ctg.json），每次运行整体重写，不能追加，
+# 也不能在爬取过程中读取。这里每行一条公告，按大小或时间切分成多个段文件：
+# 正在写的段以 .part 结尾，关闭后改名（可选 gzip 压缩），并在 manifest.jsonl 中追加一行记录，
+# 下游只需跟踪 manifest 即可在每个段关闭后立即处理。内存占用与爬取规模无关。
+
+import gzip
+import json
+import os
+import shutil
+from datetime import datetime
+
+from scrapy.exporters import JsonLinesItemExporter
+
+MANIFEST_NAME = "manifest.jsonl"
+
+
+class RotatingJsonLinesWriter:
+    """
+    按大小或时间切分的 JSON Lines 写入器
+
+    max_bytes / max_seconds 为 0 表示不按该条件切分；
+    每写 flush_items 条调用一次 flush()，保证已写入的内容对其他进程可见。
+    """
+
+    def __init__(self, directory, prefix, max_bytes=64 * 1024 * 1024, max_seconds=0, flush_items=100, compress=False):
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.flush_items = flush_items
+        self.compress = compress
+        self.sequence = 0
+        self.file = None
+        self.exporter = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _open(self):
+        self.sequence += 1
+        self.started = datetime.now()
+        name = f"{self.prefix}-{self.started:%Y%m%dT%H%M%S}-{self.sequence:05d}.jsonl"
+        self.path = os.path.join(self.directory, name)
+        self.file = open(f"{self.path}.part", "wb")
+        self.exporter = JsonLinesItemExporter(self.file, ensure_ascii=False)
+        self.exporter.start_exporting()
+        self.items = 0
+        self.unflushed = 0
+
+    def write(self, item):
+        if self.file is None:
+            self._open()
+        self.exporter.export_item(item)
+        self.items += 1
+        self.unflushed += 1
+        if self.unflushed >= self.flush_items:
+            self.file.flush()
+            self.unflushed = 0
+        if self.max_bytes and self.file.tell() >= self.max_bytes:
+            self.rotate()
+
+    def rotate_if_expired(self):
+        """
+        当前段打开超过 max_seconds 时关闭，由定时任务调用，使爬取暂停时段也能按时关闭
+        """
+        if self.file is not None and self.max_seconds:
+            if (datetime.now() - self.started).total_seconds() >= self.max_seconds:
+                self.rotate()
+
+    def rotate(self):
+        """
+        关闭当前段：改名或压缩，并写入 manifest；返回段的记录，没有打开的段时返回 None
+        """
+        if self.file is None:
+            return None
+        self.exporter.finish_exporting()
+        size = self.file.tell()
+        self.file.close()
+        self.file = None
+        part_path = f"{self.path}.part"
+        if self.compress:
+            final_path = f"{self.path}.gz"
+            with open(part_path, "rb") as source, gzip.open(f"{final_path}.part", "wb") as target:
+                shutil.copyfileobj(source, target)
+            os.replace(f"{final_path}.part", final_path)
+            os.remove(part_path)
+        else:
+            final_path = self.path
+            os.replace(part_path, final_path)
+        record = {
+            "file": os.path.basename(final_path),
+            "prefix": self.prefix,
+            "items": self.items,
+            "bytes": size,
+            "stored_bytes": os.path.getsize(final_path),
+            "compressed": self.compress,
+            "started": self.started.isoformat(timespec="seconds"),
+            "closed": datetime.now().isoformat(timespec="seconds"),
+        }
+        # 段文件就绪后再写 manifest，下游看到记录时文件一定完整
+        with open(os.path.join(self.directory, MANIFEST_NAME), "a", encoding="utf-8") as manifest:
+            manifest.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return record
+
+    def close(self):
+        return self.rotate()
@@ -0,0 +1,176 @@
+# 列表页按行提取字段
+#
+# 列表页每一行（li）原来要调用好几次 response.css() / li.css()：每次都把 CSS 翻译成 XPath、
+# 包装出一批 Selector，找日期时还要把整行的文本节点取一遍。RowExtractor 在爬虫类定义时
+# 把行和各字段的 XPath 编译好（lxml.etree.XPath），解析时直接在 parsel 已经解析好的 lxml 树上
+# 逐行求值，不再创建 Selector，返回普通字符串（smart_strings=False，不引用原来的树）。
+#
+# 字段的写法：
+#   "title": ".//a/@title"                              一个 XPath，取第一个结果
+#   "time": (".//text()", r"^\s*(\d{4}-\d{1,2}-\d{1,2}.*?)\s*$")
+#                                                       XPath 加正则：取第一个能匹配的结果，
+#                                                       与 re_first 相同（有分组时返回第一个分组）
+#   "time": [规则1, 规则2]                                依次尝试，取第一个有结果的规则
+# 都没有结果时字段为 None。
+#
+# ContentExtractor 提取详情页正文：一次遍历取出正文元素下的全部文本，块级元素（p、div、li、br……）
+# 之间换行，其余空白（包括 &nbsp; 和全角空格）折叠成一个空格，script / style 不计入。
+# 原来 ::text 逐个取文本再用空格拼接，"<b>招</b>标" 会变成 "招 标"，块之间也分不出来。
+
+import re
+
+from lxml import etree
+
+# 前后换行的元素
+BLOCK_TAGS = frozenset((
+    "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt", "fieldset", "figcaption",
+    "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "nav",
+    "ol", "p", "pre", "section", "table", "tbody", "tfoot", "thead", "tr", "ul",
+))
+# 前后加空格的元素（同一行的单元格）
+CELL_TAGS = frozenset(("td", "th"))
+# 不计入正文的元素
+SKIP_TAGS = frozenset(("script", "style", "noscript", "template", "head", "title"))
+
+_SPACES = re.compile(r"[^\S\n]+")
+_NEWLINES = re.compile(r" ?\n[\s]*")
+
+
+def has_class(name):
+    """
+    XPath 条件：class 中含有 name（与 CSS 的 .name 相同）
+    """
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+class _Rule:
+    def __init__(self, path, pattern=None):
+        self.path = path
+        self.xpath = etree.XPath(path, smart_strings=False)
+        self.regex = re.compile(pattern, re.DOTALL) if pattern else None
+
+    def first(self, row):
+        for value in self.xpath(row):
+            if not isinstance(value, str):
+                # 选中的是元素时取其全部文本
+                value = "".join(value.itertext())
+            if self.regex is None:
+                return value
+            match = self.regex.search(value)
+            if match:
+                return match.group(1) if self.regex.groups else match.group()
+        return None
+
+
+def _rules(spec):
+    if isinstance(spec, str):
+        return [_Rule(spec)]
+    if isinstance(spec, tuple):
+        return [_Rule(*spec)]
+    return [rule for item in spec for rule in _rules(item)]
+
+
+class RowExtractor:
+    """
+    按声明的字段提取列表页的每一行
+
+    rows 是选出各行的 XPath（相对文档根），fields 是 {字段名: 规则}，规则的写法见模块说明。
+    XPath 在构造时编译，应作为爬虫的类属性创建，只编译一次。
+    """
+
+    def __init__(self, rows, fields):
+        self.rows_path = rows
+        self.row_xpath = etree.XPath(rows)
+        self.fields = {name: _rules(spec) for name, spec in fields.items()}
+
+    def select(self, response):
+        """
+        返回各行的 lxml 元素
+        """
+        return self.row_xpath(response.selector.root)
+
+    def extract(self, row):
+        """
+        提取一行的全部字段：{字段名: 字符串或 None}
+        """
+        values = {}
+        for name, rules in self.fields.items():
+            value = None
+            for rule in rules:
+                value = rule.first(row)
+                if value is not None:
+                    break
+            values[name] = value
+        return values
+
+
+def normalize_text(text):
+    """
+    空白折叠成一个空格，连续的换行（及其两侧的空白）合并成一个换行
+    """
+    return _NEWLINES.sub("\n", _SPACES.sub(" ", text)).strip()
+
+
+def block_text(element, max_chars=0):
+    """
+    元素下的全部文本，块级元素之间换行；max_chars 不为 0 时最多返回这么多字符，够了就不再往下遍历
+    """
+    parts = [element.text or ""]
+    size = len(parts[0])
+    # 未折叠的文本长度达到 check_at 时折叠一次，看是否已经够 max_chars
+    check_at = max_chars
+    stack = [(element, iter(element))]
+    while stack:
+        if max_chars and size >= check_at:
+            text = normalize_text("".join(parts))
+            if len(text) >= max_chars:
+                return text[:max_chars].rstrip()
+            check_at = size + max_chars - len(text)
+        parent, children = stack[-1]
+        child = next(children, None)
+        if child is None:
+            stack.pop()
+            if stack:
+                tag = parent.tag
+                separator = "\n" if tag in BLOCK_TAGS else " " if tag in CELL_TAGS else ""
+                tail = parent.tail or ""
+                parts.append(separator)
+                parts.append(tail)
+                size += len(separator) + len(tail)
+            continue
+        tag = child.tag
+        if not isinstance(tag, str) or tag in SKIP_TAGS:
+            # 注释、处理指令和不计入的元素只取其后的文本
+            tail = child.tail or ""
+            parts.append(tail)
+            size += len(tail)
+            continue
+        text = child.text or ""
+        separator = "\n" if tag in BLOCK_TAGS else " " if tag in CELL_TAGS else ""
+        parts.append(separator)
+        parts.append(text)
+        size += len(separator) + len(text)
+        stack.append((child, iter(child)))
+    text = normalize_text("".join(parts))
+    return text[:max_chars].rstrip() if max_chars else text
+
+
+class ContentExtractor:
+    """
+    按顺序尝试各 XPath（相对文档根），取第一个选中元素的规则，返回这些元素的正文
+
+    没有元素被选中时返回 None；选中了但没有文本时返回空字符串。
+    """
+
+    def __init__(self, *paths):
+        self.paths = paths
+        self.xpaths = [etree.XPath(path) for path in paths]
+
+    def extract(self, response, max_chars=0):
+        root = response.selector.root
+        for xpath in self.xpaths:
+            elements = xpath(root)
+            if elements:
+                text = "\n".join(filter(None, (block_text(element, max_chars) for element in elements)))
+                return text[:max_chars].rstrip() if max_chars else text
+        return None
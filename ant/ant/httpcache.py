@@ -0,0 +1,173 @@
+# HTTP 缓存
+#
+# Scrapy 默认的 FilesystemCacheStorage 每个响应要建一个目录、写 6 个文件，
+# ctg 几万条详情页缓存下来文件数量巨大。SQLiteCacheStorage 把所有爬虫的响应放在
+# 一个 SQLite 文件中，正文用 zlib 压缩。
+#
+# AntCachePolicy 不依赖站点返回的 Cache-Control（这些站点大多不给或给 no-cache），
+# 而是按请求类型设定有效期：列表页（带 page_number 的翻页请求）很快过期，
+# 详情页发布后基本不变，有效期很长。过期后带上 If-None-Match / If-Modified-Since 重新请求，
+# 站点返回 304 时直接使用缓存的响应。
+
+import logging
+import os
+import sqlite3
+import zlib
+from time import time
+
+from scrapy.extensions.httpcache import RFC2616Policy
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.project import data_path
+from w3lib.http import headers_dict_to_raw, headers_raw_to_dict
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteCacheStorage:
+    """
+    单文件 SQLite 缓存存储，正文 zlib 压缩
+
+    文件位于 HTTPCACHE_DIR 下（HTTPCACHE_SQLITE_FILE，默认 cache.db），按 (爬虫, 请求指纹) 保存；
+    写入每 HTTPCACHE_SQLITE_BATCH 条提交一次，关闭爬虫时提交剩余部分。
+    HTTPCACHE_EXPIRATION_SECS 的含义与 Scrapy 自带的存储相同：超过该时间的记录视为不存在。
+    同一进程中的多个爬虫（crawlall）共用一个连接：各自连接时一个爬虫未提交的写事务会让另一个爬虫的写入
+    阻塞，最后报 database is locked。
+    """
+
+    # 文件路径 -> [连接, 使用中的爬虫数, 未提交的写入数]
+    _shared = {}
+
+    def __init__(self, settings):
+        directory = data_path(settings["HTTPCACHE_DIR"], createdir=True)
+        self.path = os.path.join(directory, settings.get("HTTPCACHE_SQLITE_FILE", "cache.db"))
+        self.expiration_secs = settings.getint("HTTPCACHE_EXPIRATION_SECS")
+        self.level = settings.getint("HTTPCACHE_COMPRESSION_LEVEL", 6)
+        self.batch_size = settings.getint("HTTPCACHE_SQLITE_BATCH", 100)
+        self.conn = None
+        self.entry = None
+
+    def open_spider(self, spider):
+        entry = self._shared.get(self.path)
+        if entry is None:
+            entry = self._shared[self.path] = [self._connect(), 0, 0]
+        entry[1] += 1
+        self.entry = entry
+        self.conn = entry[0]
+        self._fingerprinter = spider.crawler.request_fingerprinter
+        self.stats = spider.crawler.stats
+        logger.debug(f"HTTP 缓存: {self.path}", extra={"spider": spider})
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " spider TEXT NOT NULL,"
+            " fingerprint BLOB NOT NULL,"
+            " url TEXT NOT NULL,"
+            " status INTEGER NOT NULL,"
+            " headers BLOB NOT NULL,"
+            " body BLOB NOT NULL,"
+            " stored REAL NOT NULL,"
+            " PRIMARY KEY (spider, fingerprint)"
+            ")"
+        )
+        conn.commit()
+        return conn
+
+    def close_spider(self, spider):
+        entry = self.entry
+        self.conn.commit()
+        entry[2] = 0
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self._shared[self.path]
+            self.conn.close()
+        self.conn = None
+        self.entry = None
+
+    def retrieve_response(self, spider, request):
+        row = self.conn.execute(
+            "SELECT url, status, headers, body, stored FROM responses WHERE spider = ? AND fingerprint = ?",
+            (spider.name, self._fingerprinter.fingerprint(request)),
+        ).fetchone()
+        if row is None:
+            return None
+        url, status, raw_headers, body, stored = row
+        if 0 < self.expiration_secs < time() - stored:
+            return None
+        headers = Headers(headers_raw_to_dict(raw_headers))
+        body = zlib.decompress(body)
+        request.meta["cache_timestamp"] = stored
+        respcls = responsetypes.from_args(headers=headers, url=url, body=body)
+        return respcls(url=url, status=status, headers=headers, body=body)
+
+    def store_response(self, spider, request, response):
+        body = zlib.compress(response.body, self.level)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO responses (spider, fingerprint, url, status, headers, body, stored)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                spider.name,
+                self._fingerprinter.fingerprint(request),
+                response.url,
+                response.status,
+                headers_dict_to_raw(response.headers),
+                body,
+                time(),
+            ),
+        )
+        self.stats.inc_value("httpcache/body_bytes", len(response.body))
+        self.stats.inc_value("httpcache/stored_bytes", len(body))
+        self.entry[2] += 1
+        if self.entry[2] >= self.batch_size:
+            self.conn.commit()
+            self.entry[2] = 0
+
+
+class AntCachePolicy(RFC2616Policy):
+    """
+    按列表页 / 详情页设定有效期的缓存策略
+
+    有效期（秒）：列表页 HTTPCACHE_LIST_TTL（默认 600），其他请求 HTTPCACHE_DETAIL_TTL（默认 30 天），
+    可在爬虫的 custom_settings 中分别设置，单个请求可用 meta["cache_ttl"] 指定。
+    缓存的 200 响应即使没有 ETag / Last-Modified 也保存，过期后没有校验信息的直接重新下载。
+    """
+
+    CACHEABLE_STATUSES = {200, 203, 300, 301, 308}
+
+    def __init__(self, settings):
+        super().__init__(settings)
+        self.list_ttl = settings.getint("HTTPCACHE_LIST_TTL", 600)
+        self.detail_ttl = settings.getint("HTTPCACHE_DETAIL_TTL", 30 * 24 * 3600)
+        self.ignore_http_codes = [int(code) for code in settings.getlist("HTTPCACHE_IGNORE_HTTP_CODES")]
+
+    def ttl(self, request):
+        if "cache_ttl" in request.meta:
+            return request.meta["cache_ttl"]
+        if "page_number" in request.meta:
+            return self.list_ttl
+        return self.detail_ttl
+
+    def should_cache_response(self, response, request):
+        if response.status in self.ignore_http_codes:
+            return False
+        if b"no-store" in self._parse_cachecontrol(response):
+            return False
+        return response.status in self.CACHEABLE_STATUSES
+
+    def is_cached_response_fresh(self, cachedresponse, request):
+        if b"no-cache" in self._parse_cachecontrol(request):
+            return False
+        stored = request.meta.get("cache_timestamp")
+        if stored is not None:
+            age = time() - stored
+        else:
+            age = self._compute_current_age(cachedresponse, request, time())
+        if age < self.ttl(request):
+            return True
+        # 已过期：带上校验信息重新请求，返回 304 时仍使用缓存
+        self._set_conditional_validators(request, cachedresponse)
+        return False
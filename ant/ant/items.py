@@ -18,4 +18,10 @@ class AntItem(scrapy.Item):
     # 状态
     status = scrapy.Field()
     # 内容
-    content = scrapy.Field()
\ No newline at end of file
+    content = scrapy.Field()
+    # 命中的订阅规则 ID
+    subscriptions = scrapy.Field()
+    # 命中的订阅者
+    subscribers = scrapy.Field()
+    # 近似重复聚类 ID，同一招标在不同平台的公告相同
+    cluster_id = scrapy.Field()
@@ -0,0 +1,182 @@
+# 关键字匹配
+#
+# 所有列表爬虫共用同一份关键字列表和同一个编译好的 Aho-Corasick 自动机，
+# 标题只需扫描一遍即可得到全部命中的关键字，耗时与关键字数量基本无关。
+
+import re
+
+# 关键字列表，用于筛选标题
+KEYWORDS = (
+    '设计施工总承包',
+    'epc',
+    '增容',
+    '配电',
+    '电力',
+    '设计',
+    '光伏',
+    '新能源',
+    '储能',
+    '线路',
+    '迁改',
+    '架空',
+    '送出',
+    '升压站',
+    '输变电',
+    '变电站',
+    '断路器',
+    '接入系统',
+    '电能质量评估',
+    '光储充',
+    '风储',
+    '渔光互补',
+    '风电',
+    '锂电',
+    '可研',
+    '大修',
+)
+
+# 全角字符（！到～）映射为半角，全角空格映射为普通空格
+_WIDTH_TABLE = {code: code - 0xFEE0 for code in range(0xFF01, 0xFF5F)}
+_WIDTH_TABLE[0x3000] = 0x20
+# 含中文的字符串整体 translate() 很慢，只替换其中的全角片段
+_WIDE_RE = re.compile('[\uff01-\uff5e\u3000]+')
+
+
+def _narrow(match):
+    return match.group().translate(_WIDTH_TABLE)
+
+
+def fold(text):
+    """
+    统一大小写和全角/半角，用于关键字匹配
+    """
+    return _WIDE_RE.sub(_narrow, text).lower()
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick 关键字匹配器
+
+    构造时编译一次自动机，之后每个标题只扫描一遍。
+    匹配前对关键字和标题都做 fold()，因此不区分大小写和全角/半角。
+
+    关键字很少时逐个用 `in` 查找（C 实现）反而比逐字符走自动机快，
+    因此不超过 scan_threshold 个关键字时 findall() 改用预先折叠好的关键字直接查找。
+    """
+
+    _cache = {}
+    scan_threshold = 80
+
+    def __init__(self, keywords):
+        self.keywords = tuple(keywords)
+        self._folded = tuple((keyword, fold(keyword)) for keyword in self.keywords if keyword)
+        self.use_automaton = len(self._folded) > self.scan_threshold
+        # goto[state] 为该状态的转移表，out[state] 为在该状态结束的关键字下标
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        for index, keyword in enumerate(self.keywords):
+            self._add(fold(keyword), index)
+        self._build()
+
+    @classmethod
+    def for_keywords(cls, keywords):
+        """
+        按关键字列表缓存匹配器，相同列表只编译一次
+        """
+        key = tuple(keywords)
+        matcher = cls._cache.get(key)
+        if matcher is None:
+            matcher = cls._cache[key] = cls(key)
+        return matcher
+
+    def _add(self, keyword, index):
+        if not keyword:
+            return
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = next_state
+        self._out[state] += (index,)
+
+    def _build(self):
+        # 广度优先计算失败指针，并把失败链上的输出合并到当前状态
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        queue = list(goto[0].values())
+        for state in queue:
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                target = fail[state]
+                while target and char not in goto[target]:
+                    target = fail[target]
+                target = goto[target].get(char, 0)
+                fail[next_state] = target
+                if out[target]:
+                    out[next_state] += out[target]
+        # 展开失败链得到确定性转移表：_delta[state] 只保存到非根子状态的转移，
+        # 其余字符直接按根状态的转移处理，因此每个字符只需一到两次字典查找
+        self._root = goto[0]
+        self._delta = [None] * len(goto)
+        self._delta[0] = {}
+        for state in queue:
+            parent = fail[state]
+            delta = dict(self._delta[parent]) if parent else {}
+            delta.update(goto[state])
+            self._delta[state] = delta
+        # 有输出的状态，扫描结束后与经过的状态求交集
+        self._terminals = frozenset(state for state, found in enumerate(out) if found)
+
+    def findall(self, text):
+        """
+        返回 text 中出现的全部关键字，按关键字列表中的顺序排列
+        """
+        if not text:
+            return []
+        if not self.use_automaton:
+            text = fold(text)
+            return [keyword for keyword, folded in self._folded if folded in text]
+        return self.scan(text)
+
+    def scan(self, text):
+        """
+        用自动机扫描一遍 text，返回全部匹配的关键字
+        """
+        delta = self._delta
+        root = self._root
+        out = self._out
+        state = 0
+        visited = [state := (delta[state].get(char) or root.get(char, 0)) for char in fold(text)]
+        found = set()
+        for state in self._terminals.intersection(visited):
+            found.update(out[state])
+        if not found:
+            return []
+        keywords = self.keywords
+        return [keywords[index] for index in sorted(found)]
+
+    def search(self, text):
+        """
+        text 中是否出现任一关键字
+        """
+        if not text:
+            return False
+        if not self.use_automaton:
+            text = fold(text)
+            return any(folded in text for _, folded in self._folded)
+        delta = self._delta
+        root = self._root
+        out = self._out
+        state = 0
+        for char in fold(text):
+            state = delta[state].get(char) or root.get(char, 0)
+            if out[state]:
+                return True
+        return False
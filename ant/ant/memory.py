@@ -0,0 +1,238 @@
+# 内存观测
+#
+# 长时间运行时内存缓慢上涨：CtgSpider 把整个 AntItem 放在 meta["item"] 里带到 parse_detail，
+# ApiSpider 在每条 item 上保留完整的 raw 记录，排队的详情页请求越多，占用越多。
+#
+# MemoryWatch（MEMWATCH_ENABLED）定期做 tracemalloc 快照，与上一次快照比较，在日志中列出
+# 增长最多的分配位置，爬虫关闭时再与第一次快照比较；同时统计存活的 Request / Response / Item 个数
+# （scrapy.utils.trackref，请求和响应按回调所属的爬虫拆分）和存活请求 meta 的大致字节数。
+# 分配位置是整个进程的，crawlall 中每个爬虫看到的相同。
+#
+# META_BUDGET_MB 不为 0 时，meta 超出预算 MemoryWatch 会告警；MetaBudgetMiddleware 暂缓翻页请求
+# （新详情页请求的来源），让已经排队的请求先消化。暂停整个引擎不行：排队的请求也就不再下载，永远降不下来。
+
+import sys
+import tracemalloc
+from collections import Counter, deque
+from time import monotonic
+
+from scrapy import Item, Request, signals
+from scrapy.exceptions import NotConfigured
+from scrapy.http import Response
+from scrapy.utils import trackref
+from scrapy.utils.asyncio import sleep
+from twisted.internet import task
+
+# 快照中不统计的分配位置
+SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def deep_size(obj):
+    """
+    obj 及其包含的 dict / list / tuple / set / Item 的大致字节数（sys.getsizeof 之和，共享的对象只算一次）
+    """
+    seen = set()
+    pending = [obj]
+    size = 0
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            pending.extend(obj.keys())
+            pending.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+            pending.extend(obj)
+        elif isinstance(obj, Item):
+            pending.append(obj._values)
+    return size
+
+
+def owner(request):
+    """
+    请求的回调所属的爬虫，回调不是爬虫方法时为 None
+    """
+    if request is None:
+        return None
+    return getattr(request.callback, "__self__", None) or getattr(request.errback, "__self__", None)
+
+
+def live_requests(spider):
+    for cls, refs in list(trackref.live_refs.items()):
+        if issubclass(cls, Request):
+            for request in list(refs):
+                if owner(request) is spider:
+                    yield request
+
+
+def live_objects(spider):
+    """
+    存活对象个数：{"Request": n, "Response": n, "Item": n}
+
+    请求和响应只算回调属于 spider 的；Item 无法区分爬虫，是整个进程的。
+    """
+    counts = Counter()
+    for cls, refs in list(trackref.live_refs.items()):
+        if issubclass(cls, Request):
+            counts["Request"] += sum(1 for request in list(refs) if owner(request) is spider)
+        elif issubclass(cls, Response):
+            counts["Response"] += sum(1 for response in list(refs) if owner(response.request) is spider)
+        elif issubclass(cls, Item):
+            counts["Item"] += len(refs)
+    return counts
+
+
+def meta_bytes(spider):
+    """
+    回调属于 spider 的存活请求的 meta 总字节数（估计值）
+    """
+    return sum(deep_size(request.meta) for request in live_requests(spider))
+
+
+class MemoryWatch:
+    """
+    定期记录 tracemalloc 快照的差异、存活对象个数和请求 meta 大小（MEMWATCH_ENABLED 开启）
+
+    统计项：memory/traced_mb、memory/peak_mb、memory/live/<类型>、memory/meta_kb、memory/meta_max_kb；
+    爬虫关闭时增长最多的分配位置写入 memory/top_growth。
+    """
+
+    # 开启了 tracemalloc 的 MemoryWatch 个数，最后一个关闭时停止跟踪
+    _tracing = [0]
+
+    def __init__(self, crawler, interval=60.0, top=10, frames=1, budget=0):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.interval = interval
+        self.top = top
+        self.frames = frames
+        self.budget = budget
+        self.first = None
+        self.previous = None
+        self.started_tracing = False
+        self.timer = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("MEMWATCH_ENABLED"):
+            raise NotConfigured("未开启 MEMWATCH_ENABLED")
+        s = cls(
+            crawler,
+            interval=settings.getfloat("MEMWATCH_INTERVAL", 60),
+            top=settings.getint("MEMWATCH_TOP", 10),
+            frames=settings.getint("MEMWATCH_FRAMES", 1),
+            budget=settings.getfloat("META_BUDGET_MB", 0) * 1024 * 1024,
+        )
+        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    def _snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+
+    def _growth(self, snapshot, baseline):
+        return [stat for stat in snapshot.compare_to(baseline, "lineno") if stat.size_diff > 0][: self.top]
+
+    def spider_opened(self, spider):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self.started_tracing = True
+        self._tracing[0] += 1
+        self.first = self.previous = self._snapshot()
+        self.timer = task.LoopingCall(self.report)
+        self.timer.start(self.interval, now=False)
+        spider.logger.info(f"内存观测已开启：每 {self.interval:g} 秒比较一次 tracemalloc 快照")
+
+    def report(self):
+        spider = self.crawler.spider
+        current, peak = tracemalloc.get_traced_memory()
+        self.stats.set_value("memory/traced_mb", round(current / 1024 / 1024, 1))
+        self.stats.max_value("memory/peak_mb", round(peak / 1024 / 1024, 1))
+        counts = live_objects(spider)
+        for name, count in counts.items():
+            self.stats.set_value(f"memory/live/{name}", count)
+        size = meta_bytes(spider)
+        self.stats.set_value("memory/meta_kb", round(size / 1024))
+        self.stats.max_value("memory/meta_max_kb", round(size / 1024))
+
+        snapshot = self._snapshot()
+        growth = self._growth(snapshot, self.previous)
+        self.previous = snapshot
+        lines = "\n".join(f"  {stat}" for stat in growth)
+        spider.logger.info(
+            f"内存 {current / 1024 / 1024:.1f} MB（峰值 {peak / 1024 / 1024:.1f} MB），"
+            f"存活 {dict(counts)}，请求 meta {size / 1024:.0f} KB；增长最多的分配位置：\n{lines}"
+        )
+        if self.budget and size > self.budget:
+            self.stats.inc_value("memory/meta_over_budget")
+            spider.logger.warning(f"存活请求的 meta 共 {size / 1024 / 1024:.1f} MB，超过预算 {self.budget / 1024 / 1024:g} MB")
+
+    def spider_closed(self, spider):
+        if self.timer is not None and self.timer.running:
+            self.timer.stop()
+        if self.first is not None and tracemalloc.is_tracing():
+            self.report()
+            growth = self._growth(self.previous, self.first)
+            self.stats.set_value("memory/top_growth", [str(stat) for stat in growth])
+            lines = "\n".join(f"  {stat}" for stat in growth)
+            spider.logger.info(f"整个运行期间增长最多的分配位置：\n{lines}")
+        self._tracing[0] -= 1
+        if self._tracing[0] <= 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+class MetaBudgetMiddleware:
+    """
+    存活请求的 meta 超过 META_BUDGET_MB 时暂缓翻页请求（meta 中有 page_number 的请求）
+
+    暂缓期间已经排队的详情页请求照常下载、解析，meta 降到预算以内后放行；最多等待
+    META_BUDGET_MAX_WAIT 秒，避免预算设得过低时爬取停住。其他请求不受影响。
+    应排在 PageCancelMiddleware（100）之前，等待期间被取消的页才会在放行后丢弃。
+    """
+
+    def __init__(self, crawler, budget, max_wait=60.0):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.budget = budget
+        self.max_wait = max_wait
+        self.checked_at = float("-inf")
+        self.size = 0
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        budget = settings.getfloat("META_BUDGET_MB", 0) * 1024 * 1024
+        if not budget:
+            raise NotConfigured("未设置 META_BUDGET_MB")
+        return cls(crawler, budget, settings.getfloat("META_BUDGET_MAX_WAIT", 60))
+
+    def _meta_bytes(self):
+        # 遍历存活请求的开销与请求数成正比，一秒内只算一次
+        now = monotonic()
+        if now - self.checked_at >= 1.0:
+            self.size = meta_bytes(self.crawler.spider)
+            self.checked_at = now
+        return self.size
+
+    async def process_request(self, request):
+        if "page_number" not in request.meta or self._meta_bytes() <= self.budget:
+            return None
+        self.stats.inc_value("memory/backpressure")
+        started = monotonic()
+        while self._meta_bytes() > self.budget:
+            if monotonic() - started >= self.max_wait:
+                self.crawler.spider.logger.warning(
+                    f"请求 meta 等待 {self.max_wait:g} 秒仍超过预算（{self.size / 1024 / 1024:.1f} MB），放行第 {request.meta['page_number']} 页"
+                )
+                break
+            await sleep(1.0)
+        self.stats.inc_value("memory/backpressure_seconds", round(monotonic() - started, 1))
+        return None
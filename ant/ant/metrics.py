@@ -0,0 +1,141 @@
+# 解析回调的运行指标
+#
+# 原来只能从 logger.info 的文字里看出爬虫在做什么。AntSpiderMiddleware 为每个回调
+# （parse、parse_page、parse_detail……）记录调用次数、耗时、响应大小、产出的 item 和请求数，
+# 以及回调中各条记录的去向：爬虫在解析时把看到的条数和丢弃的原因计入统计（ROW_STATS），
+# 中间件按回调拆分。结果写入 Scrapy 统计 callback/<回调>/...，配置 METRICS_FILE 时
+# 再定期写出 Prometheus 文本格式（可由 node_exporter 的 textfile collector 采集）。
+
+import os
+import time
+
+# 记录去向 -> 爬虫计入的统计项
+ROW_STATS = {
+    "seen": "rows/seen",
+    "dropped_keyword": "rows/dropped/keyword",
+    "dropped_date": "rows/dropped/date",
+    "dropped_status": "rows/dropped/status",
+    "dropped_checkpoint": "checkpoint/covered",
+    "dropped_seen": "seen/skipped",
+}
+
+# 按响应大小分组统计解析耗时（上限，字节）
+SIZE_BUCKETS = (16 * 1024, 64 * 1024, 256 * 1024, 1024 * 1024, float("inf"))
+
+
+def size_label(size):
+    for bound in SIZE_BUCKETS:
+        if size <= bound:
+            return "+Inf" if bound == float("inf") else str(bound)
+
+
+class CallbackMetrics:
+    """
+    一个回调的累计指标
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.response_bytes = 0
+        self.items = 0
+        self.requests = 0
+        self.errors = 0
+        # 被抽中剖析、不计入 calls 和耗时的调用
+        self.profiled = 0
+        self.rows = dict.fromkeys(ROW_STATS, 0)
+        # 响应大小分组 -> [调用次数, 耗时]
+        self.by_size = {}
+
+    def record(self, seconds, size):
+        self.calls += 1
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.response_bytes += size
+        bucket = self.by_size.setdefault(size_label(size), [0, 0.0])
+        bucket[0] += 1
+        bucket[1] += seconds
+
+    def stats(self):
+        """
+        写入 Scrapy 统计的各项（不含 callback/<回调>/ 前缀）
+        """
+        values = {
+            "calls": self.calls,
+            "seconds": round(self.seconds, 3),
+            "max_ms": round(self.max_seconds * 1000, 1),
+            "response_bytes": self.response_bytes,
+            "items": self.items,
+            "requests": self.requests,
+        }
+        if self.errors:
+            values["errors"] = self.errors
+        if self.profiled:
+            values["profiled"] = self.profiled
+        if self.response_bytes:
+            values["ms_per_kb"] = round(self.seconds * 1000 / (self.response_bytes / 1024), 3)
+        if self.seconds:
+            values["items_per_s"] = round(self.items / self.seconds, 1)
+        values.update((f"rows/{name}", count) for name, count in self.rows.items() if count)
+        return values
+
+
+def _labels(**labels):
+    return ",".join(f'{key}="{value}"' for key, value in labels.items())
+
+
+def prometheus_text(spider, callbacks, items_scraped=0):
+    """
+    按 Prometheus 文本格式输出一个爬虫各回调的指标
+    """
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            lines.append(f"{name}{{{labels}}} {value}")
+
+    def per_callback(attribute):
+        return [(_labels(spider=spider, callback=name), getattr(m, attribute)) for name, m in sorted(callbacks.items())]
+
+    metric("ant_callback_calls_total", "counter", "回调调用次数（不含抽中剖析的调用）", per_callback("calls"))
+    metric("ant_callback_profiled_total", "counter", "抽中剖析、不计入耗时的回调调用次数", per_callback("profiled"))
+    metric("ant_callback_seconds_total", "counter", "回调耗时（秒）", [(labels, round(value, 6)) for labels, value in per_callback("seconds")])
+    metric("ant_callback_max_seconds", "gauge", "单次回调最长耗时（秒）", [(labels, round(value, 6)) for labels, value in per_callback("max_seconds")])
+    metric("ant_callback_response_bytes_total", "counter", "回调处理的响应大小（字节）", per_callback("response_bytes"))
+    metric("ant_callback_items_total", "counter", "回调产出的 item 数", per_callback("items"))
+    metric("ant_callback_requests_total", "counter", "回调产出的请求数", per_callback("requests"))
+    metric("ant_callback_errors_total", "counter", "回调抛出的异常数", per_callback("errors"))
+    metric(
+        "ant_callback_rows_total",
+        "counter",
+        "回调看到的记录按去向计数",
+        [
+            (_labels(spider=spider, callback=name, outcome=outcome), count)
+            for name, m in sorted(callbacks.items())
+            for outcome, count in m.rows.items()
+        ],
+    )
+    size_samples = []
+    for name, m in sorted(callbacks.items()):
+        for label in sorted(m.by_size, key=lambda label: float(label)):
+            calls, seconds = m.by_size[label]
+            size_samples.append((_labels(spider=spider, callback=name, size_le=label), calls, round(seconds, 6)))
+    metric("ant_callback_size_calls_total", "counter", "按响应大小分组的回调次数", [(labels, calls) for labels, calls, _ in size_samples])
+    metric("ant_callback_size_seconds_total", "counter", "按响应大小分组的回调耗时（秒）", [(labels, seconds) for labels, _, seconds in size_samples])
+    metric("ant_items_scraped_total", "counter", "通过管道的 item 数", [(_labels(spider=spider), items_scraped)])
+    metric("ant_metrics_timestamp_seconds", "gauge", "指标写出时间", [(_labels(spider=spider), round(time.time(), 3))])
+    return "\n".join(lines) + "\n"
+
+
+def write_atomic(path, text):
+    """
+    先写临时文件再改名，采集方不会读到写了一半的文件
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
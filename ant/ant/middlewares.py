@@ -3,98 +3,325 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
-from scrapy import signals
+from time import monotonic, perf_counter
+
+from scrapy import Request, signals
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.utils.asyncio import sleep
+from scrapy.utils.httpobj import urlparse_cached
+from scrapy.utils.project import data_path
+from twisted.internet import task
 
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
 
+from ant.metrics import ROW_STATS, CallbackMetrics, prometheus_text, write_atomic
+from ant.pagination import PageWindow
+from ant.profiling import PROFILED_META
+from ant.throttle import AimdController, TokenBucket, domain_limit, percentile
+
 
 class AntSpiderMiddleware:
-    # Not all methods need to be defined. If a method is not defined,
-    # scrapy acts as if the spider middleware does not modify the
-    # passed objects.
+    """
+    解析回调的运行指标（见 ant/metrics.py）
+
+    回调是生成器，耗时按逐条取出产出时在回调中花的时间累计；同时记录响应大小、产出的
+    item 和请求数，以及每次取出期间爬虫计入 ROW_STATS 的增量。应放在除 ProfilingMiddleware
+    以外最靠近爬虫的位置，计时才不包含其他中间件；被 ProfilingMiddleware 抽中剖析的调用
+    包含剖析的开销，只计入 profiled，不计入调用次数和耗时。METRICS_FILE 不为空时
+    每 METRICS_INTERVAL 秒写出一次 Prometheus 文本，文件名中的 {spider} 替换为爬虫名。
+    """
+
+    def __init__(self, crawler, path=None, interval=15.0):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.path = path
+        self.interval = interval
+        self.callbacks = {}
+        self.timer = None
 
     @classmethod
     def from_crawler(cls, crawler):
-        # This method is used by Scrapy to create your spiders.
-        s = cls()
+        settings = crawler.settings
+        s = cls(crawler, settings.get("METRICS_FILE"), settings.getfloat("METRICS_INTERVAL", 15))
         crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
         return s
 
-    def process_spider_input(self, response, spider):
-        # Called for each response that goes through the spider
-        # middleware and into the spider.
+    def _callback(self, response):
+        request = getattr(response, "request", None)
+        callback = request.callback if request is not None else None
+        name = getattr(callback, "__name__", None) or "parse"
+        metrics = self.callbacks.get(name)
+        if metrics is None:
+            metrics = self.callbacks[name] = CallbackMetrics()
+        return name, metrics
 
-        # Should return None or raise an exception.
-        return None
+    def _rows(self):
+        get_value = self.stats.get_value
+        return [get_value(stat, 0) for stat in ROW_STATS.values()]
 
-    def process_spider_output(self, response, result, spider):
-        # Called with the results returned from the Spider, after
-        # it has processed the response.
+    def _count_rows(self, metrics, rows_before):
+        for name, before, after in zip(ROW_STATS, rows_before, self._rows()):
+            metrics.rows[name] += after - before
 
-        # Must return an iterable of Request, or item objects.
-        for i in result:
-            yield i
+    def _count(self, metrics, output):
+        if isinstance(output, Request):
+            metrics.requests += 1
+        else:
+            metrics.items += 1
 
-    def process_spider_exception(self, response, exception, spider):
-        # Called when a spider or process_spider_input() method
-        # (from other spider middleware) raises an exception.
+    def _finish(self, name, metrics, seconds, response):
+        request = getattr(response, "request", None)
+        if request is not None and request.meta.get(PROFILED_META):
+            # ProfilingMiddleware 在回调开始执行时才决定是否抽中，这里在回调结束后检查
+            metrics.profiled += 1
+        else:
+            metrics.record(seconds, len(getattr(response, "body", b"")))
+        for key, value in metrics.stats().items():
+            self.stats.set_value(f"callback/{name}/{key}", value)
 
-        # Should return either None or an iterable of Request or item objects.
-        pass
+    def process_spider_output(self, response, result):
+        name, metrics = self._callback(response)
+        seconds = 0.0
+        iterator = iter(result)
+        try:
+            while True:
+                rows = self._rows()
+                started = perf_counter()
+                try:
+                    output = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    seconds += perf_counter() - started
+                    # 最后一次取出（回调结束）期间计入的记录也要算上
+                    self._count_rows(metrics, rows)
+                self._count(metrics, output)
+                yield output
+        except Exception:
+            metrics.errors += 1
+            raise
+        finally:
+            self._finish(name, metrics, seconds, response)
 
-    async def process_start(self, start):
-        # Called with an async iterator over the spider start() method or the
-        # matching method of an earlier spider middleware.
-        async for item_or_request in start:
-            yield item_or_request
+    async def process_spider_output_async(self, response, result):
+        name, metrics = self._callback(response)
+        seconds = 0.0
+        iterator = result.__aiter__()
+        try:
+            while True:
+                rows = self._rows()
+                started = perf_counter()
+                try:
+                    output = await iterator.__anext__()
+                except StopAsyncIteration:
+                    break
+                finally:
+                    seconds += perf_counter() - started
+                    # 最后一次取出（回调结束）期间计入的记录也要算上
+                    self._count_rows(metrics, rows)
+                self._count(metrics, output)
+                yield output
+        except Exception:
+            metrics.errors += 1
+            raise
+        finally:
+            self._finish(name, metrics, seconds, response)
+
+    def write_metrics(self):
+        spider = self.crawler.spider
+        text = prometheus_text(spider.name, self.callbacks, self.stats.get_value("item_scraped_count", 0))
+        write_atomic(self.metrics_path, text)
 
     def spider_opened(self, spider):
-        spider.logger.info("Spider opened: %s" % spider.name)
+        if not self.path:
+            return
+        self.metrics_path = data_path(self.path.replace("{spider}", spider.name))
+        self.timer = task.LoopingCall(self.write_metrics)
+        self.timer.start(self.interval, now=False)
+        spider.logger.info(f"运行指标每 {self.interval:g} 秒写入 {self.metrics_path}")
+
+    def spider_closed(self, spider):
+        if self.timer is None:
+            return
+        if self.timer.running:
+            self.timer.stop()
+        self.write_metrics()
 
 
 class AntDownloaderMiddleware:
-    # Not all methods need to be defined. If a method is not defined,
-    # scrapy acts as if the downloader middleware does not modify the
-    # passed objects.
+    """
+    按域名的 AIMD 自适应限速（AIMD_ENABLED 开启）
+
+    每个下载槽（通常即域名）一个 AimdController（见 ant/throttle.py），根据响应延迟、
+    429 / 5xx 和下载异常实时调整下载槽的 delay 和并发数，当前速率写入统计
+    aimd/<域名>/rate。DOMAIN_RATE_LIMITS 中配置了固定速率的域名不参与调整，
+    缓存命中的响应也不计入。与 AutoThrottle 同时启用时两者会互相覆盖 delay，只应开启一个。
+    优先级须高于 RetryMiddleware（550），否则重试的 429 / 5xx 响应和异常到不了这里。
+    """
+
+    THROTTLE_CODES = {429, 503}
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.static_domains = {domain.lower() for domain in settings.getdict("DOMAIN_RATE_LIMITS")}
+        delay = settings.getfloat("DOWNLOAD_DELAY")
+        self.options = {
+            "rate": settings.getfloat("AIMD_START_RATE", 1 / delay if delay else 1.0),
+            "min_rate": settings.getfloat("AIMD_MIN_RATE", 0.1),
+            "max_rate": settings.getfloat("AIMD_MAX_RATE", 20.0),
+            "increase": settings.getfloat("AIMD_INCREASE", 0.2),
+            "decrease": settings.getfloat("AIMD_DECREASE", 0.5),
+            "window": settings.getint("AIMD_WINDOW", 20),
+            "latency_factor": settings.getfloat("AIMD_LATENCY_FACTOR", 3.0),
+            "max_concurrency": settings.getint("AIMD_MAX_CONCURRENCY", 8),
+        }
+        self.controllers = {}
 
     @classmethod
     def from_crawler(cls, crawler):
-        # This method is used by Scrapy to create your spiders.
-        s = cls()
+        if not crawler.settings.getbool("AIMD_ENABLED"):
+            raise NotConfigured("未开启 AIMD_ENABLED")
+        s = cls(crawler)
         crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
         return s
 
-    def process_request(self, request, spider):
-        # Called for each request that goes through the downloader
-        # middleware.
+    def _controller(self, request):
+        key = request.meta.get("download_slot")
+        if key is None or key in self.static_domains:
+            return None, None
+        slot = self.crawler.engine.downloader.slots.get(key)
+        if slot is None:
+            return None, None
+        controller = self.controllers.get(key)
+        if controller is None:
+            controller = self.controllers[key] = AimdController(**self.options)
+            self._apply(key, slot, controller)
+        return key, controller
 
-        # Must either:
-        # - return None: continue processing this request
-        # - or return a Response object
-        # - or return a Request object
-        # - or raise IgnoreRequest: process_exception() methods of
-        #   installed downloader middleware will be called
-        return None
+    def _apply(self, key, slot, controller):
+        slot.delay = controller.delay
+        slot.concurrency = controller.concurrency
+        self.stats.set_value(f"aimd/{key}/rate", round(controller.rate, 2))
+        self.stats.set_value(f"aimd/{key}/concurrency", slot.concurrency)
+        self.stats.set_value(f"aimd/{key}/decreases", controller.decreases)
+        if controller.latencies:
+            self.stats.set_value(f"aimd/{key}/p50_ms", round(percentile(controller.latencies, 0.5) * 1000))
+            self.stats.set_value(f"aimd/{key}/p95_ms", round(percentile(controller.latencies, 0.95) * 1000))
 
-    def process_response(self, request, response, spider):
-        # Called with the response returned from the downloader.
+    def process_request(self, request):
+        request.meta["aimd_sent"] = monotonic()
+        return None
 
-        # Must either;
-        # - return a Response object
-        # - return a Request object
-        # - or raise IgnoreRequest
+    def process_response(self, request, response):
+        if "cached" in response.flags or "aimd_sent" not in request.meta:
+            return response
+        key, controller = self._controller(request)
+        if controller is None:
+            return response
+        sent_at = request.meta["aimd_sent"]
+        if response.status in self.THROTTLE_CODES or response.status >= 500:
+            self.stats.inc_value(f"aimd/{key}/throttled")
+            retry_after = response.headers.get(b"Retry-After")
+            retry_after = float(retry_after) if retry_after and retry_after.isdigit() else None
+            changed = controller.on_congestion(sent_at, retry_after=retry_after)
+        else:
+            latency = request.meta.get("download_latency", monotonic() - sent_at)
+            changed = controller.on_response(latency, sent_at)
+        if changed:
+            slot = self.crawler.engine.downloader.slots.get(key)
+            if slot is not None:
+                self._apply(key, slot, controller)
+                self.crawler.spider.logger.debug(f"{key} 速率调整为 {controller.rate:.2f}/s，并发 {slot.concurrency}")
         return response
 
-    def process_exception(self, request, exception, spider):
-        # Called when a download handler or a process_request()
-        # (from other downloader middleware) raises an exception.
+    def process_exception(self, request, exception):
+        if "aimd_sent" not in request.meta or isinstance(exception, IgnoreRequest):
+            return None
+        key, controller = self._controller(request)
+        if controller is None:
+            return None
+        self.stats.inc_value(f"aimd/{key}/errors")
+        slot = self.crawler.engine.downloader.slots.get(key)
+        if controller.on_congestion(request.meta["aimd_sent"]) and slot is not None:
+            self._apply(key, slot, controller)
+        return None
+
+    def spider_opened(self, spider):
+        spider.logger.info(f"AIMD 限速已开启: {self.options}")
+
+
+class PageCancelMiddleware:
+    """
+    下载前丢弃已经不需要的翻页请求
 
-        # Must either:
-        # - return None: continue processing this exception
-        # - return a Response object: stops process_exception() chain
-        # - return a Request object: stops process_exception() chain
-        pass
+    爬虫的 pages（ant.pagination.PageWindow）记录了截止页，
+    请求 meta 中的 page_number 在截止页之后时直接忽略，不再下载。
+    """
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.stats = crawler.stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def process_request(self, request):
+        page_number = request.meta.get("page_number")
+        pages = getattr(self.crawler.spider, "pages", None)
+        if page_number is None or not isinstance(pages, PageWindow):
+            return None
+        if pages.cancelled(page_number):
+            self.stats.inc_value("pagination/cancelled")
+            raise IgnoreRequest(f"第 {page_number} 页在截止页 {pages.stop_page} 之后")
+        return None
+
+
+class TokenBucketMiddleware:
+    """
+    按域名的令牌桶限速
+
+    DOMAIN_RATE_LIMITS（以及爬虫的 rate_limits 属性，优先）为 {域名: {"rate", "burst", "concurrency"}}，
+    见 ant/throttle.py。配置了的域名对应的下载槽去掉 DOWNLOAD_DELAY、并发数改为 concurrency，
+    请求在下载前等待令牌；没有配置的域名不受影响。
+    应排在 HttpCacheMiddleware（900）之后，缓存命中的请求不消耗令牌。
+    """
+
+    def __init__(self, crawler, limits):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.limits = limits
+        self.buckets = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        limits = crawler.settings.getdict("DOMAIN_RATE_LIMITS")
+        s = cls(crawler, {domain.lower(): config for domain, config in limits.items()})
+        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        return s
 
     def spider_opened(self, spider):
-        spider.logger.info("Spider opened: %s" % spider.name)
+        self.limits.update({domain.lower(): config for domain, config in getattr(spider, "rate_limits", {}).items()})
+        downloader = self.crawler.engine.downloader
+        for domain, config in self.limits.items():
+            self.buckets[domain] = TokenBucket(config.get("rate", 0), config.get("burst", 1))
+            slot_settings = {"delay": 0, "concurrency": config.get("concurrency", downloader.domain_concurrency)}
+            downloader.per_slot_settings[domain] = {**slot_settings, **downloader.per_slot_settings.get(domain, {})}
+            spider.logger.info(f"{domain} 限速: {config}")
+
+    async def process_request(self, request):
+        domain, _ = domain_limit(self.limits, urlparse_cached(request).hostname)
+        if domain is None:
+            return None
+        # 子域名也使用该域名的下载槽，并发数按整个域名计算
+        request.meta.setdefault("download_slot", domain)
+        wait = self.buckets[domain].reserve()
+        if wait > 0:
+            self.stats.inc_value("throttle/delayed")
+            self.stats.inc_value("throttle/wait_seconds", wait)
+            await sleep(wait)
+        return None
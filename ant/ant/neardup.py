@@ -0,0 +1,244 @@
+# 近似重复公告聚类
+#
+# 同一个招标常在 ahtba.org.cn、ctg、cnncecp 等多个平台发布，标题略有不同
+# （带不带招标编号、有没有“招标公告”后缀），精确去重识别不出来。
+# 这里对标题和正文的字符片段计算 64 位 SimHash，海明距离不超过 max_distance 的视为同一招标。
+# 64 位按鸽巢原理切成 max_distance + 1 段，距离不超过 max_distance 的两个指纹至少有一段完全相同，
+# 因此只需按段值查找候选（SQLite 索引），再逐个计算海明距离，历史上百万条时每条仍是亚线性开销。
+# 分段方式记录在 meta 表中；修改 max_distance 后再打开同一个文件时，按保存的完整指纹重新计算各段。
+
+import hashlib
+import re
+import sqlite3
+
+from ant.matching import fold
+
+# 招标编号、项目编号等
+_BID_NO_RE = re.compile(r"(?:招标|项目|采购|标段)?(?:编号|编码)[:：]?\s*[a-z0-9][a-z0-9\-_/.]*")
+# 较长的字母数字串（多为编号）
+_CODE_RE = re.compile(r"[a-z0-9][a-z0-9\-_/.]{5,}")
+# 括号中的补充说明，如（重新招标）、【二次】
+_BRACKET_RE = re.compile(r"[(（【\[][^)）】\]]*[)）】\]]")
+# 结尾的公告类型
+_SUFFIX_RE = re.compile(
+    r"(?:(?:公开|邀请)?(?:招标|采购|比选|询价|谈判|磋商|竞价|中标候选人|中标结果|成交结果|资格预审|变更|澄清))?(?:公告|公示|文件)$"
+)
+_NOISE_RE = re.compile(r"[\s\W_]+")
+
+# 正文最多取前多少个字符
+CONTENT_CHARS = 3000
+
+# 0..255 的每一位展开到 16 位宽的“通道”中，便于用整数加法一次累加 8 个位的计数
+_LANE_BITS = 16
+_SPREAD = [
+    sum(((byte >> bit) & 1) << (bit * _LANE_BITS) for bit in range(8))
+    for byte in range(256)
+]
+_LANE_MASK = (1 << _LANE_BITS) - 1
+
+
+def normalize_title(title):
+    """
+    去掉招标编号、括号说明、公告类型后缀、空白和标点，用于比较标题
+    """
+    text = fold(str(title))
+    text = _BID_NO_RE.sub("", text)
+    text = _BRACKET_RE.sub("", text)
+    text = _CODE_RE.sub("", text)
+    text = _NOISE_RE.sub("", text)
+    # 后缀可能叠加（如“招标公告公示”），去到不能再去为止
+    while True:
+        stripped = _SUFFIX_RE.sub("", text)
+        if stripped == text or not stripped:
+            return text
+        text = stripped
+
+
+def shingles(text, size):
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def simhash(features):
+    """
+    计算 64 位 SimHash
+
+    每个片段的 64 位哈希按字节查表展开为 8 个 16 位通道，所有片段直接整数相加，
+    相当于同时对 64 个位计数，不需要逐位循环。片段数不能超过 65535 个。
+    """
+    features = list(features)
+    if not features:
+        return 0
+    lanes = [0] * 8
+    for feature in features:
+        value = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+        for index in range(8):
+            lanes[index] += _SPREAD[(value >> (index * 8)) & 0xFF]
+    half = len(features) / 2
+    result = 0
+    for index, lane in enumerate(lanes):
+        for bit in range(8):
+            if ((lane >> (bit * _LANE_BITS)) & _LANE_MASK) > half:
+                result |= 1 << (index * 8 + bit)
+    return result
+
+
+def title_simhash(title):
+    text = normalize_title(title) if title else ""
+    return simhash(shingles(text, 2)) if text else None
+
+
+def content_simhash(content, min_length=50):
+    if not content:
+        return None
+    if not isinstance(content, str):
+        content = " ".join(str(part) for part in content)
+    text = _NOISE_RE.sub("", fold(content[:CONTENT_CHARS]))
+    if len(text) < min_length:
+        return None
+    return simhash(shingles(text, 4))
+
+
+def _bands(max_distance):
+    # 把 64 位尽量平均地切成 max_distance + 1 段，返回每段的 (偏移, 掩码)
+    count = max_distance + 1
+    bands = []
+    offset = 0
+    for index in range(count):
+        width = 64 // count + (1 if index < 64 % count else 0)
+        bands.append((offset, (1 << width) - 1))
+        offset += width
+    return bands
+
+
+def _signed(value):
+    # SQLite 的整数是有符号 64 位
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+class NearDupIndex:
+    """
+    SimHash 近似重复索引
+
+    指纹保存在 SQLite 中（path 为 ":memory:" 时只在内存中），每一段单独建索引。
+    kind 区分标题指纹（"t"）和正文指纹（"c"），只在同类指纹之间比较。
+    """
+
+    def __init__(self, path=":memory:", max_distance=3, batch_size=500):
+        self.max_distance = max_distance
+        self.bands = _bands(max_distance)
+        self.batch_size = batch_size
+        self._pending = 0
+        self._query = "SELECT hash, cluster FROM fingerprints WHERE " + " OR ".join(
+            f"(kind = ? AND b{index} = ?)" for index in range(len(self.bands))
+        )
+        self._insert = "INSERT INTO fingerprints (kind, hash, cluster, {}) VALUES (?, ?, ?, {})".format(
+            ", ".join(f"b{index}" for index in range(len(self.bands))),
+            ", ".join("?" for _ in self.bands),
+        )
+        self.rebuilt = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        layout = self._layout(self.bands)
+        stored = self._stored_layout()
+        if stored is not None and stored != layout:
+            self.rebuilt = self._rebuild()
+        self._create_tables()
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('bands', ?)", (layout,))
+        self.conn.commit()
+
+    @staticmethod
+    def _layout(bands):
+        return ",".join(f"{offset}:{mask.bit_length()}" for offset, mask in bands)
+
+    def _stored_layout(self):
+        """
+        文件中指纹表的分段方式；没有 meta 记录的旧文件按指纹表的段列数推算，没有指纹表时返回 None
+        """
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'bands'").fetchone()
+        if row is not None:
+            return row[0]
+        columns = [name for _, name, *_ in self.conn.execute("PRAGMA table_info(fingerprints)")]
+        if not columns:
+            return None
+        return self._layout(_bands(sum(1 for name in columns if re.fullmatch(r"b\d+", name)) - 1))
+
+    def _create_tables(self):
+        columns = ", ".join(f"b{index} INTEGER NOT NULL" for index in range(len(self.bands)))
+        self.conn.execute(
+            f"CREATE TABLE IF NOT EXISTS fingerprints (kind TEXT NOT NULL, hash INTEGER NOT NULL, cluster TEXT NOT NULL, {columns})"
+        )
+        for index in range(len(self.bands)):
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS fingerprints_b{index} ON fingerprints (kind, b{index})")
+
+    def _rebuild(self):
+        """
+        分段方式与当前 max_distance 不同：按保存的完整指纹重建指纹表，返回指纹条数
+        """
+        rows = self.conn.execute("SELECT kind, hash, cluster FROM fingerprints").fetchall()
+        self.conn.execute("DROP TABLE fingerprints")
+        self._create_tables()
+        self.conn.executemany(
+            self._insert,
+            ([kind, stored, cluster, *self._band_values(stored & 0xFFFFFFFFFFFFFFFF)] for kind, stored, cluster in rows),
+        )
+        return len(rows)
+
+    def _band_values(self, value):
+        return [(value >> offset) & mask for offset, mask in self.bands]
+
+    def nearest(self, kind, value):
+        """
+        返回海明距离不超过 max_distance 的最近指纹的 (距离, 聚类 ID)，没有返回 None
+        """
+        params = []
+        for band in self._band_values(value):
+            params.extend((kind, band))
+        best = None
+        for stored, cluster in self.conn.execute(self._query, params):
+            distance = ((stored & 0xFFFFFFFFFFFFFFFF) ^ value).bit_count()
+            if distance <= self.max_distance and (best is None or distance < best[0]):
+                best = (distance, cluster)
+                if distance == 0:
+                    break
+        return best
+
+    def add(self, kind, value, cluster):
+        self.conn.execute(self._insert, [kind, _signed(value), cluster, *self._band_values(value)])
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self.commit()
+
+    def assign(self, title=None, content=None):
+        """
+        为一条公告分配聚类 ID，返回 (聚类 ID, 是否匹配到已有聚类)
+
+        标题或正文任一与已有公告近似即归入该公告的聚类，都没有时新建聚类，
+        聚类 ID 取该公告标题（没有标题时取正文）指纹的十六进制。
+        """
+        fingerprints = [
+            (kind, value)
+            for kind, value in (("t", title_simhash(title)), ("c", content_simhash(content)))
+            if value is not None
+        ]
+        if not fingerprints:
+            return None, False
+        found = {kind: self.nearest(kind, value) for kind, value in fingerprints}
+        best = min((match for match in found.values() if match), default=None)
+        matched = best is not None
+        cluster = best[1] if matched else f"{fingerprints[0][1]:016x}"
+        for kind, value in fingerprints:
+            # 已有完全相同的指纹时不重复保存
+            if found[kind] is None or found[kind][0] > 0:
+                self.add(kind, value, cluster)
+        return cluster, matched
+
+    def commit(self):
+        self.conn.commit()
+        self._pending = 0
+
+    def close(self):
+        self.commit()
+        self.conn.close()
@@ -0,0 +1,398 @@
+# 并发翻页
+#
+# 原来的爬虫都是解析完第 N 页才请求第 N+1 页，整个爬取耗时为 页数 × 往返时间。
+# PageWindow 记录翻页进度，允许同时有多页在途；遇到时间截止或最后一页时调用 stop()，
+# 之后的页不再调度，已经排队的页由 PageCancelMiddleware 在下载前丢弃。
+#
+# - PaginatedApiSpider：接口返回总数时，读到总数后同时请求剩余各页
+# - PaginatedListSpider：列表页地址有规律时，按 URL 模板预先请求后面 K 页
+#
+# 页请求失败（HttpErrorMiddleware 把非 2xx 响应也交给 errback）或接口返回的不是 JSON 时，
+# 在总页数未知的情况下连续失败 PAGE_FAIL_STOP_AFTER 页（默认 1）后停止翻页，否则站点出错或页码越界时
+# 会一直请求下去；总页数已知时只调度到最后一页，个别页失败不影响其他页。
+#
+# 配置了 SEEN_STORE 时，子类可以用 seen_before() / mark_seen() / mark_dropped() 跳过已采集的公告，
+# 连续遇到 SEEN_STOP_AFTER 条已采集的公告后自动停止翻页（见 ant/seen.py）。
+# 配置了 CHECKPOINT_STORE 时，截止时间取 max(上次运行的高水位, 当前时间 - 时间窗口)，
+# 子类用 cutoff_date 判断是否停止翻页，用 checkpoint() 跳过上次已经看过的公告，产出 item 时调用
+# advance_watermark() 记录高水位（见 ant/checkpoints.py）；详情页请求用 detail_failed() 作 errback，
+# 有页或详情页失败时本次运行不更新高水位。
+
+from datetime import datetime, timedelta
+from urllib.parse import parse_qs, urlencode, urlparse, urlunparse
+
+import scrapy
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.spidermiddlewares.httperror import HttpError
+
+from ant.checkpoints import CheckpointStore, Watermark, effective_cutoff
+from ant.seen import SeenRun, SeenStore, filters_fingerprint
+
+
+class PageWindow:
+    """
+    翻页窗口
+
+    size 为同时在途的页数上限；last_page 已知时（接口返回了总数）只调度到最后一页，
+    未知时按 size 预先请求后面的页，直到某一页调用 stop()。
+    """
+
+    def __init__(self, first_page=1, size=1, last_page=None):
+        self.first_page = first_page
+        self.size = size
+        self.last_page = last_page
+        self.next_page = first_page
+        self.stop_page = None
+        self.in_flight = set()
+
+    def take(self):
+        """
+        返回现在可以调度的页码，并把它们记为在途
+        """
+        pages = []
+        while len(self.in_flight) < self.size:
+            page = self.next_page
+            if self.last_page is not None and page > self.last_page:
+                break
+            if self.stop_page is not None and page > self.stop_page:
+                break
+            self.in_flight.add(page)
+            self.next_page += 1
+            pages.append(page)
+        return pages
+
+    def done(self, page):
+        self.in_flight.discard(page)
+
+    def stop(self, page):
+        """
+        page 之后的页不再需要（遇到截止日期或已到最后一页）
+        """
+        if self.stop_page is None or page < self.stop_page:
+            self.stop_page = page
+
+    def cancelled(self, page):
+        return self.stop_page is not None and page > self.stop_page
+
+
+class UrlTemplatePaginator:
+    """
+    按 URL 模板构造列表页地址
+
+    template 中的 {page} 替换为页码；第一页地址与模板不一致时（如 cnncecp 的
+    index.jhtml 与 index_2.jhtml）用 first_url 单独指定。
+    """
+
+    def __init__(self, template, first_page=1, first_url=None):
+        self.template = template
+        self.first_page = first_page
+        self.first_url = first_url
+
+    def url(self, page):
+        if page == self.first_page and self.first_url:
+            return self.first_url
+        return self.template.replace("{page}", str(page))
+
+    @staticmethod
+    def query_template(url, params=("pageNo",)):
+        """
+        把 url 的页码参数替换为 {page}，返回模板
+
+        params 为可能的页码参数名，取 url 中第一个出现的；都没有时添加第一个。
+        """
+        parsed = urlparse(url)
+        query = parse_qs(parsed.query)
+        param = next((name for name in params if name in query), params[0])
+        query[param] = ["__PAGE__"]
+        new_query = urlencode(query, doseq=True).replace("__PAGE__", "{page}")
+        return urlunparse((parsed.scheme, parsed.netloc, parsed.path, parsed.params, new_query, parsed.fragment))
+
+
+class PaginatedSpider(scrapy.Spider):
+    """
+    翻页爬虫基类：维护 PageWindow，调度翻页请求，处理失败和取消
+
+    子类实现 make_page_request(page_number)，在解析时遇到截止日期或最后一页调用 stop_paging()。
+    """
+
+    # 第一页的页码（有的接口从 0 开始）
+    first_page = 1
+    # 已采集公告记录，未配置 SEEN_STORE 时为 None
+    seen = None
+    # 连续遇到多少条已采集的公告后停止翻页，为 None 时取 SEEN_STOP_AFTER
+    seen_stop_after = None
+    # 时间窗口（天），为 None 时取 CRAWL_WINDOW_DAYS
+    crawl_window_days = None
+    # 高水位记录，未配置 CHECKPOINT_STORE 时为 None
+    checkpoints = None
+    # 连续多少页请求失败后停止翻页，为 None 时取 PAGE_FAIL_STOP_AFTER
+    page_fail_stop_after = None
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        try:
+            spider.seen = SeenStore.from_settings(crawler.settings)
+        except NotConfigured:
+            spider.seen = None
+        if spider.seen_stop_after is None:
+            spider.seen_stop_after = crawler.settings.getint("SEEN_STOP_AFTER", 20)
+        spider._seen_run = SeenRun(spider.seen_stop_after)
+        spider._seen_filters = spider.seen_filters()
+        if spider.crawl_window_days is None:
+            spider.crawl_window_days = crawler.settings.getint("CRAWL_WINDOW_DAYS", 18)
+        try:
+            spider.checkpoints = CheckpointStore.from_settings(crawler.settings)
+        except NotConfigured:
+            spider.checkpoints = None
+        spider.watermark = spider.checkpoints.load(spider.name) if spider.checkpoints else Watermark()
+        spider._next_watermark = Watermark()
+        spider._pages_failed = 0
+        spider._details_failed = 0
+        if spider.page_fail_stop_after is None:
+            spider.page_fail_stop_after = crawler.settings.getint("PAGE_FAIL_STOP_AFTER", 1)
+        spider._pages_failed_run = 0
+        return spider
+
+    def closed(self, reason):
+        if self.seen is not None:
+            self.seen.close()
+        if self.checkpoints is not None:
+            # 有页或详情页请求失败、或中途停止时不更新高水位，否则下次会漏掉没取到的公告
+            if reason == "finished" and not self._pages_failed and not self._details_failed:
+                self.watermark.merge(self._next_watermark)
+                self.checkpoints.save(self.name, self.watermark)
+                self.logger.info(f"高水位更新为 {self.watermark.published}")
+            else:
+                self.logger.warning(
+                    f"本次运行未完整结束（{reason}，{self._pages_failed} 页、{self._details_failed} 个详情页失败），不更新高水位"
+                )
+            self.checkpoints.close()
+
+    async def start(self):
+        for request in self.start_requests():
+            yield request
+
+    def start_requests(self):
+        self.cutoff_date = effective_cutoff(self.watermark, self.crawl_window_days)
+        self.logger.info(f"截止时间: {self.cutoff_date:%Y-%m-%d %H:%M:%S}（时间窗口 {self.crawl_window_days} 天，高水位 {self.watermark.published}）")
+        self.pages = self.make_page_window()
+        yield from self._schedule_pages()
+
+    def make_page_window(self):
+        return PageWindow(self.first_page, size=1)
+
+    def make_page_request(self, page_number):
+        raise NotImplementedError
+
+    def stop_paging(self, page_number):
+        """
+        不再请求 page_number 之后的页，已在排队的也会被取消
+        """
+        self.pages.stop(page_number)
+
+    def seen_before(self, notice_id, page_number):
+        """
+        公告是否已经采集过；同时记录连续已采集的条数，用于提前停止翻页
+
+        列表中的每一条都应调用一次（包括不符合关键字的），顺序与页面一致。
+        """
+        if self.seen is None:
+            return False
+        seen = self.seen.contains(self.name, notice_id, self._seen_filters)
+        self._seen_run.record(page_number, seen)
+        if seen:
+            self.crawler.stats.inc_value("seen/skipped")
+        return seen
+
+    def mark_seen(self, notice_id):
+        """
+        记录公告已采集（产出了 item）；需要请求详情页的公告应在详情页解析完后再调用
+        """
+        if self.seen is not None:
+            self.seen.add(self.name, notice_id)
+
+    def mark_dropped(self, notice_id):
+        """
+        记录公告被关键字等条件筛掉；筛选条件变化后该公告不再算作已采集，会重新检查
+        """
+        if self.seen is not None:
+            self.seen.add(self.name, notice_id, self._seen_filters)
+
+    def seen_filters(self):
+        """
+        筛选条件的指纹，默认取 keywords；有其他可配置的筛选条件时子类覆盖
+        """
+        return filters_fingerprint(getattr(self, "keywords", ()))
+
+    def checkpoint(self, published, notice_id):
+        """
+        公告是否已被上次运行的高水位覆盖（早于高水位，或与高水位同一时间且 ID 已记录）
+        """
+        covered = self.watermark.covers(published, notice_id)
+        if covered:
+            self.crawler.stats.inc_value("checkpoint/covered")
+        return covered
+
+    def advance_watermark(self, published, notice_id):
+        """
+        记录已产出公告的发布时间，用于运行结束后更新高水位
+
+        只在公告真正产出 item 时调用：需要请求详情页的公告在详情页解析完后再调用，
+        否则详情页请求失败时高水位已经越过它，之后的运行会一直跳过这条公告。
+        """
+        # 发布时间明显在未来的（网站数据错误）不参与高水位，以免之后的公告都被当成旧的
+        if published is not None and published <= datetime.now() + timedelta(days=1):
+            self._next_watermark.update(published, notice_id)
+
+    def detail_failed(self, failure):
+        """
+        详情页请求的 errback：记录失败，本次运行不更新高水位
+        """
+        self._details_failed += 1
+        self.logger.error(f"详情页请求失败: {failure.request.url}，{failure.value}")
+
+    def page_failed(self, failure):
+        page_number = failure.request.meta["page_number"]
+        self.pages.done(page_number)
+        # HttpError 也是 IgnoreRequest；其余的 IgnoreRequest 是截止页之后被取消的页
+        if failure.check(HttpError) or not failure.check(IgnoreRequest):
+            self.logger.error(f"第 {page_number} 页请求失败: {failure.value}")
+            if self._page_error(page_number):
+                return
+        yield from self._schedule_pages()
+
+    def _page_error(self, page_number):
+        """
+        记录一页失败；总页数未知且连续失败达到 page_fail_stop_after 页时停止翻页并返回 True
+        """
+        self._pages_failed += 1
+        self._pages_failed_run += 1
+        if self.pages.last_page is not None or self._pages_failed_run < self.page_fail_stop_after:
+            return False
+        if self.pages.stop_page is not None and self.pages.stop_page <= page_number:
+            # 已经停止翻页，这一页是停止前发出的
+            return True
+        self.logger.warning(f"连续 {self._pages_failed_run} 页请求失败，第 {page_number} 页之后不再翻页")
+        self.crawler.stats.inc_value("pages/failed_stop")
+        self.stop_paging(page_number)
+        return True
+
+    def _page_received(self, response):
+        """
+        标记页面已返回；该页已在截止页之后时返回 False
+        """
+        page_number = response.meta["page_number"]
+        self.pages.done(page_number)
+        if self.pages.cancelled(page_number):
+            self.logger.debug(f"第 {page_number} 页已在截止页之后，丢弃")
+            return False
+        return True
+
+    def _page_parsed(self, response):
+        self._pages_failed_run = 0
+        # 连续已采集的公告达到 seen_stop_after 条时停止翻页
+        if self.seen is None:
+            return
+        stop_page = self._seen_run.finish(response.meta["page_number"])
+        if stop_page is not None and (self.pages.stop_page is None or stop_page < self.pages.stop_page):
+            self.logger.info(f"到第 {stop_page} 页已连续 {self.seen_stop_after} 条公告采集过，停止翻页")
+            self.crawler.stats.inc_value("seen/stopped")
+            self.stop_paging(stop_page)
+
+    def _schedule_pages(self):
+        for page_number in self.pages.take():
+            request = self.make_page_request(page_number)
+            request.meta["page_number"] = page_number
+            if request.errback is None:
+                request.errback = self.page_failed
+            yield request
+
+
+class PaginatedApiSpider(PaginatedSpider):
+    """
+    返回总数的 JSON 接口爬虫基类
+
+    先请求第一页，从响应中读出总页数后，按 page_concurrency 同时请求剩余各页。
+    子类实现：
+      - make_page_request(page_number)：构造某一页的请求
+      - parse_page(response, data)：解析一页数据，产出 item；遇到截止日期或最后一页时调用 stop_paging()
+      - total_pages(data)：从响应中读出总页数，读不到返回 None（此时逐页请求）
+    """
+
+    page_size = 10
+    # 同时在途的翻页请求数，为 None 时取 CONCURRENT_REQUESTS_PER_DOMAIN
+    page_concurrency = None
+
+    def parse_page(self, response, data):
+        raise NotImplementedError
+
+    def total_pages(self, data):
+        return None
+
+    def parse(self, response):
+        if not self._page_received(response):
+            return
+
+        try:
+            data = response.json()
+        except Exception as e:
+            self.logger.error(f"响应非 JSON，错误: {e}，前 200 字符: {response.text[:200]}")
+            if not self._page_error(response.meta["page_number"]):
+                yield from self._schedule_pages()
+            return
+
+        yield from self.parse_page(response, data)
+        self._page_parsed(response)
+
+        if self.pages.last_page is None:
+            total = self.total_pages(data)
+            if total is not None:
+                self.pages.last_page = self.first_page + int(total) - 1
+                self.pages.size = self._page_concurrency()
+                self.logger.info(f"共 {total} 页，同时请求 {self.pages.size} 页")
+        # 没有总数时窗口保持为 1，逐页请求，直到 parse_page() 调用 stop_paging()
+        yield from self._schedule_pages()
+
+    def _page_concurrency(self):
+        if self.page_concurrency is not None:
+            return self.page_concurrency
+        return self.settings.getint("CONCURRENT_REQUESTS_PER_DOMAIN")
+
+
+class PaginatedListSpider(PaginatedSpider):
+    """
+    列表页地址有规律的 HTML 爬虫基类
+
+    按 page_url_template 构造各页地址（第一页取 start_urls[0]），始终保持 prefetch_pages 页在途，
+    某页解析时遇到截止日期或空页调用 stop_paging()，之后已排队的页会被丢弃。
+    在途页数不超过 prefetch_pages，且仍按下载槽的并发和延迟发出，不会突破礼貌限制。
+    子类实现 parse_page(response)，页码在 response.meta["page_number"] 中。
+    """
+
+    page_url_template = None
+    # 同时在途的列表页数，为 None 时取 PREFETCH_PAGES
+    prefetch_pages = None
+
+    def make_page_window(self):
+        first_url = self.start_urls[0] if self.start_urls else None
+        self.paginator = UrlTemplatePaginator(self.page_url_template, self.first_page, first_url)
+        return PageWindow(self.first_page, size=self._prefetch_pages())
+
+    def make_page_request(self, page_number):
+        return scrapy.Request(self.paginator.url(page_number), callback=self.parse)
+
+    def parse_page(self, response):
+        raise NotImplementedError
+
+    def parse(self, response):
+        if not self._page_received(response):
+            return
+        yield from self.parse_page(response)
+        self._page_parsed(response)
+        yield from self._schedule_pages()
+
+    def _prefetch_pages(self):
+        if self.prefetch_pages is not None:
+            return self.prefetch_pages
+        return self.settings.getint("PREFETCH_PAGES", 3)
@@ -5,9 +5,362 @@
 
 
 # useful for handling different item types with a single interface
+import os
+
 from itemadapter import ItemAdapter
+from scrapy.exceptions import DropItem, NotConfigured
+from scrapy.utils.project import data_path
+from twisted.internet import task
+
+from ant.columnar import ParquetPartitionWriter, pa
+from ant.dates import parse_date
+from ant.dedup import BloomFilter, title_key, url_key
+from ant.exporters import RotatingJsonLinesWriter
+from ant.neardup import NearDupIndex
+from ant.storage import NoticeStore
+from ant.subscriptions import SubscriptionIndex
 
 
 class AntPipeline:
+    """
+    跨爬虫去重：链接或标题已经出现过的公告直接丢弃
+
+    键保存在 Bloom 过滤器中（见 ant/dedup.py），内存由 DEDUP_CAPACITY、DEDUP_ERROR_RATE
+    和 DEDUP_MAX_MEMORY_MB 决定；DEDUP_FILE 不为空时在两次运行之间保存。
+    同一进程中的多个爬虫共用同一个过滤器，最后一个爬虫关闭时写入文件。
+    """
+
+    # 文件路径 -> [BloomFilter, 使用中的爬虫数]
+    _shared = {}
+
+    def __init__(self, path=None, capacity=1000000, error_rate=0.001, max_bytes=None, min_title_length=8, stats=None):
+        self.path = path
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.max_bytes = max_bytes
+        self.min_title_length = min_title_length
+        self.stats = stats
+        self.bloom = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        path = settings.get("DEDUP_FILE", "dedup.bloom")
+        if path:
+            # 相对路径放在项目的 .scrapy 目录下
+            path = data_path(path)
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        max_memory_mb = settings.getfloat("DEDUP_MAX_MEMORY_MB", 0)
+        return cls(
+            path,
+            capacity=settings.getint("DEDUP_CAPACITY", 1000000),
+            error_rate=settings.getfloat("DEDUP_ERROR_RATE", 0.001),
+            max_bytes=int(max_memory_mb * 1024 * 1024) or None,
+            min_title_length=settings.getint("DEDUP_MIN_TITLE_LENGTH", 8),
+            stats=crawler.stats,
+        )
+
+    def open_spider(self, spider):
+        entry = self._shared.get(self.path)
+        if entry is None:
+            bloom = BloomFilter(self.capacity, self.error_rate, self.max_bytes)
+            if self.path and os.path.exists(self.path):
+                if bloom.load(self.path):
+                    spider.logger.info(f"已加载去重记录 {self.path}，共 {bloom.count} 个键")
+                else:
+                    spider.logger.warning(f"去重记录 {self.path} 与当前容量/误判率配置不一致，重新开始记录")
+            entry = self._shared[self.path] = [bloom, 0]
+        entry[1] += 1
+        self.bloom = entry[0]
+        spider.logger.info(
+            f"去重过滤器：{len(self.bloom.bits) / 1024 / 1024:.1f} MB，{self.bloom.num_hashes} 个哈希，"
+            f"容量 {self.capacity} 时误判率 {self.bloom.expected_error_rate(self.capacity):.2%}"
+        )
+
+    def close_spider(self, spider):
+        bloom = self.bloom
+        self.stats.set_value("dedup/keys", bloom.count)
+        self.stats.set_value("dedup/expected_error_rate", round(bloom.expected_error_rate(), 6))
+        if bloom.count > self.capacity:
+            spider.logger.warning(f"去重记录 {bloom.count} 个键已超过容量 {self.capacity}，误判率会升高，请调大 DEDUP_CAPACITY")
+        entry = self._shared[self.path]
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self._shared[self.path]
+            if self.path:
+                bloom.save(self.path)
+
     def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        keys = {
+            "url": url_key(adapter.get("file_url") or adapter.get("url")),
+            "title": title_key(adapter.get("title"), self.min_title_length),
+        }
+        bloom = self.bloom
+        for kind, key in keys.items():
+            if key and key in bloom:
+                self.stats.inc_value(f"dedup/hit/{kind}")
+                raise DropItem(f"重复公告（{kind}）: {adapter.get('title')}")
+        for key in keys.values():
+            if key:
+                bloom.add(key)
+        self.stats.inc_value("dedup/unique")
         return item
+
+
+class NearDupPipeline:
+    """
+    近似重复聚类：标题或正文与历史公告近似的，标记为同一个 cluster_id
+
+    指纹索引见 ant/neardup.py，保存在 NEARDUP_FILE 中；同一进程中的多个爬虫共用同一个索引。
+    公告不会被丢弃，下游按 cluster_id 对同一招标只处理一次。
+    """
+
+    # 文件路径 -> [NearDupIndex, 使用中的爬虫数]
+    _shared = {}
+
+    def __init__(self, path=":memory:", max_distance=3, stats=None, batch_size=500):
+        self.path = path
+        self.max_distance = max_distance
+        self.stats = stats
+        self.batch_size = batch_size
+        self.index = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        path = settings.get("NEARDUP_FILE", "neardup.db")
+        if path:
+            # 相对路径放在项目的 .scrapy 目录下
+            path = data_path(path)
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        else:
+            path = ":memory:"
+        return cls(path, settings.getint("NEARDUP_MAX_DISTANCE", 3), crawler.stats, settings.getint("NEARDUP_BATCH", 500))
+
+    def open_spider(self, spider):
+        entry = self._shared.get(self.path)
+        if entry is None:
+            index = NearDupIndex(self.path, self.max_distance, self.batch_size)
+            if index.rebuilt:
+                spider.logger.warning(f"近似重复索引 {self.path} 的分段方式与 NEARDUP_MAX_DISTANCE={self.max_distance} 不同，已按 {index.rebuilt} 条指纹重建")
+            entry = self._shared[self.path] = [index, 0]
+        entry[1] += 1
+        self.index = entry[0]
+
+    def close_spider(self, spider):
+        entry = self._shared[self.path]
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self._shared[self.path]
+            self.index.close()
+        else:
+            self.index.commit()
+
+    def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        cluster, matched = self.index.assign(adapter.get("title"), adapter.get("content"))
+        if cluster is None:
+            return item
+        self.stats.inc_value("neardup/matched" if matched else "neardup/new_cluster")
+        adapter["cluster_id"] = cluster
+        return item
+
+
+class JsonLinesExportPipeline:
+    """
+    分段 JSON Lines 输出（见 ant/exporters.py）
+
+    EXPORT_DIR 下每个爬虫一个子目录，段文件按 EXPORT_MAX_MB / EXPORT_MAX_SECONDS 切分，
+    EXPORT_GZIP 为 True 时关闭的段压缩为 .jsonl.gz。
+    """
+
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024, max_seconds=0, flush_items=100, compress=False, stats=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.flush_items = flush_items
+        self.compress = compress
+        self.stats = stats
+        self.writer = None
+        self.timer = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        directory = settings.get("EXPORT_DIR")
+        if not directory:
+            raise NotConfigured("未设置 EXPORT_DIR")
+        return cls(
+            directory,
+            max_bytes=int(settings.getfloat("EXPORT_MAX_MB", 64) * 1024 * 1024),
+            max_seconds=settings.getint("EXPORT_MAX_SECONDS", 0),
+            flush_items=settings.getint("EXPORT_FLUSH_ITEMS", 100),
+            compress=settings.getbool("EXPORT_GZIP"),
+            stats=crawler.stats,
+        )
+
+    def open_spider(self, spider):
+        self.writer = RotatingJsonLinesWriter(
+            os.path.join(self.directory, spider.name),
+            spider.name,
+            max_bytes=self.max_bytes,
+            max_seconds=self.max_seconds,
+            flush_items=self.flush_items,
+            compress=self.compress,
+        )
+        if self.max_seconds:
+            # 定时检查，爬取暂停（如等待下载延迟）时也能按时关闭段
+            self.timer = task.LoopingCall(self.writer.rotate_if_expired)
+            self.timer.start(max(1, self.max_seconds / 10), now=False)
+
+    def close_spider(self, spider):
+        if self.timer is not None and self.timer.running:
+            self.timer.stop()
+        self.writer.close()
+        self.stats.set_value("export/segments", self.writer.sequence)
+        spider.logger.info(f"已输出 {self.writer.sequence} 个段到 {self.writer.directory}")
+
+    def process_item(self, item, spider):
+        self.writer.write(item)
+        self.stats.inc_value("export/items")
+        return item
+
+
+class SQLiteStoragePipeline:
+    """
+    把公告写入 SQLite 公告库（见 ant/storage.py），支持按关键字和时间查询
+
+    按公告 ID 更新或插入，每 STORAGE_BATCH_SIZE 条在一个事务中写入；
+    同一进程中的多个爬虫共用同一个连接。
+    """
+
+    # 文件路径 -> [NoticeStore, 使用中的爬虫数]
+    _shared = {}
+
+    def __init__(self, path, batch_size=200, stats=None):
+        self.path = path
+        self.batch_size = batch_size
+        self.stats = stats
+        self.store = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        path = crawler.settings.get("STORAGE_DB")
+        if not path:
+            raise NotConfigured("未设置 STORAGE_DB")
+        # 相对路径放在项目的 .scrapy 目录下
+        path = data_path(path)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        return cls(path, crawler.settings.getint("STORAGE_BATCH_SIZE", 200), crawler.stats)
+
+    def open_spider(self, spider):
+        entry = self._shared.get(self.path)
+        if entry is None:
+            entry = self._shared[self.path] = [NoticeStore(self.path, self.batch_size), 0]
+        entry[1] += 1
+        self.store = entry[0]
+
+    def close_spider(self, spider):
+        entry = self._shared[self.path]
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self._shared[self.path]
+            self.store.close()
+        else:
+            self.store.flush()
+
+    def process_item(self, item, spider):
+        if self.store.add(spider.name, ItemAdapter(item)) is None:
+            self.stats.inc_value("storage/no_id")
+        else:
+            self.stats.inc_value("storage/stored")
+        return item
+
+
+class ParquetExportPipeline:
+    """
+    按爬虫和发布日期分区输出 Parquet（见 ant/columnar.py），供分析使用
+
+    需要安装 pyarrow；输出到 PARQUET_DIR，每 PARQUET_ROW_GROUP_SIZE 条写一个行组。
+    """
+
+    def __init__(self, directory, row_group_size=5000, compression="zstd", stats=None):
+        self.directory = directory
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.stats = stats
+        self.writer = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        directory = settings.get("PARQUET_DIR")
+        if not directory:
+            raise NotConfigured("未设置 PARQUET_DIR")
+        if pa is None:
+            raise NotConfigured("未安装 pyarrow，不输出 Parquet")
+        return cls(
+            directory,
+            row_group_size=settings.getint("PARQUET_ROW_GROUP_SIZE", 5000),
+            compression=settings.get("PARQUET_COMPRESSION", "zstd"),
+            stats=crawler.stats,
+        )
+
+    def open_spider(self, spider):
+        self.writer = ParquetPartitionWriter(self.directory, self.row_group_size, self.compression)
+
+    def close_spider(self, spider):
+        self.writer.close()
+        self.stats.set_value("parquet/rows", self.writer.rows)
+        self.stats.set_value("parquet/row_groups", self.writer.row_groups)
+
+    def process_item(self, item, spider):
+        self.writer.write(spider.name, ItemAdapter(item))
+        return item
+
+
+class SubscriptionPipeline:
+    """
+    按订阅规则把公告分发给订阅者
+
+    规则文件由 SUBSCRIPTIONS_FILE 指定，命中的规则 ID 和订阅者写入
+    item 的 subscriptions / subscribers 字段。
+    """
+
+    def __init__(self, index, drop_unmatched=False, stats=None):
+        self.index = index
+        self.drop_unmatched = drop_unmatched
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        path = crawler.settings.get("SUBSCRIPTIONS_FILE")
+        if not path:
+            raise NotConfigured("未设置 SUBSCRIPTIONS_FILE")
+        index = SubscriptionIndex.from_file(path)
+        index.build()
+        return cls(index, crawler.settings.getbool("SUBSCRIPTIONS_DROP_UNMATCHED"), crawler.stats)
+
+    def open_spider(self, spider):
+        spider.logger.info(f"已加载 {len(self.index)} 条订阅规则")
+
+    def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        matched = self.index.match(
+            adapter.get("title"),
+            status=adapter.get("status"),
+            spider=spider.name,
+            published=parse_date(adapter.get("time") or adapter.get("publish_time"), key=spider.name),
+        )
+        if not matched:
+            self.stats.inc_value("subscriptions/unmatched")
+            if self.drop_unmatched:
+                raise DropItem(f"没有命中任何订阅: {adapter.get('title')}")
+        else:
+            self.stats.inc_value("subscriptions/matched")
+            self.stats.inc_value("subscriptions/routes", len(matched))
+        adapter["subscriptions"] = [subscription.id for subscription in matched]
+        adapter["subscribers"] = sorted({subscription.subscriber for subscription in matched})
+        return item
+
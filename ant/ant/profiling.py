@@ -0,0 +1,249 @@
+# 按需剖析解析回调和管道
+#
+# 某个站点突然让整次运行慢了几倍时，需要知道 CPU 花在了哪里。PROFILE_ENABLED 开启后，
+# 按 PROFILE_FRACTION 的比例抽取回调（ProfilingMiddleware）和管道 process_item
+# （ProfilingItemPipelineManager）的调用，用 sys.setprofile 记录抽中调用内的每次函数调用和返回，
+# 按完整调用路径累计自身耗时。爬虫关闭时写出 PROFILE_DIR/<爬虫>.collapsed（collapsed stack 格式，
+# 每行 "路径;逐层;函数 微秒数"），可直接交给 flamegraph.pl 或 speedscope 生成火焰图。
+#
+# 未开启时两个组件都不加载（中间件 NotConfigured，管道管理器不包装），没有额外开销。
+# cProfile 只保留调用者和被调用者两层，画不出完整的调用栈，所以这里自己记录路径。
+
+import inspect
+import os
+import random
+import sys
+from collections import Counter
+from functools import wraps
+from time import perf_counter
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.pipelines import ItemPipelineManager
+from scrapy.utils.project import data_path
+
+# 抽中剖析的回调在请求 meta 中的标记，AntSpiderMiddleware 不计入这些调用的耗时
+PROFILED_META = "_profiled"
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+
+
+def _c_label(function):
+    module = getattr(function, "__module__", None) or ""
+    name = getattr(function, "__qualname__", None) or repr(function)
+    return (f"{module}.{name}" if module else name).replace(";", ",")
+
+
+class StackProfiler:
+    """
+    按调用路径累计自身耗时
+
+    start(root) 到 stop() 之间记录当前线程的调用；路径以 root 开头（如 "callback parse_detail"）。
+    """
+
+    def __init__(self):
+        # 路径（元组）-> 自身耗时（秒）
+        self.totals = Counter()
+        self.invocations = Counter()
+        self.seconds = 0.0
+
+    def start(self, root):
+        """
+        开始记录当前线程的调用，返回交给 stop() 的状态
+        """
+        stack = [(root,)]
+        last = perf_counter()
+        totals = self.totals
+
+        def handler(frame, event, arg):
+            nonlocal last
+            now = perf_counter()
+            totals[stack[-1]] += now - last
+            if event == "call":
+                stack.append(stack[-1] + (_frame_label(frame),))
+            elif event == "c_call":
+                stack.append(stack[-1] + (_c_label(arg),))
+            elif len(stack) > 1:
+                # return / c_return / c_exception；start() 自身的返回不会弹出 root
+                stack.pop()
+            last = perf_counter()
+
+        previous = sys.getprofile()
+        sys.setprofile(handler)
+        return root, previous, perf_counter()
+
+    def stop(self, state):
+        root, previous, started = state
+        sys.setprofile(previous)
+        self.seconds += perf_counter() - started
+
+    def count(self, root):
+        """
+        记一次抽中的调用；一次回调调用会多次 start() / stop()，由调用方在抽中时调用一次
+        """
+        self.invocations[root] += 1
+
+    def call(self, root, function, *args, **kwargs):
+        self.count(root)
+        state = self.start(root)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            self.stop(state)
+
+    def collapsed(self):
+        """
+        collapsed stack 格式的文本，耗时单位为微秒，不足 1 微秒的路径省略
+        """
+        lines = []
+        for path, seconds in sorted(self.totals.items()):
+            micros = round(seconds * 1_000_000)
+            if micros:
+                lines.append(f"{';'.join(path)} {micros}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def write(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.collapsed())
+
+
+# 输出文件 -> StackProfiler，同一爬虫的回调和管道写入同一个文件
+_profilers = {}
+
+
+def profile_settings(settings):
+    """
+    返回 (抽样比例, 输出目录)；未开启 PROFILE_ENABLED 时抛出 NotConfigured
+    """
+    if not settings.getbool("PROFILE_ENABLED"):
+        raise NotConfigured("未开启 PROFILE_ENABLED")
+    return settings.getfloat("PROFILE_FRACTION", 0.05), settings.get("PROFILE_DIR", "profiles")
+
+
+def profiler_for(directory, spider_name):
+    path = os.path.join(data_path(directory), f"{spider_name}.collapsed")
+    profiler = _profilers.get(path)
+    if profiler is None:
+        profiler = _profilers[path] = StackProfiler()
+    return path, profiler
+
+
+class ProfilingMiddleware:
+    """
+    按 PROFILE_FRACTION 抽取回调调用并记录调用栈，爬虫关闭时写出 collapsed stack 文件
+
+    回调是生成器，抽中的调用在每次取出产出时记录。应放在最靠近爬虫的位置（优先级高于
+    AntSpiderMiddleware），调用栈中才只有回调本身。剖析的开销发生在外层每次取出产出期间，
+    因此抽中的调用在请求 meta 中标记 PROFILED_META，AntSpiderMiddleware 不计入它们的耗时。
+    """
+
+    def __init__(self, crawler, fraction, directory):
+        self.crawler = crawler
+        self.fraction = fraction
+        self.path, self.profiler = profiler_for(directory, crawler.spidercls.name)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        fraction, directory = profile_settings(crawler.settings)
+        s = cls(crawler, fraction, directory)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    def _root(self, response):
+        """
+        本次调用要剖析时返回调用栈的根（"callback <回调名>"），否则返回 None
+        """
+        if random.random() >= self.fraction:
+            return None
+        request = getattr(response, "request", None)
+        callback = request.callback if request is not None else None
+        # 真正异步的回调在等待期间会运行别的代码，记录下来的调用栈没有意义
+        if inspect.isasyncgenfunction(callback) or inspect.iscoroutinefunction(callback):
+            return None
+        root = f"callback {getattr(callback, '__name__', None) or 'parse'}"
+        self.profiler.count(root)
+        request.meta[PROFILED_META] = True
+        return root
+
+    def process_spider_output(self, response, result):
+        root = self._root(response)
+        if root is None:
+            yield from result
+            return
+        iterator = iter(result)
+        while True:
+            state = self.profiler.start(root)
+            try:
+                output = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.profiler.stop(state)
+            yield output
+
+    async def process_spider_output_async(self, response, result):
+        # 同步回调的产出由 Scrapy 包装成异步生成器，取出时不会等待，与同步时相同
+        root = self._root(response)
+        if root is None:
+            async for output in result:
+                yield output
+            return
+        iterator = result.__aiter__()
+        while True:
+            state = self.profiler.start(root)
+            try:
+                output = await iterator.__anext__()
+            except StopAsyncIteration:
+                return
+            finally:
+                self.profiler.stop(state)
+            yield output
+
+    def spider_closed(self, spider):
+        _profilers.pop(self.path, None)
+        self.profiler.write(self.path)
+        self.crawler.stats.set_value("profile/seconds", round(self.profiler.seconds, 3))
+        for root, count in self.profiler.invocations.items():
+            self.crawler.stats.set_value(f"profile/{root.replace(' ', '/')}", count)
+        spider.logger.info(f"剖析了 {sum(self.profiler.invocations.values())} 次调用（{self.profiler.seconds:.2f} 秒），写入 {self.path}")
+
+
+class ProfilingItemPipelineManager(ItemPipelineManager):
+    """
+    按 PROFILE_FRACTION 抽取各管道的 process_item 调用并记录调用栈（ITEM_PROCESSOR）
+
+    只记录 process_item 的同步部分；返回协程或 Deferred 的管道，之后异步执行的部分不计入。
+    未开启 PROFILE_ENABLED 时与 ItemPipelineManager 相同。
+    """
+
+    def __init__(self, *middlewares, crawler=None):
+        self.profiler = None
+        if crawler is not None:
+            try:
+                self.fraction, directory = profile_settings(crawler.settings)
+            except NotConfigured:
+                pass
+            else:
+                _, self.profiler = profiler_for(directory, crawler.spidercls.name)
+        super().__init__(*middlewares, crawler=crawler)
+
+    def _add_middleware(self, mw):
+        if self.profiler is not None and hasattr(mw, "process_item"):
+            mw.process_item = self._wrap(mw.process_item, f"pipeline {type(mw).__name__}")
+        super()._add_middleware(mw)
+
+    def _wrap(self, method, root):
+        profiler = self.profiler
+        fraction = self.fraction
+
+        @wraps(method)
+        def process_item(*args, **kwargs):
+            if random.random() >= fraction:
+                return method(*args, **kwargs)
+            return profiler.call(root, method, *args, **kwargs)
+
+        return process_item
@@ -0,0 +1,121 @@
+# 同时运行多个爬虫
+#
+# 原来逐个执行 scrapy crawl anhui、scrapy crawl ctg……，每个进程都要重新启动解释器和 Twisted，
+# 总耗时是各站点之和。scrapy crawlall（ant/commands/crawlall.py）在一个 CrawlerProcess
+# 中同时启动所有爬虫，总耗时约等于最慢的站点。管道中的已采集记录、公告库等按文件共享，
+# 见各管道的 _shared。
+#
+# 这里汇总各爬虫的统计，并把每次运行的耗时追加到 CRAWL_HISTORY（JSON Lines），
+# 供分片运行时估算各爬虫的开销。
+#
+# 站点多了以后一个进程的解析会占满一个 CPU。scrapy crawlshards（ant/commands/crawlshards.py）
+# 按历史耗时把爬虫分成若干组，每组在一个子进程中运行 crawlall，结束后合并各组的统计。
+
+import json
+import os
+import statistics
+from datetime import datetime
+
+from scrapy.utils.project import data_path
+
+SUMMARY_STATS = {
+    "requests": "downloader/request_count",
+    "responses": "downloader/response_count",
+    "bytes": "downloader/response_bytes",
+    "items": "item_scraped_count",
+    "dropped": "item_dropped_count",
+    "errors": "log_count/ERROR",
+    "elapsed_s": "elapsed_time_seconds",
+}
+
+
+def spider_summary(stats):
+    """
+    从一个爬虫的统计中取出汇总用的几项
+    """
+    summary = {key: stats.get(stat, 0) for key, stat in SUMMARY_STATS.items()}
+    summary["elapsed_s"] = round(summary["elapsed_s"], 1)
+    summary["finish_reason"] = stats.get("finish_reason")
+    return summary
+
+
+def combine(summaries, wall_time=None):
+    """
+    合并各爬虫的汇总：{"spiders": {爬虫: 汇总}, "total": 各项之和}
+
+    total 中 elapsed_s 为各爬虫耗时之和（逐个运行时的总耗时），wall_s 为实际总耗时。
+    """
+    total = {key: 0 for key in SUMMARY_STATS}
+    for summary in summaries.values():
+        for key in SUMMARY_STATS:
+            total[key] += summary.get(key) or 0
+    total["elapsed_s"] = round(total["elapsed_s"], 1)
+    if wall_time is not None:
+        total["wall_s"] = round(wall_time, 1)
+    return {"spiders": summaries, "total": total}
+
+
+def format_summary(combined):
+    columns = ("requests", "items", "dropped", "errors", "elapsed_s")
+    rows = [("spider", *columns, "finish_reason")]
+    for name, summary in sorted(combined["spiders"].items()):
+        rows.append((name, *(summary.get(column, 0) for column in columns), summary.get("finish_reason")))
+    total = combined["total"]
+    rows.append(("total", *(total.get(column, 0) for column in columns), f"wall {total.get('wall_s', '-')}s"))
+    widths = [max(len(str(row[index])) for row in rows) for index in range(len(rows[0]))]
+    return "\n".join("  ".join(str(value).ljust(width) for value, width in zip(row, widths)) for row in rows)
+
+
+def history_path(settings):
+    path = settings.get("CRAWL_HISTORY", "crawl_history.jsonl")
+    if not path:
+        return None
+    path = data_path(path)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    return path
+
+
+def record_history(path, summaries):
+    """
+    追加本次运行各爬虫的汇总
+    """
+    finished = datetime.now().isoformat(timespec="seconds")
+    with open(path, "a", encoding="utf-8") as f:
+        for name, summary in summaries.items():
+            f.write(json.dumps({"spider": name, "finished": finished, **summary}, ensure_ascii=False) + "\n")
+
+
+def load_costs(path, names, runs=5):
+    """
+    按 CRAWL_HISTORY 估算各爬虫的开销：最近 runs 次正常结束的平均耗时（秒）
+
+    没有记录的爬虫取其他爬虫开销的中位数，都没有记录时为 1。
+    """
+    history = {name: [] for name in names}
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("spider") in history and record.get("finish_reason") == "finished":
+                    history[record["spider"]].append(record.get("elapsed_s") or 0)
+    costs = {name: statistics.mean(values[-runs:]) for name, values in history.items() if values}
+    default = statistics.median(costs.values()) if costs else 1
+    return {name: costs.get(name, default) for name in names}
+
+
+def balance(costs, shards):
+    """
+    把爬虫分成 shards 组，使各组开销之和尽量接近：按开销从大到小依次放入当前最小的组
+
+    返回 [[爬虫, ...], ...]，不含空组。
+    """
+    groups = [[] for _ in range(max(1, min(shards, len(costs))))]
+    loads = [0.0] * len(groups)
+    for name in sorted(costs, key=lambda name: (-costs[name], name)):
+        index = loads.index(min(loads))
+        groups[index].append(name)
+        loads[index] += costs[name]
+    return [group for group in groups if group]
@@ -0,0 +1,206 @@
+# 增量爬取：已采集公告记录
+#
+# 每次运行都要重新翻完 18 天的列表页，ctg 还要重新请求每一条详情页，
+# 而其中大部分公告上一次运行已经采集过。SeenStore 把采集过的公告 ID 按爬虫保存在
+# SQLite 中，列表爬虫遇到已采集的公告时跳过（不再请求详情页），
+# 连续遇到 SEEN_STOP_AFTER 条已采集的公告后停止翻页。
+#
+# 被关键字等条件筛掉的公告也要记录，否则每次运行都会把它们当成新公告，永远凑不够
+# SEEN_STOP_AFTER 条；但筛选条件变化后（如关键字列表增加）它们需要重新检查。
+# 因此筛掉的公告连同筛选条件的指纹一起记录（filters 列），只在指纹相同时算作已采集；
+# 产出了 item 的公告 filters 为 NULL，无论条件怎么变都算已采集。
+
+import hashlib
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.project import data_path
+from w3lib.url import canonicalize_url
+
+
+def notice_key(url=None, *fallback):
+    """
+    公告的规范 ID：有链接时取规范化后的链接，没有链接时用 fallback（如标题、时间）拼接
+    """
+    if url:
+        return canonicalize_url(str(url))
+    parts = [str(part).strip() for part in fallback if part]
+    if not parts:
+        return None
+    return "|".join(parts)
+
+
+def filters_fingerprint(*conditions):
+    """
+    筛选条件的指纹：conditions 为关键字列表等，顺序和重复不影响结果
+    """
+    text = "\n".join(sorted({str(value) for condition in conditions for value in condition}))
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+class SeenStore:
+    """
+    按爬虫记录已采集的公告 ID
+
+    新记录先放在内存中，每 batch_size 条或 flush() 时写入数据库；
+    超过 retention_days 天的记录在打开时清理，避免文件无限增长
+    （这些公告早已超出列表的时间窗口，不会再出现）。
+
+    add() / contains() 的 filters 为 None 表示产出了 item；否则为筛掉时的筛选条件指纹，
+    只有用相同指纹查询时才算已采集。同一公告后来产出了 item 时覆盖筛掉的记录。
+
+    from_settings() 按路径共用一个实例（crawlall 在同一进程中运行多个爬虫时共用一个连接），
+    最后一个使用者 close() 时才关闭连接。
+    """
+
+    # 路径 -> [SeenStore, 引用数]
+    _shared = {}
+
+    def __init__(self, path, batch_size=500, retention_days=60):
+        self.path = path
+        self.batch_size = batch_size
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS seen_notices ("
+            " spider TEXT NOT NULL,"
+            " notice_id TEXT NOT NULL,"
+            " first_seen TEXT NOT NULL,"
+            " filters TEXT,"
+            " PRIMARY KEY (spider, notice_id)"
+            ") WITHOUT ROWID"
+        )
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(seen_notices)")}
+        if "filters" not in columns:
+            # 旧文件不区分产出和筛掉，全部按筛掉处理（空指纹不与任何条件相同），下次运行重新检查一次
+            self.conn.execute("ALTER TABLE seen_notices ADD COLUMN filters TEXT")
+            self.conn.execute("UPDATE seen_notices SET filters = ''")
+        if retention_days:
+            cutoff = (datetime.now() - timedelta(days=retention_days)).isoformat(timespec="seconds")
+            self.conn.execute("DELETE FROM seen_notices WHERE first_seen < ?", (cutoff,))
+        self.conn.commit()
+        self._pending = {}
+
+    @classmethod
+    def from_settings(cls, settings):
+        path = settings.get("SEEN_STORE")
+        if not path:
+            raise NotConfigured("未设置 SEEN_STORE")
+        # 相对路径放在项目的 .scrapy 目录下
+        path = data_path(path)
+        entry = cls._shared.get(path)
+        if entry is None:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            store = cls(
+                path,
+                batch_size=settings.getint("SEEN_BATCH_SIZE", 500),
+                retention_days=settings.getint("SEEN_RETENTION_DAYS", 60),
+            )
+            entry = cls._shared[path] = [store, 0]
+        entry[1] += 1
+        return entry[0]
+
+    def contains(self, spider, notice_id, filters=None):
+        """
+        公告是否已采集：产出过 item，或在相同的筛选条件下被筛掉过
+        """
+        if not notice_id:
+            return False
+        pending = self._pending.get((spider, notice_id))
+        if pending is not None:
+            return pending[1] is None or pending[1] == filters
+        row = self.conn.execute(
+            "SELECT filters FROM seen_notices WHERE spider = ? AND notice_id = ?", (spider, notice_id)
+        ).fetchone()
+        return row is not None and (row[0] is None or row[0] == filters)
+
+    def add(self, spider, notice_id, filters=None):
+        """
+        记录公告；filters 为 None 表示产出了 item，否则为筛掉时的筛选条件指纹
+        """
+        if not notice_id:
+            return
+        key = (spider, notice_id)
+        pending = self._pending.get(key)
+        if pending is None:
+            self._pending[key] = (datetime.now().isoformat(timespec="seconds"), filters)
+        elif pending[1] is not None:
+            # 产出的记录不会被筛掉的记录覆盖
+            self._pending[key] = (pending[0], filters)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        with self.conn:
+            # 已有筛掉的记录时更新为新的指纹（或产出）；已产出的记录保持不变
+            self.conn.executemany(
+                "INSERT INTO seen_notices (spider, notice_id, first_seen, filters) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (spider, notice_id) DO UPDATE SET filters = excluded.filters"
+                " WHERE seen_notices.filters IS NOT NULL",
+                [
+                    (spider, notice_id, first_seen, filters)
+                    for (spider, notice_id), (first_seen, filters) in self._pending.items()
+                ],
+            )
+        self._pending.clear()
+
+    def close(self):
+        self.flush()
+        entry = self._shared.get(self.path)
+        if entry is not None and entry[0] is self:
+            entry[1] -= 1
+            if entry[1] > 0:
+                return
+            del self._shared[self.path]
+        self.conn.close()
+
+
+class SeenRun:
+    """
+    统计按列表顺序连续出现的已采集公告数
+
+    各页可能乱序返回，因此按页记录：页尾连续已采集数、是否整页都已采集。
+    一页解析完后，从该页往前数跨页的连续条数；前一页还没解析完时只算到该页为止。
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        # 页码 -> [页尾连续已采集数, 是否整页已采集, 是否已解析完]
+        self._pages = {}
+
+    def record(self, page, seen):
+        state = self._pages.setdefault(page, [0, True, False])
+        if seen:
+            state[0] += 1
+        else:
+            state[0] = 0
+            state[1] = False
+
+    def finish(self, page):
+        """
+        标记 page 已解析完，返回连续已采集数达到 limit 的第一页，没有返回 None
+
+        后面的页可能先解析完，因此从 page 往后逐页检查。
+        """
+        self._pages.setdefault(page, [0, True, False])[2] = True
+        while page in self._pages and self._pages[page][2]:
+            if self._run_ending(page) >= self.limit:
+                return page
+            page += 1
+        return None
+
+    def _run_ending(self, page):
+        run = 0
+        while page in self._pages:
+            tail, all_seen, finished = self._pages[page]
+            if not finished:
+                break
+            run += tail
+            if not all_seen:
+                break
+            page -= 1
+        return run
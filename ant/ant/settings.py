@@ -11,6 +11,8 @@ BOT_NAME = "ant"
 
 SPIDER_MODULES = ["ant.spiders"]
 NEWSPIDER_MODULE = "ant.spiders"
+# 自定义命令：scrapy crawlall 同时运行所有爬虫，见 ant/runner.py
+COMMANDS_MODULE = "ant.commands"
 
 ADDONS = {}
 
@@ -26,6 +28,54 @@ ROBOTSTXT_OBEY = True
 # CONCURRENT_REQUESTS_PER_DOMAIN = 1
 DOWNLOAD_DELAY = 3
 RANDOMIZE_DOWNLOAD_DELAY = True
+# 按域名的令牌桶限速（TokenBucketMiddleware），配置了的域名不使用 DOWNLOAD_DELAY，见 ant/throttle.py
+# rate 为每秒请求数（0 表示不限速），burst 为最多连续突发的请求数，concurrency 为同时在途的请求数；
+# 域名同时匹配其子域名。爬虫也可以用 rate_limits 属性按同样的格式设置
+DOMAIN_RATE_LIMITS = {
+    "srm.chinaconch.com": {"rate": 5, "burst": 10, "concurrency": 4},
+#    "scm.crland.com.cn": {"rate": 2, "burst": 5, "concurrency": 2},
+}
+
+# 列表页爬虫（ctg、cnncecp、anhui）同时在途的列表页数，遇到截止日期后多取的页会被丢弃
+#PREFETCH_PAGES = 3
+# 翻页爬虫在总页数未知时连续多少页失败后停止翻页（非 2xx 响应、接口返回非 JSON 都算失败）
+#PAGE_FAIL_STOP_AFTER = 1
+
+# 增量爬取：已采集公告记录（SQLite，位于项目 .scrapy 目录下），默认关闭
+# 列表爬虫跳过已采集的公告，连续 SEEN_STOP_AFTER 条已采集后停止翻页，见 ant/seen.py
+# 开启后再次运行只产出新公告：scrapy crawl ctg -O out.json 得到的是增量而不是完整的时间窗口
+#SEEN_STORE = "seen.db"
+#SEEN_STOP_AFTER = 20
+# 超过多少天的记录在启动时清理
+#SEEN_RETENTION_DAYS = 60
+
+# 只采集最近多少天发布的公告（爬虫可用 crawl_window_days 属性单独设置）
+CRAWL_WINDOW_DAYS = 18
+# 增量爬取：按爬虫保存上次运行产出的最新发布时间（高水位），默认关闭
+# 截止时间取 max(高水位, 当前时间 - CRAWL_WINDOW_DAYS)，见 ant/checkpoints.py
+# 开启后再次运行只产出高水位之后的公告，导出文件不再包含完整的时间窗口
+#CHECKPOINT_STORE = "checkpoints.db"
+
+# 详情页正文最多保留多少字符（ContentExtractor，见 ant/extraction.py），0 表示不限
+#CONTENT_MAX_CHARS = 0
+
+# AIMD 自适应限速（AntDownloaderMiddleware，需在 DOWNLOADER_MIDDLEWARES 中启用），见 ant/throttle.py
+# 没有配置 DOMAIN_RATE_LIMITS 的域名从 AIMD_START_RATE（默认 1 / DOWNLOAD_DELAY）开始，
+# 每 AIMD_WINDOW 个正常响应加 AIMD_INCREASE 请求/秒；429 / 5xx / 下载异常或 p95 延迟超过基线的
+# AIMD_LATENCY_FACTOR 倍时速率乘以 AIMD_DECREASE。不要与 AutoThrottle 同时开启
+#AIMD_ENABLED = False
+#AIMD_START_RATE = 0.33
+#AIMD_MIN_RATE = 0.1
+#AIMD_MAX_RATE = 20.0
+#AIMD_INCREASE = 0.2
+#AIMD_DECREASE = 0.5
+#AIMD_WINDOW = 20
+#AIMD_LATENCY_FACTOR = 3.0
+#AIMD_MAX_CONCURRENCY = 8
+
+# scrapy crawlall 每次运行后追加各爬虫的耗时和请求数（JSON Lines，位于项目 .scrapy 目录下），
+# 设为空字符串可关闭
+#CRAWL_HISTORY = "crawl_history.jsonl"
 
 # Disable cookies (enabled by default)
 #COOKIES_ENABLED = False
@@ -41,28 +91,108 @@ RANDOMIZE_DOWNLOAD_DELAY = True
 
 # Enable or disable spider middlewares
 # See https://docs.scrapy.org/en/latest/topics/spider-middleware.html
-#SPIDER_MIDDLEWARES = {
-#    "ant.middlewares.AntSpiderMiddleware": 543,
-#}
+# ProfilingMiddleware 最靠近爬虫，调用栈中只有回调本身；抽中剖析的调用不计入 AntSpiderMiddleware 的回调耗时
+SPIDER_MIDDLEWARES = {
+    "ant.middlewares.AntSpiderMiddleware": 950,
+    "ant.profiling.ProfilingMiddleware": 960,
+}
+
+# 解析回调的运行指标（AntSpiderMiddleware），写入统计 callback/<回调>/...，见 ant/metrics.py
+# 定期写出 Prometheus 文本格式的文件（相对路径位于项目 .scrapy 目录下），{spider} 替换为爬虫名
+#METRICS_FILE = "metrics/{spider}.prom"
+#METRICS_INTERVAL = 15
+
+# 按需剖析（ProfilingMiddleware 和 ProfilingItemPipelineManager），见 ant/profiling.py
+# 开启后按比例抽取回调和管道调用，爬虫关闭时写出 PROFILE_DIR/<爬虫>.collapsed（位于项目 .scrapy 目录下）
+ITEM_PROCESSOR = "ant.profiling.ProfilingItemPipelineManager"
+#PROFILE_ENABLED = False
+#PROFILE_FRACTION = 0.05
+#PROFILE_DIR = "profiles"
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
-#DOWNLOADER_MIDDLEWARES = {
-#    "ant.middlewares.AntDownloaderMiddleware": 543,
-#}
+DOWNLOADER_MIDDLEWARES = {
+#    "ant.middlewares.AntDownloaderMiddleware": 580,
+    "ant.memory.MetaBudgetMiddleware": 90,
+    "ant.middlewares.PageCancelMiddleware": 100,
+    "ant.middlewares.TokenBucketMiddleware": 950,
+}
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
-#EXTENSIONS = {
+EXTENSIONS = {
 #    "scrapy.extensions.telnet.TelnetConsole": None,
-#}
+    "ant.memory.MemoryWatch": 500,
+}
+
+# 内存观测（MemoryWatch）：定期比较 tracemalloc 快照，统计存活的请求、响应和请求 meta 大小，见 ant/memory.py
+#MEMWATCH_ENABLED = False
+#MEMWATCH_INTERVAL = 60
+# 日志中列出的分配位置个数，和 tracemalloc 记录的调用栈深度
+#MEMWATCH_TOP = 10
+#MEMWATCH_FRAMES = 1
+# 存活请求 meta 的预算（MB），0 表示不限；超出时告警，并由 MetaBudgetMiddleware 暂缓翻页请求，最多等待 META_BUDGET_MAX_WAIT 秒
+#META_BUDGET_MB = 0
+#META_BUDGET_MAX_WAIT = 60
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 #ITEM_PIPELINES = {
 #    "ant.pipelines.AntPipeline": 300,
+#    "ant.pipelines.NearDupPipeline": 350,
+#    "ant.pipelines.SubscriptionPipeline": 400,
+#    "ant.pipelines.SQLiteStoragePipeline": 700,
+#    "ant.pipelines.JsonLinesExportPipeline": 800,
+#    "ant.pipelines.ParquetExportPipeline": 810,
 #}
 
+# 去重（AntPipeline）：链接或标题出现过的公告直接丢弃，见 ant/dedup.py
+# 去重记录文件（位于项目 .scrapy 目录下），设为空字符串则只在本次运行内去重
+#DEDUP_FILE = "dedup.bloom"
+# 预计的去重键数量和误判率，决定过滤器大小（默认约 1.7 MB）
+#DEDUP_CAPACITY = 1000000
+#DEDUP_ERROR_RATE = 0.001
+# 过滤器内存上限（MB），0 表示不限制；设置后实际误判率可能高于 DEDUP_ERROR_RATE
+#DEDUP_MAX_MEMORY_MB = 0
+# 标题去掉空白和标点后少于多少个字不按标题去重
+#DEDUP_MIN_TITLE_LENGTH = 8
+
+# 近似重复聚类（NearDupPipeline）：标题或正文近似的公告标记相同的 cluster_id，见 ant/neardup.py
+# 指纹索引文件（位于项目 .scrapy 目录下），设为空字符串则只在本次运行内聚类
+#NEARDUP_FILE = "neardup.db"
+# SimHash 海明距离不超过多少视为同一招标
+#NEARDUP_MAX_DISTANCE = 3
+# 每多少条指纹提交一次（crawlshards 的子进程共用索引文件，每条都提交）
+#NEARDUP_BATCH = 500
+
+# 订阅规则文件（JSON 数组），见 ant/subscriptions.py
+#SUBSCRIPTIONS_FILE = "subscriptions.json"
+# 丢弃没有命中任何订阅的公告
+#SUBSCRIPTIONS_DROP_UNMATCHED = False
+
+# SQLite 公告库（SQLiteStoragePipeline），带标题和正文的全文索引，见 ant/storage.py
+# 数据库文件（相对路径位于项目 .scrapy 目录下）
+#STORAGE_DB = "notices.db"
+# 每多少条在一个事务中写入
+#STORAGE_BATCH_SIZE = 200
+
+# 分段 JSON Lines 输出（JsonLinesExportPipeline），每个爬虫一个子目录，见 ant/exporters.py
+# 下游跟踪各目录下的 manifest.jsonl，每关闭一个段追加一行
+#EXPORT_DIR = "exports"
+# 段文件超过多少 MB 或打开多少秒后关闭（0 表示不按时间切分）
+#EXPORT_MAX_MB = 64
+#EXPORT_MAX_SECONDS = 0
+# 每写多少条刷新一次文件
+#EXPORT_FLUSH_ITEMS = 100
+# 关闭的段压缩为 .jsonl.gz
+#EXPORT_GZIP = False
+
+# Parquet 输出（ParquetExportPipeline，需要 pyarrow），按爬虫和发布日期分区，见 ant/columnar.py
+#PARQUET_DIR = "parquet"
+# 每个行组的行数
+#PARQUET_ROW_GROUP_SIZE = 5000
+#PARQUET_COMPRESSION = "zstd"
+
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
 #AUTOTHROTTLE_ENABLED = True
@@ -83,6 +213,24 @@ RANDOMIZE_DOWNLOAD_DELAY = True
 #HTTPCACHE_DIR = "httpcache"
 #HTTPCACHE_IGNORE_HTTP_CODES = []
 #HTTPCACHE_STORAGE = "scrapy.extensions.httpcache.FilesystemCacheStorage"
+# 单文件 SQLite 缓存（正文压缩）和按列表页 / 详情页设定有效期的策略，见 ant/httpcache.py
+#HTTPCACHE_STORAGE = "ant.httpcache.SQLiteCacheStorage"
+#HTTPCACHE_POLICY = "ant.httpcache.AntCachePolicy"
+#HTTPCACHE_SQLITE_FILE = "cache.db"
+#HTTPCACHE_COMPRESSION_LEVEL = 6
+# 每多少条响应提交一次（crawlshards 的子进程共用缓存文件，每条都提交）
+#HTTPCACHE_SQLITE_BATCH = 100
+# 列表页和详情页缓存的有效期（秒），过期后用 ETag / Last-Modified 校验，未变化时站点返回 304
+#HTTPCACHE_LIST_TTL = 600
+#HTTPCACHE_DETAIL_TTL = 2592000
+
+# 录制与回放（scrapy cassette record|replay），见 ant/cassettes.py；一般由命令行设置
+#CASSETTE_RECORD = "run.cassette"
+#CASSETTE_REPLAY = "run.cassette"
+# 回放延迟："recorded" 使用录制时的延迟，或固定秒数
+#CASSETTE_LATENCY = "recorded"
+# 回放带宽（字节/秒），0 表示不限
+#CASSETTE_BANDWIDTH = 0
 
 # Set settings whose default value is deprecated to a future-proof value
 FEED_EXPORT_ENCODING = "utf-8"
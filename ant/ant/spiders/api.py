@@ -2,9 +2,12 @@ import json
 from urllib.parse import urlencode
 
 import scrapy
+from ant.dates import parse_date
+from ant.pagination import PaginatedApiSpider
+from ant.seen import notice_key
 
 
-class ApiSpider(scrapy.Spider):
+class ApiSpider(PaginatedApiSpider):
     """
     直接调用 API 获取公告列表，避免处理动态页面。
     如果目标字段与这里假设的不一致，可在日志里查看完整记录后微调字段映射。
@@ -15,11 +18,7 @@ class ApiSpider(scrapy.Spider):
     page_size = 26
     base_url = "https://glzb.geely.com/gpmp/notice/listnotice"
 
-    def start_requests(self):
-        """从第 1 页开始请求 API。"""
-        yield from self._make_request(page_number=1)
-
-    def _make_request(self, page_number: int):
+    def make_page_request(self, page_number: int):
         params = {
             "pagesize": self.page_size,
             "pagenumber": page_number,
@@ -35,19 +34,25 @@ class ApiSpider(scrapy.Spider):
             "User-Agent": "Mozilla/5.0",
         }
         self.logger.info(f"请求 API: {url}")
-        yield scrapy.Request(url, headers=headers, callback=self.parse, meta={"page_number": page_number})
+        return scrapy.Request(url, headers=headers, callback=self.parse, meta={"page_number": page_number})
 
-    def parse(self, response):
-        page_number = response.meta.get("page_number", 1)
+    @staticmethod
+    def _body(data):
+        # 兼容不同的字段命名
+        return data.get("data") or data.get("result") or {}
 
-        try:
-            data = response.json()
-        except Exception:
-            self.logger.error("响应非 JSON，前 200 字符: %s", response.text[:200])
-            return
+    def total_pages(self, data):
+        body = self._body(data)
+        total = body.get("total") or body.get("totalCount") or body.get("recordCount")
+        if total is None:
+            return None
+        page_size = body.get("pageSize") or self.page_size
+        # 向上取整
+        return -(-int(total) // page_size)
 
-        # 兼容不同的字段命名
-        body = data.get("data") or data.get("result") or {}
+    def parse_page(self, response, data):
+        page_number = response.meta["page_number"]
+        body = self._body(data)
         records = (
             body.get("list")
             or body.get("records")
@@ -58,33 +63,30 @@ class ApiSpider(scrapy.Spider):
 
         if not records:
             self.logger.warning(f"第 {page_number} 页未返回数据，停止翻页")
+            self.stop_paging(page_number)
             return
 
         # 产出记录：若接口字段名不同，可根据日志调整
         for rec in records:
-            yield {
+            item = {
                 "id": rec.get("id") or rec.get("noticeId"),
                 "title": rec.get("title") or rec.get("noticeTitle") or rec.get("name"),
                 "publish_time": rec.get("publishTime") or rec.get("publishDate") or rec.get("date"),
                 "url": rec.get("url") or rec.get("fileUrl") or rec.get("link"),
                 "raw": rec,  # 保留原始记录方便调试
             }
+            # 上次运行已经看过的公告（早于高水位，或与高水位同一时间且 ID 已记录）直接跳过
+            published = item["publish_time"]
+            parsed_date = parse_date(str(published), key=self.name) if published else None
+            notice_id = notice_key(item["url"], item["title"], published)
+            if self.checkpoint(parsed_date, notice_id):
+                self.logger.debug(f"上次运行已看过，跳过: {item['title']}")
+                continue
+            self.advance_watermark(parsed_date, notice_id)
+            yield item
 
-        # 翻页逻辑
-        total = body.get("total") or body.get("totalCount") or body.get("recordCount")
+        # 本页数量不足 page_size，说明已到最后一页
         page_size = body.get("pageSize") or self.page_size
-        current = body.get("pageNumber") or page_number
-
-        has_more = False
-        if total is not None:
-            # 有总数时，按总数判断
-            has_more = current * page_size < int(total)
-        else:
-            # 无总数时，如果本页数量达到 page_size，尝试下一页
-            has_more = len(records) >= page_size
-
-        if has_more:
-            next_page = current + 1
-            yield from self._make_request(page_number=next_page)
-        else:
+        if len(records) < page_size:
             self.logger.info("已到最后一页，停止爬取")
+            self.stop_paging(page_number)
@@ -2,50 +2,26 @@ import json
 from urllib.parse import urlencode
 
 import scrapy
+from ant.dates import parse_date
 from ant.items import AntItem
+from ant.matching import KEYWORDS, KeywordMatcher
+from ant.pagination import PaginatedApiSpider
+from ant.seen import notice_key
 
 
-class ChinaconchSpider(scrapy.Spider):
+class ChinaconchSpider(PaginatedApiSpider):
     name = "chinaconch"
     allowed_domains = ["srm.chinaconch.com"]
+    # API 使用 0-based 分页
+    first_page = 0
     page_size = 10
     base_url = "https://srm.chinaconch.com/ssrc/v1/3/hlsn/oauth-source-notices/br-list/public"
     
     # 关键字列表，用于筛选 bidTitle（可根据需要修改）
-    keywords = [
-        '设计施工总承包',
-        'epc',
-        '增容',
-        '配电',
-        '电力',
-        '设计',
-        '光伏',
-        '新能源',
-        '储能',
-        '线路',
-        '迁改',
-        '架空',
-        '送出',
-        '升压站',
-        '输变电',
-        '变电站',
-        '断路器',
-        '接入系统',
-        '电能质量评估',
-        '光储充',
-        '风储',
-        '渔光互补',
-        '风电',
-        '锂电',
-        '可研',
-        '大修',
-    ]
+    keywords = KEYWORDS
+    matcher = KeywordMatcher.for_keywords(keywords)
 
-    def start_requests(self):
-        """从第 0 页开始请求 API（API 使用 0-based 分页）。"""
-        yield from self._make_request(page_number=0)
-
-    def _make_request(self, page_number: int):
+    def make_page_request(self, page_number: int):
         params = {
             "lang": "zh_CN",
             "sourceFrom": "BID",
@@ -59,16 +35,13 @@ class ChinaconchSpider(scrapy.Spider):
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
         }
         self.logger.info(f"请求 API: {url}")
-        yield scrapy.Request(url, headers=headers, callback=self.parse, meta={"page_number": page_number})
+        return scrapy.Request(url, headers=headers, callback=self.parse, meta={"page_number": page_number})
 
-    def parse(self, response):
-        page_number = response.meta.get("page_number", 0)
+    def total_pages(self, data):
+        return data.get("totalPages")
 
-        try:
-            data = response.json()
-        except Exception as e:
-            self.logger.error(f"响应非 JSON，错误: {e}，前 200 字符: {response.text[:200]}")
-            return
+    def parse_page(self, response, data):
+        page_number = response.meta["page_number"]
 
         # 获取分页信息
         total_pages = data.get("totalPages", 0)
@@ -80,23 +53,29 @@ class ChinaconchSpider(scrapy.Spider):
 
         if not content_list:
             self.logger.warning(f"第 {current_page + 1} 页未返回数据，停止翻页")
+            self.stop_paging(page_number)
             return
 
         # 处理每条记录
         for rec in content_list:
+            self.crawler.stats.inc_value("rows/seen")
             bid_title = rec.get("bidTitle")
             bid_status_meaning = rec.get("bidStatusMeaning")
             sign_start_date = rec.get("signStartDate")
             
+            # 上次运行已经看过的公告（早于高水位，或与高水位同一时间且 ID 已记录）直接跳过
+            parsed_date = parse_date(str(sign_start_date), key=self.name) if sign_start_date else None
+            notice_id = notice_key(None, bid_title, sign_start_date)
+            if self.checkpoint(parsed_date, notice_id):
+                self.logger.debug(f"上次运行已看过，跳过: {bid_title}")
+                continue
+            
             # 根据 bidTitle 进行筛选
             if bid_title:
-                bid_title_lower = str(bid_title).lower()
-                # 检查标题是否包含任何关键字（不区分大小写）
-                contains_keyword = any(keyword.lower() in bid_title_lower for keyword in self.keywords)
+                # 一次扫描得到全部匹配的关键字（不区分大小写和全角/半角）
+                matched_keywords = self.matcher.findall(str(bid_title))
                 
-                if contains_keyword:
-                    # 找到匹配的关键字（用于日志）
-                    matched_keywords = [kw for kw in self.keywords if kw.lower() in bid_title_lower]
+                if matched_keywords:
                     self.logger.debug(f"标题包含关键字: {matched_keywords} - {bid_title} (状态: {bid_status_meaning})")
                     
                     # 创建 item
@@ -107,16 +86,10 @@ class ChinaconchSpider(scrapy.Spider):
                     item['file_url'] = None  # API 响应中没有直接的 URL
                     item['content'] = None
                     
+                    self.advance_watermark(parsed_date, notice_id)
                     yield item
                 else:
                     self.logger.debug(f"标题不包含关键字，跳过: {bid_title}")
+                    self.crawler.stats.inc_value("rows/dropped/keyword")
             else:
                 self.logger.debug("bidTitle 为空，跳过该项")
-
-        # 翻页逻辑：如果当前页小于总页数减1（因为从0开始），继续下一页
-        if current_page < total_pages - 1:
-            next_page = current_page + 1
-            self.logger.info(f"第 {current_page + 1} 页处理完成，继续爬取第 {next_page + 1} 页")
-            yield from self._make_request(page_number=next_page)
-        else:
-            self.logger.info(f"已到最后一页（第 {current_page + 1} 页），停止爬取")
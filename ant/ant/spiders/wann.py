@@ -1,52 +1,25 @@
 import json
-import re
-from datetime import datetime, timedelta
 import scrapy
+from ant.dates import parse_date
 from ant.items import AntItem
+from ant.matching import KEYWORDS, KeywordMatcher
+from ant.pagination import PaginatedApiSpider
+from ant.seen import notice_key
 
 
-class WannSpider(scrapy.Spider):
+class WannSpider(PaginatedApiSpider):
     name = "wann"
     allowed_domains = ["tab.wenergy.com.cn"]
     api_url = "https://tab.wenergy.com.cn/inteligentsearch_wz/rest/esinteligentsearch/getFullTextDataNew"
     page_size = 10  # 每页10条
     
     # 关键字列表，用于筛选标题
-    keywords = [
-        '设计施工总承包',
-        'epc',
-        '增容',
-        '配电',
-        '电力',
-        '设计',
-        '光伏',
-        '新能源',
-        '储能',
-        '线路',
-        '迁改',
-        '架空',
-        '送出',
-        '升压站',
-        '输变电',
-        '变电站',
-        '断路器',
-        '接入系统',
-        '电能质量评估',
-        '光储充',
-        '风储',
-        '渔光互补',
-        '风电',
-        '锂电',
-        '可研',
-        '大修',
-    ]
+    keywords = KEYWORDS
+    matcher = KeywordMatcher.for_keywords(keywords)
     
-    def start_requests(self):
-        """从第 1 页开始请求 API（pn=0）"""
-        yield from self._make_request(pn=0)
-    
-    def _make_request(self, pn=0):
-        """构造 POST 请求（JSON 格式）"""
+    def make_page_request(self, page_number: int):
+        """构造 POST 请求（JSON 格式），第 1 页 pn=0，第 2 页 pn=10，依此类推"""
+        pn = (page_number - 1) * self.page_size
         # 构造请求数据（注意 sort 是 JSON 字符串）
         request_data = {
             "token": "",
@@ -89,10 +62,9 @@ class WannSpider(scrapy.Spider):
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
         }
         
-        page_number = (pn // self.page_size) + 1
         self.logger.info(f"请求 API 第 {page_number} 页 (pn={pn})")
         
-        yield scrapy.Request(
+        return scrapy.Request(
             url=self.api_url,
             method="POST",
             body=json.dumps(request_data, ensure_ascii=False),
@@ -103,35 +75,19 @@ class WannSpider(scrapy.Spider):
         )
     
     def errback_handler(self, failure):
-        """处理请求失败的回调"""
-        self.logger.error(f"请求失败: {failure.value}")
+        """处理请求失败的回调：打印响应内容，再按翻页失败处理"""
         if hasattr(failure.value, 'response') and failure.value.response:
             response = failure.value.response
             self.logger.error(f"响应状态码: {response.status}")
             self.logger.error(f"响应内容: {response.text[:1000]}")
+        yield from self.page_failed(failure)
 
-    def parse(self, response):
+    def parse_page(self, response, data):
         pn = response.meta.get("pn", 0)
-        page_number = response.meta.get("page_number", 1)
+        page_number = response.meta["page_number"]
         
-        # 添加调试信息
-        self.logger.info(f"响应状态码: {response.status}")
         self.logger.info(f"当前页码: {page_number} (pn={pn})")
         
-        # 检查响应是否成功
-        if response.status != 200:
-            self.logger.error(f"请求失败，状态码: {response.status}")
-            self.logger.error(f"响应内容: {response.text[:1000]}")
-            return
-        
-        # 解析 JSON 响应
-        try:
-            data = response.json()
-        except Exception as e:
-            self.logger.error(f"响应非 JSON 格式: {e}")
-            self.logger.debug(f"响应内容前500字符: {response.text[:500]}")
-            return
-        
         # 提取数据列表：数据在 result.records 中
         result = data.get("result", {})
         records = result.get("records", [])
@@ -140,16 +96,17 @@ class WannSpider(scrapy.Spider):
         
         if not records:
             self.logger.warning(f"第 {page_number} 页未返回数据，停止翻页")
+            self.stop_paging(page_number)
             return
         
-        # 计算18天前的日期
-        today = datetime.now()
-        cutoff_date = today - timedelta(days=18)
+        # 截止时间：max(上次运行的高水位, 当前时间 - 时间窗口)
+        cutoff_date = self.cutoff_date
         should_stop = False  # 标记是否应该停止翻页
         
         # 循环遍历每条记录
         for record in records:
             item = AntItem()
+            self.crawler.stats.inc_value("rows/seen")
             
             # 提取标题：字段名是 title
             item['title'] = record.get("title")
@@ -176,107 +133,56 @@ class WannSpider(scrapy.Spider):
             if item['time']:
                 item['time'] = str(item['time']).strip()
             
-            # 解析时间并检查是否超过18天
+            # 解析时间并检查是否早于截止时间
             time_str = item['time']
+            parsed_date = None
             if time_str:
-                parsed_date = self._parse_date(time_str)
+                parsed_date = parse_date(time_str, key=self.name)
                 if parsed_date:
                     if parsed_date < cutoff_date:
                         should_stop = True
-                        self.logger.info(f"发现超过18天的数据：{time_str} ({parsed_date.strftime('%Y-%m-%d')})，将停止爬取并导出数据")
-                        # 遇到超过18天的数据，立即停止处理当前页剩余数据
+                        self.logger.info(f"发现早于截止时间的数据：{time_str} ({parsed_date.strftime('%Y-%m-%d')})，将停止爬取并导出数据")
+                        self.crawler.stats.inc_value("rows/dropped/date")
+                        # 遇到早于截止时间的数据，立即停止处理当前页剩余数据
                         break
             
+            # 上次运行已经看过的公告（早于高水位，或与高水位同一时间且 ID 已记录）直接跳过
+            notice_id = notice_key(item['file_url'], item['title'], item['time'])
+            if self.checkpoint(parsed_date, notice_id):
+                self.logger.debug(f"上次运行已看过，跳过: {item['title']}")
+                continue
+            
             # 设置其他字段
             item['status'] = None
             item['content'] = None
             
             # 关键字筛选：检查标题是否包含任何关键字
             if item['title']:
-                title_lower = item['title'].lower()
-                # 检查标题是否包含任何关键字（不区分大小写）
-                contains_keyword = any(keyword.lower() in title_lower for keyword in self.keywords)
+                # 一次扫描得到全部匹配的关键字（不区分大小写和全角/半角）
+                matched_keywords = self.matcher.findall(item['title'])
                 
-                if contains_keyword:
-                    # 找到匹配的关键字（用于日志）
-                    matched_keywords = [kw for kw in self.keywords if kw.lower() in title_lower]
+                if matched_keywords:
                     self.logger.debug(f"标题包含关键字: {matched_keywords} - {item['title']}")
+                    self.advance_watermark(parsed_date, notice_id)
                     yield item
                 else:
                     self.logger.debug(f"标题不包含关键字，跳过: {item['title']}")
+                    self.crawler.stats.inc_value("rows/dropped/keyword")
             else:
                 # 如果没有标题，也跳过
                 self.logger.debug("标题为空，跳过该项")
         
-        # 如果发现超过18天的数据，停止翻页并终止程序
+        # 如果发现早于截止时间的数据，停止翻页
         if should_stop:
             self.logger.info("=" * 50)
-            self.logger.info("检测到超过18天的数据，停止爬取。程序将正常终止，数据已导出。")
+            self.logger.info("检测到早于截止时间的数据，停止爬取。程序将正常终止，数据已导出。")
             self.logger.info("=" * 50)
-            return  # 直接返回，不执行任何翻页逻辑
+            self.stop_paging(page_number)
+            return
         
-        # 翻页逻辑：如果本页数据量等于 page_size，继续下一页
-        # 下一页的 pn = 当前 pn + page_size (pn=0是第一页，pn=10是第二页，pn=20是第三页)
-        if len(records) >= self.page_size:
-            next_pn = pn + self.page_size
-            next_page_number = page_number + 1
-            self.logger.info(f"第 {page_number} 页有 {len(records)} 条数据，继续爬取第 {next_page_number} 页 (pn={next_pn})")
-            yield from self._make_request(pn=next_pn)
-        else:
+        # 本页数据量少于 page_size，说明已到最后一页；否则由基类继续请求下一页
+        if len(records) < self.page_size:
             self.logger.info(f"第 {page_number} 页只有 {len(records)} 条数据（少于 {self.page_size} 条），已到最后一页")
-    
-    def _parse_date(self, date_str):
-        """
-        解析日期字符串，支持多种格式
-        返回 datetime 对象，如果解析失败返回 None
-        """
-        if not date_str:
-            return None
-        
-        # 清理字符串
-        date_str = date_str.strip()
-        
-        # 常见的日期格式
-        date_formats = [
-            '%Y-%m-%d %H:%M:%S',  # 2026-01-16 00:00:00 (API返回格式)
-            '%Y-%m-%d',           # 2024-01-12
-            '%Y/%m/%d',           # 2024/01/12
-            '%Y年%m月%d日',        # 2024年1月12日
-            '%Y.%m.%d',           # 2024.01.12
-            '%m-%d',              # 01-12 (假设是今年)
-            '%m/%d',              # 01/12 (假设是今年)
-            '%m月%d日',            # 1月12日 (假设是今年)
-        ]
-        
-        for fmt in date_formats:
-            try:
-                parsed = datetime.strptime(date_str, fmt)
-                # 如果格式中没有年份（如 01-12），假设是今年
-                if '%Y' not in fmt:
-                    parsed = parsed.replace(year=datetime.now().year)
-                return parsed
-            except ValueError:
-                continue
-        
-        # 如果所有格式都失败，尝试使用正则表达式提取日期
-        # 匹配 2024-01-12 或 2024/01/12 等格式
-        match = re.search(r'(\d{4})[-\/年](\d{1,2})[-\/月](\d{1,2})', date_str)
-        if match:
-            try:
-                year, month, day = int(match.group(1)), int(match.group(2)), int(match.group(3))
-                return datetime(year, month, day)
-            except ValueError:
-                pass
-        
-        # 匹配只有月日的格式（如 01-12）
-        match = re.search(r'(\d{1,2})[-\/月](\d{1,2})', date_str)
-        if match:
-            try:
-                month, day = int(match.group(1)), int(match.group(2))
-                # 假设是今年
-                return datetime(datetime.now().year, month, day)
-            except ValueError:
-                pass
-        
-        self.logger.warning(f"无法解析日期格式: {date_str}")
-        return None
\ No newline at end of file
+            self.stop_paging(page_number)
+        else:
+            self.logger.info(f"第 {page_number} 页有 {len(records)} 条数据，继续爬取第 {page_number + 1} 页")
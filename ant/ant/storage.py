@@ -0,0 +1,182 @@
+# 公告存储
+#
+# 原来只有 JSON 输出文件，查询“本月所有储能公告”要把所有文件重新读一遍。
+# NoticeStore 把公告写入 SQLite：按公告 ID 更新或插入，攒够一批再在一个事务中写入，
+# 并维护标题和正文的 FTS5 全文索引。SQLite 自带的分词器不能切分中文，
+# 这里写入索引前先把中文切成相邻两字（bigram），查询时按同样的方式切分后做短语匹配。
+
+import re
+import sqlite3
+from datetime import datetime
+
+from ant.dates import parse_date
+from ant.matching import fold
+from ant.seen import notice_key
+
+# 连续的中文，或连续的字母数字
+_TOKEN_RE = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|[a-z0-9]+")
+_CJK_RE = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]")
+# 相邻两字（零宽前瞻，一次 findall 得到全部重叠的两字组合）
+_PAIR_RE = re.compile(r"(?=(..))", re.S)
+
+_COLUMNS = ("id", "spider", "title", "content", "status", "file_url", "time", "published", "cluster_id")
+
+
+def bigrams(text):
+    """
+    切分为索引用的词：中文按相邻两字切分，字母数字按整个词，以空格连接
+    """
+    if not text:
+        return ""
+    tokens = []
+    for run in _TOKEN_RE.findall(fold(str(text))):
+        if len(run) > 1 and _CJK_RE.match(run):
+            tokens.extend(_PAIR_RE.findall(run))
+        else:
+            tokens.append(run)
+    return " ".join(tokens)
+
+
+def fts_query(text):
+    """
+    把查询文本转换为 FTS5 查询：空格分隔的每个词切分后作为一个短语，各短语之间为 AND
+
+    只有一个汉字的词按前缀匹配（只能匹配该字开头的两字词）。
+    """
+    phrases = []
+    for term in str(text).split():
+        tokens = bigrams(term)
+        if not tokens:
+            continue
+        if len(tokens) == 1 and _CJK_RE.match(tokens):
+            phrases.append(f'"{tokens}"*')
+        else:
+            phrases.append(f'"{tokens}"')
+    return " ".join(phrases)
+
+
+class NoticeStore:
+    """
+    SQLite 公告库
+
+    add() 先把公告放入缓冲区，满 batch_size 条或 flush() 时在一个事务中写入；
+    同一公告 ID 再次写入时更新原记录，首次写入时间保持不变。
+    """
+
+    def __init__(self, path, batch_size=200):
+        self.path = path
+        self.batch_size = batch_size
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # WAL 模式下 NORMAL 已能保证数据库不损坏，只可能丢失最后一批
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS notices (
+                id TEXT PRIMARY KEY,
+                spider TEXT,
+                title TEXT,
+                content TEXT,
+                status TEXT,
+                file_url TEXT,
+                time TEXT,
+                published TEXT,
+                cluster_id TEXT,
+                first_seen TEXT NOT NULL,
+                updated TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS notices_published ON notices (published);
+            CREATE INDEX IF NOT EXISTS notices_spider_published ON notices (spider, published);
+            CREATE VIRTUAL TABLE IF NOT EXISTS notices_fts USING fts5(title, content, tokenize = 'unicode61');
+            """
+        )
+        self.conn.commit()
+        self._pending = []
+        columns = ", ".join(_COLUMNS)
+        # 再次写入时只用非空的新值覆盖，列表页和详情页先后写入同一公告时不会丢掉正文
+        updates = ", ".join(f"{column} = COALESCE(excluded.{column}, {column})" for column in _COLUMNS[1:])
+        self._upsert = (
+            f"INSERT INTO notices ({columns}, first_seen, updated) VALUES ({', '.join('?' * (len(_COLUMNS) + 2))}) "
+            f"ON CONFLICT (id) DO UPDATE SET {updates}, updated = excluded.updated "
+            "RETURNING rowid, title, content"
+        )
+
+    def add(self, spider, item):
+        """
+        加入一条公告（dict 或 ItemAdapter），返回公告 ID；没有链接和标题时无法确定 ID，返回 None
+        """
+        url = item.get("file_url") or item.get("url")
+        title = item.get("title")
+        time = item.get("time") or item.get("publish_time")
+        notice_id = item.get("id") or notice_key(url, title, time)
+        if not notice_id:
+            return None
+        content = item.get("content")
+        if content is not None and not isinstance(content, str):
+            content = " ".join(str(part) for part in content)
+        published = parse_date(time, key=spider) if time else None
+        self._pending.append((
+            str(notice_id),
+            spider,
+            title,
+            content,
+            item.get("status"),
+            url,
+            str(time) if time is not None else None,
+            published.isoformat(timespec="seconds") if published else None,
+            item.get("cluster_id"),
+        ))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+        return notice_id
+
+    def flush(self):
+        if not self._pending:
+            return 0
+        now = datetime.now().isoformat(timespec="seconds")
+        with self.conn:
+            for row in self._pending:
+                rowid, title, content = self.conn.execute(self._upsert, (*row, now, now)).fetchone()
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO notices_fts (rowid, title, content) VALUES (?, ?, ?)",
+                    (rowid, bigrams(title), bigrams(content)),
+                )
+        count = len(self._pending)
+        self._pending.clear()
+        return count
+
+    def search(self, text=None, since=None, until=None, spider=None, limit=100):
+        """
+        全文检索，按发布时间倒序返回公告（dict）
+
+        text 为空时只按时间和爬虫筛选，只有标点等不能检索的字符时返回空列表；
+        since / until 为 datetime 或 ISO 格式字符串。
+        """
+        conditions = []
+        params = []
+        if text:
+            query = fts_query(text)
+            if not query:
+                return []
+            conditions.append("n.rowid IN (SELECT rowid FROM notices_fts WHERE notices_fts MATCH ?)")
+            params.append(query)
+        if since is not None:
+            conditions.append("n.published >= ?")
+            params.append(since.isoformat() if isinstance(since, datetime) else since)
+        if until is not None:
+            conditions.append("n.published < ?")
+            params.append(until.isoformat() if isinstance(until, datetime) else until)
+        if spider is not None:
+            conditions.append("n.spider = ?")
+            params.append(spider)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        cursor = self.conn.execute(
+            f"SELECT {', '.join('n.' + column for column in _COLUMNS)} FROM notices n {where} "
+            "ORDER BY n.published DESC LIMIT ?",
+            (*params, limit),
+        )
+        return [dict(zip(_COLUMNS, row)) for row in cursor]
+
+    def close(self):
+        self.flush()
+        self.conn.close()
@@ -0,0 +1,144 @@
+# 多租户订阅匹配
+#
+# 每个客户可以有多条订阅规则（包含词、排除词、排除状态、限定爬虫、时效），
+# 所有规则的词汇编译进同一个 KeywordMatcher，再用倒排表把命中的词映射到规则，
+# 其余条件也都预先按取值分组成规则集合，匹配一条公告只需要一次扫描加若干集合运算，
+# 不会逐条规则判断。
+
+import json
+from datetime import datetime, timedelta
+
+from ant.matching import KeywordMatcher, fold
+
+
+class Subscription:
+    """
+    一条订阅规则
+
+    include 中任一词出现在标题中即命中（为空表示不限关键字），
+    exclude 中任一词出现则不命中；exclude_status 中任一词出现在状态中则不命中；
+    spiders 为空表示不限来源；max_age_days 为空表示不限发布时间。
+    """
+
+    def __init__(self, id, subscriber, include=(), exclude=(), exclude_status=(), spiders=(), max_age_days=None):
+        self.id = str(id)
+        self.subscriber = str(subscriber)
+        self.include = tuple(fold(term) for term in include if term)
+        self.exclude = tuple(fold(term) for term in exclude if term)
+        self.exclude_status = tuple(fold(term) for term in exclude_status if term)
+        self.spiders = tuple(spiders)
+        self.max_age_days = max_age_days
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            id=data["id"],
+            subscriber=data.get("subscriber", data["id"]),
+            include=data.get("include", ()),
+            exclude=data.get("exclude", ()),
+            exclude_status=data.get("exclude_status", ()),
+            spiders=data.get("spiders", ()),
+            max_age_days=data.get("max_age_days"),
+        )
+
+
+class SubscriptionIndex:
+    """
+    订阅规则的倒排索引
+
+    规则按加入顺序编号，各类条件都预先整理成“取值 -> 规则编号集合”，
+    match() 的开销取决于命中的规则数，与规则总数无关。
+    """
+
+    def __init__(self, subscriptions=()):
+        self.subscriptions = []
+        self._title_matcher = None
+        self._status_matcher = None
+        for subscription in subscriptions:
+            self.add(subscription)
+
+    def add(self, subscription):
+        self.subscriptions.append(subscription)
+        self._title_matcher = None
+
+    def __len__(self):
+        return len(self.subscriptions)
+
+    def build(self):
+        # 标题词 -> 包含该词的规则 / 排除该词的规则
+        include = {}
+        exclude = {}
+        exclude_status = {}
+        self._wildcard = set()
+        self._by_spider = {}
+        self._disallowed_cache = {}
+        by_age = {}
+        for rid, subscription in enumerate(self.subscriptions):
+            if subscription.include:
+                for term in subscription.include:
+                    include.setdefault(term, set()).add(rid)
+            else:
+                self._wildcard.add(rid)
+            for term in subscription.exclude:
+                exclude.setdefault(term, set()).add(rid)
+            for term in subscription.exclude_status:
+                exclude_status.setdefault(term, set()).add(rid)
+            for name in subscription.spiders:
+                self._by_spider.setdefault(name, set()).add(rid)
+            if subscription.max_age_days is not None:
+                by_age.setdefault(subscription.max_age_days, set()).add(rid)
+        self._include = {term: frozenset(rids) for term, rids in include.items()}
+        self._exclude = {term: frozenset(rids) for term, rids in exclude.items()}
+        self._exclude_status = {term: frozenset(rids) for term, rids in exclude_status.items()}
+        # 按时效从短到长排列，发布时间超过某个时效的公告对更短时效的规则也都过期
+        self._by_age = sorted((days, frozenset(rids)) for days, rids in by_age.items())
+        self._title_matcher = KeywordMatcher(sorted(set(include) | set(exclude)))
+        self._status_matcher = KeywordMatcher(sorted(exclude_status))
+
+    def _disallowed(self, spider):
+        # 限定了来源且不包含该爬虫的规则，每个爬虫只计算一次
+        disallowed = self._disallowed_cache.get(spider)
+        if disallowed is None:
+            restricted = set().union(*self._by_spider.values())
+            disallowed = frozenset(restricted - self._by_spider.get(spider, set()))
+            self._disallowed_cache[spider] = disallowed
+        return disallowed
+
+    def match(self, title, status=None, spider=None, published=None, now=None):
+        """
+        返回命中的规则列表
+        """
+        if self._title_matcher is None:
+            self.build()
+        terms = self._title_matcher.findall(title) if title else []
+        include = self._include
+        candidates = self._wildcard.union(*[include[term] for term in terms if term in include])
+        if not candidates:
+            return []
+        # 排除词和排除状态对应的规则集合通常很小，先合并再一次性剔除
+        exclude = self._exclude
+        excluded = set().union(*[exclude[term] for term in terms if term in exclude])
+        if status and self._exclude_status:
+            for term in self._status_matcher.findall(str(status)):
+                excluded |= self._exclude_status[term]
+        if excluded:
+            candidates.difference_update(excluded)
+        # 限定来源和时效的规则集合可能很大，difference() 会遍历候选集而不是整个规则集合
+        if spider is not None and self._by_spider:
+            candidates = candidates.difference(self._disallowed(spider))
+        if published is not None and self._by_age:
+            age = (now or datetime.now()) - published
+            for days, rids in self._by_age:
+                if age <= timedelta(days=days):
+                    break
+                candidates = candidates.difference(rids)
+        subscriptions = self.subscriptions
+        return [subscriptions[rid] for rid in sorted(candidates)]
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        从 JSON 文件加载规则，文件内容为规则对象的数组
+        """
+        with open(path, encoding="utf-8") as f:
+            return cls(Subscription.from_dict(data) for data in json.load(f))
@@ -0,0 +1,131 @@
+# 按域名限速
+#
+# 全局 DOWNLOAD_DELAY = 3 让 srm.chinaconch.com 这类能承受高并发的 JSON 接口
+# 和最脆弱的 HTML 站点一样慢。DOMAIN_RATE_LIMITS 为指定域名设置令牌桶：
+# 每秒 rate 个请求，最多连续突发 burst 个，同时在途不超过 concurrency 个。
+# 配置了的域名不再使用 DOWNLOAD_DELAY，其他域名仍按原来的延迟下载。
+#
+# 没有合适的固定速率时用 AimdController 自动寻找：响应正常时每个窗口加一点速率（加性增），
+# 遇到 429 / 5xx / 超时或延迟明显升高时速率减半（乘性减），与 TCP 拥塞控制相同。
+
+import math
+from collections import deque
+from time import monotonic
+
+
+class TokenBucket:
+    """
+    令牌桶：reserve() 预定一个令牌，返回需要等待的秒数
+
+    令牌不足时允许透支，后来的请求依次排在前面的请求之后，保证长期速率不超过 rate。
+    rate 为 0 表示不限速。
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = self.burst
+        self.updated = monotonic()
+
+    def reserve(self, now=None):
+        if not self.rate:
+            return 0.0
+        now = monotonic() if now is None else now
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+
+def domain_limit(limits, host):
+    """
+    在 {域名: 配置} 中查找 host 对应的配置，域名也匹配其子域名；返回 (域名, 配置)，没有时返回 (None, None)
+    """
+    host = (host or "").lower()
+    while host:
+        if host in limits:
+            return host, limits[host]
+        _, _, host = host.partition(".")
+    return None, None
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class AimdController:
+    """
+    单个域名的 AIMD 速率控制
+
+    每收到 window 个正常响应速率增加 increase（请求/秒）；出错、被限流或 p95 延迟超过
+    基线（观测到的最低 p50）的 latency_factor 倍时速率乘以 decrease。减速后，减速之前
+    发出的请求再出错不会重复减速（它们是按旧速率发出的）。
+    并发数按 Little 定律取 速率 × p50 延迟 向上取整再加 1，限制在 max_concurrency 以内。
+    """
+
+    def __init__(self, rate=1.0, min_rate=0.1, max_rate=20.0, increase=0.2, decrease=0.5,
+                 window=20, latency_factor=3.0, max_concurrency=8):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.window = window
+        self.latency_factor = latency_factor
+        self.max_concurrency = max_concurrency
+        self.latencies = deque(maxlen=max(window, 10) * 5)
+        self.baseline = None
+        self.successes = 0
+        self.decreases = 0
+        self.decreased_at = float("-inf")
+
+    @property
+    def delay(self):
+        return 1.0 / self.rate
+
+    @property
+    def concurrency(self):
+        needed = math.ceil(self.rate * percentile(self.latencies, 0.5)) + 1
+        return max(1, min(self.max_concurrency, needed))
+
+    def on_response(self, latency, sent_at, now=None):
+        """
+        记录一个正常响应，返回速率是否变化
+        """
+        self.latencies.append(latency)
+        if len(self.latencies) >= self.window:
+            p50 = percentile(self.latencies, 0.5)
+            self.baseline = p50 if self.baseline is None else min(self.baseline, p50)
+            if percentile(self.latencies, 0.95) > self.latency_factor * self.baseline:
+                return self.on_congestion(sent_at, now=now)
+        self.successes += 1
+        if self.successes < self.window:
+            return False
+        self.successes = 0
+        rate = min(self.max_rate, self.rate + self.increase)
+        changed = rate != self.rate
+        self.rate = rate
+        return changed
+
+    def on_congestion(self, sent_at, retry_after=None, now=None):
+        """
+        记录一次出错、限流或延迟过高，返回速率是否变化
+        """
+        self.successes = 0
+        if sent_at < self.decreased_at:
+            return False
+        rate = max(self.min_rate, self.rate * self.decrease)
+        if retry_after:
+            rate = max(self.min_rate, min(rate, 1.0 / retry_after))
+        self.decreased_at = monotonic() if now is None else now
+        self.decreases += 1
+        # 延迟窗口从减速后重新统计
+        self.latencies.clear()
+        changed = rate != self.rate
+        self.rate = rate
+        return changed
@@ -0,0 +1,32 @@
+# 读取 ant/ 目录下保存的导出文件，作为基准测试的数据
+#
+# 多次运行 `scrapy crawl xxx -o xxx.json` 会把多个 JSON 数组追加到同一个文件，
+# 中断的爬取还会留下没有结尾的数组；导出器每行写一条记录，这里按行解码。
+
+import json
+from pathlib import Path
+
+FEED_DIR = Path(__file__).resolve().parent.parent / "ant"
+
+
+def load_feed(name):
+    """
+    读取 ant/<name>.json 中的全部记录
+    """
+    records = []
+    with open(FEED_DIR / f"{name}.json", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip().rstrip(",")
+            if line.startswith("{"):
+                records.append(json.loads(line))
+    return records
+
+
+def load_titles():
+    """
+    所有导出文件中的标题
+    """
+    titles = []
+    for name in ("anhui", "ctg", "cnncecp", "huarun", "wann", "chinaconch"):
+        titles.extend(r["title"] for r in load_feed(name) if r.get("title"))
+    return titles
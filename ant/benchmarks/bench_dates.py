@@ -0,0 +1,80 @@
+"""
+日期解析基准：原 _parse_date（逐个 strptime）vs. ant.dates.DateParser
+
+使用 ctg.json / wann.json 中保存的时间字符串，在 ant/ 目录下运行：
+python -m benchmarks.bench_dates
+"""
+
+import re
+import timeit
+from datetime import datetime
+
+from ant.dates import DateParser
+
+from benchmarks._feeds import load_feed
+
+LEGACY_FORMATS = (
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d',
+    '%Y/%m/%d %H:%M:%S',
+    '%Y/%m/%d',
+    '%Y年%m月%d日',
+    '%Y.%m.%d',
+    '%m-%d',
+    '%m/%d',
+    '%m月%d日',
+)
+
+
+def legacy_parse_date(date_str, date_formats=LEGACY_FORMATS):
+    # 各爬虫原来的 _parse_date（去掉日志）
+    if not date_str:
+        return None
+    date_str = str(date_str).strip()
+    for fmt in date_formats:
+        try:
+            parsed = datetime.strptime(date_str, fmt)
+            if '%Y' not in fmt:
+                parsed = parsed.replace(year=datetime.now().year)
+            return parsed
+        except ValueError:
+            continue
+    match = re.search(r'(\d{4})[-\/年](\d{1,2})[-\/月](\d{1,2})', date_str)
+    if match:
+        try:
+            return datetime(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+        except ValueError:
+            pass
+    match = re.search(r'(\d{1,2})[-\/月](\d{1,2})', date_str)
+    if match:
+        try:
+            return datetime(datetime.now().year, int(match.group(1)), int(match.group(2)))
+        except ValueError:
+            pass
+    return None
+
+
+def run(name, values, number=20):
+    for value in values:
+        assert DateParser().parse(value, key=name) == legacy_parse_date(value), value
+
+    def best(func):
+        return min(timeit.repeat(lambda: [func(v) for v in values], number=number, repeat=5)) / (len(values) * number) * 1e6
+
+    legacy = best(legacy_parse_date)
+    parser = DateParser()
+    # 直接调用 _parse()：只有预编译正则和格式记忆，没有字符串缓存的收益
+    remembered = best(lambda v: parser._parse(str(v).strip(), name))
+    warm = best(lambda v: parser.parse(v, key=name))
+    print(f"{name:>5} {len(values):>5} 条 ({len(set(values))} 个不同值, 如 {values[0]!r})")
+    print(f"      原实现 {legacy:6.2f} µs  正则+格式记忆 {remembered:6.2f} µs  "
+          f"带缓存 {warm:6.2f} µs  加速 {legacy / remembered:4.1f}x / {legacy / warm:4.1f}x")
+
+
+def main():
+    for name in ("ctg", "wann"):
+        run(name, [r["time"] for r in load_feed(name) if r.get("time")])
+
+
+if __name__ == "__main__":
+    main()
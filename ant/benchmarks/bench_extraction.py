@@ -0,0 +1,197 @@
+"""
+提取基准：原来的 css() 写法 vs. ant/extraction.py
+
+列表行：原来每行多次 li.css() vs. RowExtractor 编译好的 XPath。页面取 fixtures/ 下 anhui、ctg 的列表页，
+再加上模拟门户（mockportal）生成的 ctg 列表页；两种写法的提取结果逐行比较。
+详情页正文：原来的 ::text 逐个取出再拼接 vs. ContentExtractor（不限长度和 --max-chars）。页面取
+fixtures/ctg_detail.html 和模拟门户生成的详情页；两种写法去掉空白后的文本比较。
+
+每次都新建响应，计时包含 lxml 解析，与实际爬取时相同；另外单独给出只算提取部分的加速比。
+提取结果不一致时退出码为 1。
+
+在 ant/ 目录下运行：python -m benchmarks.bench_extraction [--pages 200] [--max-chars 2000]
+"""
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+from scrapy.http import HtmlResponse
+
+from ant.spiders.anhui import AnhuiSpider
+from ant.spiders.ctg import CtgSpider
+from benchmarks.mockportal import Portal
+
+FIXTURE_DIR = Path(__file__).resolve().parent / "fixtures"
+
+
+def legacy_anhui(response):
+    # AnhuiSpider.parse_page 原来的写法
+    rows = []
+    for li in response.css('#tradeList > div > ul > li'):
+        title_link = li.css('div.titBox > div.fl.tit > a')
+        if title_link:
+            title = title_link.css('::text').get()
+            link = title_link.css('::attr(href)').get()
+        else:
+            title = li.css('a::text').get()
+            link = li.css('a::attr(href)').get()
+        time_str = None
+        for text in li.css('::text').getall():
+            text = text.strip()
+            if re.match(r'\d{4}[-/]\d{1,2}[-/]\d{1,2}', text):
+                time_str = text
+                break
+        if not time_str:
+            time_str = li.css('span::text').re_first(r'\d{4}[-/]\d{1,2}[-/]\d{1,2}')
+        status = li.css('span.status::text').get() or li.css('.status::text').get()
+        rows.append({"title": title, "file_url": link, "time": time_str, "status": status})
+    return rows
+
+
+def legacy_ctg(response):
+    # CtgSpider.parse_page 原来的写法
+    rows = []
+    for li in response.css('#list1 > li'):
+        title_link = li.css('a')
+        if title_link:
+            title = title_link.css('::attr(title)').get()
+            link = title_link.css('::attr(href)').get()
+        else:
+            title = li.css('::text').get()
+            link = None
+        time_str = None
+        for text in li.css('::text').getall():
+            text = text.strip()
+            if re.match(r'\d{4}-\d{1,2}-\d{1,2}', text):
+                time_str = text
+                break
+        if not time_str:
+            time_str = li.css('span::text').re_first(r'\d{4}-\d{1,2}-\d{1,2}')
+        rows.append({"title": title, "file_url": link, "time": time_str})
+    return rows
+
+
+def legacy_detail(response):
+    # CtgSpider.parse_detail 原来的写法
+    content = response.css('body > div > div.insidepage > div.insidepage-left > div.article-content')
+    if not content:
+        content = response.css('.article-content') or response.css('div.article-content')
+    if not content:
+        return None
+    return ' '.join(text.strip() for text in content.css('::text').getall() if text.strip())
+
+
+def content(max_chars=0):
+    def extract(response):
+        return CtgSpider.detail_content.extract(response, max_chars)
+
+    return extract
+
+
+def same_text(expected, actual):
+    # 原来用空格拼接，现在块之间换行，只比较去掉空白后的文本
+    if expected is None or actual is None:
+        return expected is actual
+    return re.sub(r"\s+", "", expected) == re.sub(r"\s+", "", actual)
+
+
+def compiled(extractor):
+    def extract(response):
+        return [extractor.extract(row) for row in extractor.select(response)]
+
+    return extract
+
+
+def pages(mock_pages, max_chars):
+    """
+    (名称, 地址, 页面列表, 原来的写法, 新写法, 结果比较)
+    """
+    portal = Portal(pages=mock_pages)
+    mock = [portal.ctg_list(page).encode("utf-8") for page in range(1, mock_pages + 1)]
+    details = [portal.ctg_detail(240000000 + index).encode("utf-8") for index in range(mock_pages)]
+    detail_url = "https://eps.ctg.com.cn/cms/channel/1ywgg1/240000000.htm"
+    detail_fixture = [(FIXTURE_DIR / "ctg_detail.html").read_bytes()]
+
+    def equal(expected, actual):
+        return expected == actual
+
+    def prefix(expected, actual):
+        # 限制长度时只比较开头
+        return expected is not None and actual is not None and re.sub(r"\s+", "", expected).startswith(re.sub(r"\s+", "", actual))
+
+    return (
+        ("anhui fixture", AnhuiSpider.start_urls[0], [(FIXTURE_DIR / "anhui_list.html").read_bytes()], legacy_anhui, compiled(AnhuiSpider.list_rows), equal),
+        ("ctg fixture", CtgSpider.start_urls[0], [(FIXTURE_DIR / "ctg_list.html").read_bytes()], legacy_ctg, compiled(CtgSpider.list_rows), equal),
+        (f"ctg mock x{mock_pages}", CtgSpider.start_urls[0], mock, legacy_ctg, compiled(CtgSpider.list_rows), equal),
+        ("detail fixture", detail_url, detail_fixture, legacy_detail, content(), same_text),
+        (f"detail mock x{mock_pages}", detail_url, details, legacy_detail, content(), same_text),
+        (f"detail cap {max_chars}", detail_url, detail_fixture, legacy_detail, content(max_chars), prefix),
+    )
+
+
+def responses(url, bodies):
+    return [HtmlResponse(url, body=body, encoding="utf-8") for body in bodies]
+
+
+def extract_only(extract, url, bodies, min_seconds):
+    calls = 0
+    spent = 0.0
+    while spent < min_seconds:
+        batch = responses(url, bodies)
+        for response in batch:
+            response.selector
+        started = time.perf_counter()
+        for response in batch:
+            extract(response)
+        spent += time.perf_counter() - started
+        calls += len(batch)
+    return spent / calls * 1000
+
+
+def full(extract, url, bodies, min_seconds):
+    calls = 0
+    started = time.perf_counter()
+    while True:
+        for response in responses(url, bodies):
+            extract(response)
+            calls += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_seconds:
+            return elapsed / calls * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="列表行提取基准")
+    parser.add_argument("--pages", type=int, default=200, help="模拟门户生成多少页 ctg 列表")
+    parser.add_argument("--max-chars", type=int, default=2000, help="正文限制长度的一项用多少字符")
+    parser.add_argument("--seconds", type=float, default=1.0, help="每项至少运行多少秒")
+    args = parser.parse_args()
+
+    mismatched = []
+    print(f"{'pages':<20}{'rows':>6}{'legacy ms':>12}{'compiled ms':>13}{'speedup':>9}{'extract-only':>14}")
+    for name, url, bodies, legacy, new, same in pages(args.pages, args.max_chars):
+        rows = 0
+        for response in responses(url, bodies):
+            expected, actual = legacy(response), new(response)
+            rows += len(actual) if isinstance(actual, list) else 1
+            if not same(expected, actual):
+                mismatched.append(name)
+        legacy_ms = full(legacy, url, bodies, args.seconds)
+        new_ms = full(new, url, bodies, args.seconds)
+        legacy_only = extract_only(legacy, url, bodies, args.seconds)
+        new_only = extract_only(new, url, bodies, args.seconds)
+        print(
+            f"{name:<20}{rows:>6}{legacy_ms:>12.3f}{new_ms:>13.3f}{legacy_ms / new_ms:>8.1f}x"
+            f"{legacy_only / new_only:>13.1f}x"
+        )
+
+    if mismatched:
+        print(f"提取结果不一致: {sorted(set(mismatched))}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
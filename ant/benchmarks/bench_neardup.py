@@ -0,0 +1,77 @@
+"""
+近似重复索引基准：百万条历史指纹下 NearDupIndex 查询与逐条计算海明距离的耗时
+
+先写入大量随机指纹模拟历史公告，再用样例公告标题的变体（加编号、括号说明、公告后缀）查询，
+统计每次查询的耗时和命中率。
+
+在 ant/ 目录下运行：python -m benchmarks.bench_neardup [历史条数]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+from ant.neardup import NearDupIndex, title_simhash
+from benchmarks._feeds import load_titles
+
+VARIANTS = (
+    "{}",
+    "{}招标公告",
+    "{}（招标编号：AH-2026-{:04d}）",
+    "【重新招标】{}",
+    "{}中标候选人公示",
+)
+
+
+def run(history=1000000, seed=0):
+    rng = random.Random(seed)
+    titles = sorted(set(load_titles()))
+    with tempfile.TemporaryDirectory() as tmp:
+        index = NearDupIndex(os.path.join(tmp, "neardup.db"), batch_size=50000)
+        started = time.perf_counter()
+        # 随机指纹之间的海明距离集中在 32 附近，模拟互不相关的历史公告
+        hashes = [rng.getrandbits(64) for _ in range(history)]
+        for number, value in enumerate(hashes):
+            index.add("t", value, f"h{number}")
+        for title in titles:
+            index.assign(title)
+        index.commit()
+        build = time.perf_counter() - started
+
+        matched = 0
+        queries = 0
+        started = time.perf_counter()
+        for number, title in enumerate(titles):
+            for variant in VARIANTS:
+                found = index.nearest("t", title_simhash(variant.format(title, number)))
+                queries += 1
+                matched += found is not None
+        elapsed = time.perf_counter() - started
+        index.close()
+
+    # 对照：逐条计算海明距离
+    probes = [title_simhash(title) for title in titles[:20]]
+    started = time.perf_counter()
+    for probe in probes:
+        min((probe ^ value).bit_count() for value in hashes)
+    linear = (time.perf_counter() - started) / len(probes)
+    return {
+        "history": history,
+        "build_s": round(build, 1),
+        "queries": queries,
+        "matched": matched,
+        "ms_per_query": round(elapsed / queries * 1000, 3),
+        "linear_ms_per_query": round(linear * 1000, 1),
+    }
+
+
+def main():
+    history = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    for key, value in run(history).items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+解析回调基准：用保存的页面构造响应，离线测量各爬虫解析回调的吞吐量和峰值内存
+
+fixtures/ 下每个文件对应一个回调的一页典型响应（按各站点的页面结构生成，可直接换成保存下来的真实页面）。
+每次调用都新建响应对象，与实际爬取时每个响应只解析一次相同。输出每个回调的调用次数/秒、
+产出条数/秒（item 和后续请求都算）和单次调用的峰值内存（tracemalloc）。
+
+--save 把结果保存为基线 JSON，--compare 与基线比较，任一回调慢于基线 --threshold 倍时退出码为 1。
+
+在 ant/ 目录下运行：python -m benchmarks.bench_parse [--save 文件] [--compare 文件] [--filter ctg]
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import scrapy
+from scrapy.http import HtmlResponse, TextResponse
+from scrapy.utils.test import get_crawler
+
+from ant.checkpoints import effective_cutoff
+from ant.spiders.anhui import AnhuiSpider
+from ant.spiders.api import ApiSpider
+from ant.spiders.chinaconch import ChinaconchSpider
+from ant.spiders.cnncecp import CnncecpSpider
+from ant.spiders.ctg import CtgSpider
+from ant.spiders.edg import EdgSpider
+from ant.spiders.huarun import HuarunSpider
+from ant.spiders.wann import WannSpider
+
+FIXTURE_DIR = Path(__file__).resolve().parent / "fixtures"
+
+# 不读写增量记录；时间窗口足够长，保存的页面不会因为日期变旧而走截止分支
+SETTINGS = {
+    "SEEN_STORE": "",
+    "CHECKPOINT_STORE": "",
+    "CRAWL_WINDOW_DAYS": 36500,
+    "LOG_LEVEL": "WARNING",
+}
+
+# (名称, 爬虫, 回调, 页面, 地址, meta)
+CASES = (
+    ("ctg.parse_page", CtgSpider, "parse_page", "ctg_list.html", CtgSpider.start_urls[0], {"page_number": 1}),
+    ("ctg.parse_detail", CtgSpider, "parse_detail", "ctg_detail.html", "https://eps.ctg.com.cn/cms/channel/1ywgg1/240630000.htm", {"item": None, "notice_id": "x"}),
+    ("anhui.parse_page", AnhuiSpider, "parse_page", "anhui_list.html", AnhuiSpider.start_urls[0], {"page_number": 1}),
+    ("cnncecp.parse_page", CnncecpSpider, "parse_page", "cnncecp_list.html", CnncecpSpider.start_urls[0], {"page_number": 1}),
+    ("edg.parse", EdgSpider, "parse", "edg_index.html", EdgSpider.start_urls[0], {}),
+    ("huarun.parse_page", HuarunSpider, "parse_page", "huarun_page.json", HuarunSpider.base_url, {"page_number": 1}),
+    ("chinaconch.parse_page", ChinaconchSpider, "parse_page", "chinaconch_page.json", ChinaconchSpider.base_url, {"page_number": 0}),
+    ("api.parse_page", ApiSpider, "parse_page", "api_page.json", ApiSpider.base_url, {"page_number": 1}),
+    ("wann.parse_page", WannSpider, "parse_page", "wann_page.json", WannSpider.api_url, {"pn": 0, "page_number": 1}),
+)
+
+
+def make_spider(spidercls):
+    crawler = get_crawler(spidercls, SETTINGS)
+    spider = spidercls.from_crawler(crawler)
+    # 翻页爬虫在 start_requests() 中设置截止时间和页窗口
+    if hasattr(spider, "make_page_window"):
+        spider.cutoff_date = effective_cutoff(spider.watermark, spider.crawl_window_days)
+        spider.pages = spider.make_page_window()
+    return spider
+
+
+def make_invoker(spider, callback, fixture, url, meta):
+    body = (FIXTURE_DIR / fixture).read_bytes()
+    is_json = fixture.endswith(".json")
+    method = getattr(spider, callback)
+
+    def invoke():
+        request_meta = dict(meta)
+        if "item" in request_meta:
+            request_meta["item"] = {"title": "详情页基准", "file_url": url}
+        request = scrapy.Request(url, meta=request_meta)
+        if is_json:
+            response = TextResponse(url, body=body, encoding="utf-8", request=request)
+        else:
+            response = HtmlResponse(url, body=body, encoding="utf-8", request=request)
+        if callback == "parse_page" and is_json:
+            result = method(response, response.json())
+        else:
+            result = method(response)
+        return sum(1 for _ in result or ())
+
+    return invoke, len(body)
+
+
+def measure(invoke, min_seconds=1.0):
+    # 预热，同时记下单次调用的产出条数
+    outputs = invoke()
+    calls = 0
+    produced = 0
+    started = time.perf_counter()
+    while True:
+        produced += invoke()
+        calls += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_seconds:
+            break
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    invoke()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "calls_per_s": round(calls / elapsed, 1),
+        "outputs_per_call": outputs,
+        "outputs_per_s": round(produced / elapsed, 1),
+        "ms_per_call": round(elapsed / calls * 1000, 3),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def run(selected=None, min_seconds=1.0):
+    logging.disable(logging.INFO)
+    results = {}
+    for name, spidercls, callback, fixture, url, meta in CASES:
+        if selected and not any(part in name for part in selected):
+            continue
+        spider = make_spider(spidercls)
+        invoke, size = make_invoker(spider, callback, fixture, url, meta)
+        results[name] = {"fixture_kb": round(size / 1024, 1), **measure(invoke, min_seconds)}
+    logging.disable(logging.NOTSET)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    返回比基线慢 threshold 倍以上的回调：{名称: 倍数}
+    """
+    slower = {}
+    for name, result in results.items():
+        base = baseline.get("results", baseline).get(name)
+        if not base:
+            continue
+        ratio = result["ms_per_call"] / base["ms_per_call"]
+        result["vs_baseline"] = round(ratio, 2)
+        if ratio > threshold:
+            slower[name] = round(ratio, 2)
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description="解析回调基准")
+    parser.add_argument("--save", metavar="FILE", help="保存结果为基线 JSON")
+    parser.add_argument("--compare", metavar="FILE", help="与基线 JSON 比较")
+    parser.add_argument("--threshold", type=float, default=1.25, help="慢于基线多少倍算退化（默认 1.25）")
+    parser.add_argument("--filter", action="append", help="只运行名称包含该字符串的回调（可重复）")
+    parser.add_argument("--seconds", type=float, default=1.0, help="每个回调至少运行多少秒")
+    args = parser.parse_args()
+
+    results = run(args.filter, args.seconds)
+    slower = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            slower = compare(results, json.load(f), args.threshold)
+
+    columns = ("calls_per_s", "outputs_per_s", "ms_per_call", "peak_kb", "fixture_kb", "vs_baseline")
+    width = max(len(name) for name in results) if results else 10
+    print("callback".ljust(width), *(column.rjust(13) for column in columns))
+    for name, result in results.items():
+        print(name.ljust(width), *(str(result.get(column, "-")).rjust(13) for column in columns))
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "scrapy": scrapy.__version__, "results": results}, f, ensure_ascii=False, indent=2)
+    if slower:
+        print(f"慢于基线 {args.threshold} 倍: {slower}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
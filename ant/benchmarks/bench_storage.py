@@ -0,0 +1,76 @@
+"""
+公告库基准：批量写入吞吐量随库增大是否下降，以及全文检索加时间筛选的查询耗时
+
+用样例公告标题拼出带编号的合成公告，发布时间分布在最近 180 天，分块写入并记录每块的吞吐量，
+最后查询“本月的储能公告”等。
+
+在 ant/ 目录下运行：python -m benchmarks.bench_storage [公告条数]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from ant.storage import NoticeStore
+from benchmarks._feeds import load_titles
+
+QUERIES = ("储能", "光伏 epc", "变电站", "设计施工总承包")
+
+
+def synthetic_notices(count, seed=0):
+    rng = random.Random(seed)
+    titles = sorted(set(load_titles()))
+    now = datetime.now()
+    for number in range(count):
+        title = f"{rng.choice(titles)}（第{number}号）"
+        published = now - timedelta(days=rng.random() * 180)
+        yield {
+            "title": title,
+            "file_url": f"https://example.com/notice/{number}",
+            "time": published.strftime("%Y-%m-%d %H:%M:%S"),
+            "content": " ".join(rng.sample(titles, 5)),
+        }
+
+
+def run(count=200000, chunk=20000):
+    with tempfile.TemporaryDirectory() as tmp:
+        store = NoticeStore(os.path.join(tmp, "notices.db"))
+        throughput = []
+        started = time.perf_counter()
+        chunk_started = started
+        for number, notice in enumerate(synthetic_notices(count), 1):
+            store.add("bench", notice)
+            if number % chunk == 0:
+                store.flush()
+                now = time.perf_counter()
+                throughput.append(round(chunk / (now - chunk_started)))
+                chunk_started = now
+        store.flush()
+        total = time.perf_counter() - started
+
+        month_start = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        timings = {}
+        for query in QUERIES:
+            started = time.perf_counter()
+            rows = store.search(query, since=month_start, limit=100)
+            timings[query] = (len(rows), round((time.perf_counter() - started) * 1000, 2))
+        store.close()
+    return {
+        "notices": count,
+        "inserts_per_s": round(count / total),
+        "per_chunk": throughput,
+        "queries_ms": timings,
+    }
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    for key, value in run(count).items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
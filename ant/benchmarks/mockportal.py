@@ -0,0 +1,299 @@
+"""
+模拟招标网站：本地生成任意页数的列表，用于在上万页的规模下压测爬虫
+
+真实站点最多几百页，翻页、去重、管道在大规模下的问题暴露不出来。这里按各站点的页面结构生成数据：
+
+- ctg：/cms/channel/1ywgg1/index.htm?pageNo=N，#list1 > li 列表和详情页
+- cnncecp：/xzbgg/index.jhtml、index_N.jhtml，div.List1 > ul > li 列表
+- huarun：/api/isp/notice/tender/page?page=N&size=M，responseBody.resultList 接口
+- wann：POST .../getFullTextDataNew，按请求中的 pn / rn 返回 result.records
+
+标题取自 ant/ 下保存的导出文件（符合关键字的比例与真实站点相近），发布时间从现在起
+在 --days 天内按页均匀变旧，每条再随机偏移 --jitter 天（站点上偶尔出现的乱序）。
+超过 --pages 的页返回空列表。每个请求延迟 --latency 秒（在 0.5～1.5 倍之间随机），
+按 --error-rate 的比例返回 500 / 503。同一 --seed 下每页的内容固定，多次运行可比较。
+
+爬虫不需要修改：MockPortalDownloadHandler 把请求转发到模拟站点（原域名放在 X-Mock-Host 头中），
+响应的地址仍是原地址，下载槽、中间件和管道都照常按原域名工作。
+
+在 ant/ 目录下运行：
+    python -m benchmarks.mockportal --pages 10000 --latency 0.05 --error-rate 0.01
+    scrapy crawlall ctg cnncecp huarun wann -s MOCK_PORTAL=http://127.0.0.1:8900 \\
+        -s DOWNLOAD_HANDLERS='{"http": "benchmarks.mockportal.MockPortalDownloadHandler", "https": "benchmarks.mockportal.MockPortalDownloadHandler"}' \\
+        -s CRAWL_WINDOW_DAYS=36500 -s DOWNLOAD_DELAY=0 -s HTTPCACHE_ENABLED=False
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from scrapy.core.downloader.handlers.http11 import HTTP11DownloadHandler
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.httpobj import urlparse_cached
+
+from benchmarks._feeds import load_titles
+
+CTG_HOST = "eps.ctg.com.cn"
+CNNCECP_HOST = "www.cnncecp.com"
+HUARUN_HOST = "scm.crland.com.cn"
+WANN_HOST = "tab.wenergy.com.cn"
+
+# 两个 HTML 站点每页的条数
+LIST_SIZE = 20
+
+HEADER = (
+    '<!DOCTYPE html><html><head><meta charset="utf-8"><title>{title}</title>'
+    '<link rel="stylesheet" href="/css/main.css"><script src="/js/jquery.min.js"></script></head><body>'
+)
+NAV = '<div class="header"><div class="logo"><img src="/img/logo.png"></div><ul class="nav">{}</ul></div>'.format(
+    "".join(f'<li><a href="/c/{i}">栏目{i}</a></li>' for i in range(12))
+)
+
+
+class Portal:
+    """
+    各站点的数据：第 page 页（从 1 开始）有哪些公告
+
+    第 i 条公告（按发布时间从新到旧的全局序号）的标题、ID 和发布时间只由 seed 和 i 决定。
+    """
+
+    def __init__(self, pages=10000, days=365, jitter=0.0, seed=0, titles=None, now=None):
+        self.pages = pages
+        self.days = days
+        self.jitter = jitter
+        self.seed = seed
+        self.titles = titles or load_titles() or ["光伏电站设计施工总承包招标公告"]
+        self.now = now or datetime.now().replace(microsecond=0)
+
+    def notices(self, site, offset, count, total):
+        """
+        返回全局序号 offset 起的 count 条公告：[(序号, 标题, 发布时间), ...]，不超过 total 条
+        """
+        notices = []
+        for index in range(offset, min(offset + count, total)):
+            rng = random.Random(f"{self.seed}:{site}:{index}")
+            age = self.days * index / total
+            if self.jitter:
+                age = max(0.0, age + rng.uniform(-self.jitter, self.jitter))
+            published = self.now - timedelta(days=age, seconds=rng.randrange(3600))
+            notices.append((index, rng.choice(self.titles), published))
+        return notices
+
+    def list_page(self, site, page, size):
+        return self.notices(site, (page - 1) * size, size, self.pages * size) if page >= 1 else []
+
+    def ctg_list(self, page):
+        rows = "".join(
+            f'<li><span class="fl"><a href="/cms/channel/1ywgg1/{240000000 + index}.htm" title="{escape(title)}" '
+            f'target="_blank">{escape(title[:28])}</a></span><span class="fr">{published:%Y-%m-%d}</span></li>\n'
+            for index, title, published in self.list_page("ctg", page, LIST_SIZE)
+        )
+        return (
+            HEADER.format(title="招标公告") + "<div>" + NAV
+            + f'<div class="insidepage"><div class="insidepage-left"><ul id="list1">\n{rows}</ul>'
+            + f'<div class="pager">第 {page} 页 / 共 {self.pages} 页</div></div></div></div></body></html>'
+        )
+
+    def ctg_detail(self, notice_id):
+        index = notice_id - 240000000
+        total = self.pages * LIST_SIZE
+        notices = self.notices("ctg", index, 1, total) if 0 <= index < total else []
+        if not notices:
+            return None
+        _, title, published = notices[0]
+        rng = random.Random(f"{self.seed}:ctg-detail:{index}")
+        paragraphs = "".join(
+            f"<p><span>{escape(rng.choice(self.titles))}</span> <span>项目所在地区：</span> <span>第 {n + 1} 段</span></p>\n"
+            for n in range(rng.randint(10, 40))
+        )
+        return (
+            HEADER.format(title="详情") + "<div>" + NAV
+            + f'<div class="insidepage"><div class="insidepage-left"><div class="article-title"><h2>{escape(title)}</h2></div>'
+            + f'<div class="article-content"><p><span>发布时间：</span> <span>{published:%Y-%m-%d}</span></p>\n{paragraphs}</div>'
+            + "</div></div></div></body></html>"
+        )
+
+    def cnncecp_list(self, page):
+        rows = "".join(
+            f'<li><span class="Green">[{"报名结束" if index % 3 == 2 else "正在报名"}]</span>'
+            f'<a href="/xzbgg/{1800000 + index}.jhtml" title="{escape(title)}">{escape(title)}</a>'
+            f'<span class="Right Gray">{published:%Y-%m-%d}</span></li>\n'
+            for index, title, published in self.list_page("cnncecp", page, LIST_SIZE)
+        )
+        return (
+            HEADER.format(title="招标公告") + f'<div class="n-main"><div class="n-left">{NAV}</div>'
+            + f'<div class="n-right"><div class="BorderEEE NoBorderTop Padding10 WhiteBg"><div class="List1"><ul>\n{rows}</ul></div>'
+            + f'<div class="TxtCenter">第 {page} 页 / 共 {self.pages} 页</div></div></div></div></body></html>'
+        )
+
+    def huarun_page(self, page, size):
+        records = [
+            {
+                "id": index,
+                "title": title,
+                "url": f"https://{HUARUN_HOST}/notice/{index}",
+                "publishTime": f"{published:%Y-%m-%d %H:%M:%S}",
+                "status": "报名结束" if index % 4 == 3 else "报名中",
+                "summary": None,
+                "orgName": "华润置地",
+            }
+            for index, title, published in self.list_page("huarun", page, size)
+        ]
+        body = {"pages": self.pages, "total": self.pages * size, "current": page, "size": size, "resultList": records}
+        return {"status": "SUCCESS", "message": None, "responseBody": body}
+
+    def wann_page(self, pn, rn):
+        total = self.pages * rn
+        records = [
+            {
+                "id": f"rec-{index}",
+                "title": title,
+                "linkurl": f"/cgxx/002001/002001001/{published:%Y%m%d}/{index:08d}.html",
+                "webdate": f"{published:%Y-%m-%d %H:%M:%S}",
+                "categorynum": "002001001",
+            }
+            for index, title, published in self.notices("wann", pn, rn, total)
+        ]
+        return {"result": {"totalcount": total, "records": records}}
+
+
+class PortalHandler(BaseHTTPRequestHandler):
+    """
+    按 X-Mock-Host 头（直接访问时按路径）分派到各站点
+    """
+
+    server_version = "MockPortal/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self._serve()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self._serve(self.rfile.read(length) if length else b"")
+
+    def log_message(self, format, *args):
+        pass
+
+    def _serve(self, body=b""):
+        server = self.server
+        rng = random.Random()
+        if server.latency:
+            time.sleep(server.latency * rng.uniform(0.5, 1.5))
+        server.count()
+        if server.error_rate and rng.random() < server.error_rate:
+            self._send(rng.choice((500, 503)), "text/plain", b"error")
+            return
+        try:
+            routed = self._route(urlparse(self.path), body)
+        except (ValueError, KeyError):
+            routed = None
+        if routed is None:
+            self._send(404, "text/plain", b"not found")
+        elif isinstance(routed, dict):
+            self._send(200, "application/json;charset=UTF-8", json.dumps(routed, ensure_ascii=False).encode("utf-8"))
+        else:
+            self._send(200, "text/html; charset=utf-8", routed.encode("utf-8"))
+
+    def _route(self, url, body):
+        portal = self.server.portal
+        host = self.headers.get("X-Mock-Host", "")
+        path = url.path
+        query = parse_qs(url.query)
+        if (host == CTG_HOST or not host) and path == "/cms/channel/1ywgg1/index.htm":
+            return portal.ctg_list(int(query.get("pageNo", ["1"])[0]))
+        if (host == CTG_HOST or not host) and path.startswith("/cms/channel/1ywgg1/") and path.endswith(".htm"):
+            return portal.ctg_detail(int(path.rsplit("/", 1)[1][:-4]))
+        if (host == CNNCECP_HOST or not host) and path.startswith("/xzbgg/index") and path.endswith(".jhtml"):
+            suffix = path[len("/xzbgg/index"):-len(".jhtml")]
+            return portal.cnncecp_list(int(suffix[1:]) if suffix.startswith("_") else 1)
+        if (host == HUARUN_HOST or not host) and path == "/api/isp/notice/tender/page":
+            return portal.huarun_page(int(query.get("page", ["1"])[0]), int(query.get("size", ["10"])[0]))
+        if (host == WANN_HOST or not host) and path.endswith("/getFullTextDataNew") and self.command == "POST":
+            data = json.loads(body or b"{}")
+            return portal.wann_page(int(data.get("pn", 0)), int(data.get("rn", 10)))
+        return None
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class PortalServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address, portal, latency=0.0, error_rate=0.0):
+        super().__init__(address, PortalHandler)
+        self.portal = portal
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def count(self):
+        with self._lock:
+            self.requests += 1
+
+
+class MockPortalDownloadHandler(HTTP11DownloadHandler):
+    """
+    把请求转发到 MOCK_PORTAL 指定的模拟站点，返回的响应仍使用原请求的地址
+    """
+
+    def __init__(self, crawler):
+        self.portal_url = crawler.settings.get("MOCK_PORTAL", "").rstrip("/")
+        if not self.portal_url:
+            raise NotConfigured("未设置 MOCK_PORTAL")
+        super().__init__(crawler)
+
+    async def download_request(self, request):
+        parsed = urlparse_cached(request)
+        target = self.portal_url + (parsed.path or "/") + (f"?{parsed.query}" if parsed.query else "")
+        headers = request.headers.copy()
+        headers["X-Mock-Host"] = parsed.hostname or ""
+        response = await super().download_request(request.replace(url=target, headers=headers))
+        return response.replace(url=request.url, request=request)
+
+
+def serve(host="127.0.0.1", port=8900, pages=10000, days=365, jitter=0.0, latency=0.0, error_rate=0.0, seed=0):
+    """
+    启动模拟站点（阻塞），返回前打印收到的请求数
+    """
+    portal = Portal(pages=pages, days=days, jitter=jitter, seed=seed)
+    server = PortalServer((host, port), portal, latency=latency, error_rate=error_rate)
+    print(f"模拟站点 http://{host}:{port}：每站 {pages} 页，{days} 天，延迟 {latency}s，错误率 {error_rate}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"共收到 {server.requests} 个请求")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模拟招标网站")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--pages", type=int, default=10000, help="每个站点的页数")
+    parser.add_argument("--days", type=float, default=365, help="最后一页的公告距今多少天")
+    parser.add_argument("--jitter", type=float, default=0.0, help="每条公告发布时间的随机偏移（天）")
+    parser.add_argument("--latency", type=float, default=0.0, help="平均响应延迟（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 500 / 503 的比例")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    serve(args.host, args.port, args.pages, args.days, args.jitter, args.latency, args.error_rate, args.seed)
+
+
+if __name__ == "__main__":
+    main()